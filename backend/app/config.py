@@ -12,10 +12,40 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     
+    # Pool HTTP hacia Supabase (PostgREST)
+    SUPABASE_MAX_CONNECTIONS: int = 20
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0
+    SUPABASE_TIMEOUT: float = 10.0
+    SUPABASE_CONNECT_TIMEOUT: float = 5.0
+    
+    # Caché de consultas (GET): "memory" o "redis"
+    CACHE_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_MAX_ENTRIES: int = 1000
+    CACHE_DEFAULT_TTL_SECONDS: float = 60.0
+    
+    # Claves de idempotencia (operaciones en lote)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    
+    # Hash de contraseñas (bcrypt)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 100
+    
+    # Índice espacial en memoria para el mapa de propiedades
+    MAP_INDEX_ENABLED: bool = False
+    MAP_INDEX_CELL_DEGREES: float = 0.01
+    MAP_INDEX_REFRESH_SECONDS: int = 300
+    MAP_CLUSTER_MAX_ZOOM: int = 14
+    
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_EMBED_USER_CLAIMS: bool = True
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_LOCAL_SECONDS: int = 30
     
     # App
     APP_NAME: str = "Sistema Inmobiliario API"
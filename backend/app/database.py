@@ -1,18 +1,149 @@
 """
 Configuración de conexión a Supabase
+
+Se mantiene un único cliente por proceso. Su sesión HTTP hacia PostgREST
+usa un pool de conexiones keep-alive, de modo que los requests reutilizan
+las conexiones TLS ya abiertas en lugar de negociarlas en cada llamada.
 """
+import threading
+from typing import Any, Dict, Optional
+
+import anyio
+import httpx
+from postgrest.utils import SyncClient
 from supabase import create_client, Client
 from app.config import get_settings
 
 settings = get_settings()
 
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+
+# Hilos dedicados a ejecutar consultas (uno por conexión del pool)
+_query_limiter: Optional[anyio.CapacityLimiter] = None
+
+# Contadores del pool (se actualizan desde el transporte HTTP)
+_stats_lock = threading.Lock()
+_pool_stats: Dict[str, int] = {"requests_totales": 0, "requests_en_curso": 0, "errores": 0}
+
+
+class _PoolTransport(httpx.HTTPTransport):
+    """Transporte HTTP que lleva la cuenta de requests del pool"""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with _stats_lock:
+            _pool_stats["requests_totales"] += 1
+            _pool_stats["requests_en_curso"] += 1
+        try:
+            return super().handle_request(request)
+        except Exception:
+            with _stats_lock:
+                _pool_stats["errores"] += 1
+            raise
+        finally:
+            with _stats_lock:
+                _pool_stats["requests_en_curso"] -= 1
+
+
+def _create_postgrest_session(base_session: SyncClient) -> SyncClient:
+    """Crea la sesión HTTP con límites de pool, keep-alive y timeouts configurables"""
+    transport = _PoolTransport(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return SyncClient(
+        base_url=base_session.base_url,
+        headers=base_session.headers,
+        timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT, connect=settings.SUPABASE_CONNECT_TIMEOUT),
+        transport=transport,
+        follow_redirects=True,
+    )
+
+
+def init_supabase_client() -> Client:
+    """
+    Crea el cliente compartido de Supabase (se llama en el evento startup)
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+            postgrest = client.postgrest
+            default_session = postgrest.session
+            postgrest.session = _create_postgrest_session(default_session)
+            default_session.close()
+            _client = client
+    return _client
+
+
+def close_supabase_client():
+    """
+    Cierra las conexiones del pool (se llama en el evento shutdown)
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.postgrest.session.close()
+            _client = None
+
 
 def get_supabase_client() -> Client:
     """
-    Retorna un cliente de Supabase configurado
+    Retorna el cliente de Supabase compartido por el proceso
     """
-    supabase: Client = create_client(
-        settings.SUPABASE_URL,
-        settings.SUPABASE_KEY
-    )
-    return supabase
+    if _client is None:
+        return init_supabase_client()
+    return _client
+
+
+async def execute_async(query: Any) -> Any:
+    """
+    Ejecuta una consulta de supabase-py sin bloquear el event loop.
+    
+    El cliente de Supabase es síncrono: `.execute()` se delega a un pool de
+    hilos acotado al tamaño del pool de conexiones, así los handlers `async`
+    atienden otros requests mientras esperan la respuesta de PostgREST.
+    
+    Args:
+        query: Request builder de supabase-py (sin llamar a `.execute()`)
+    
+    Returns:
+        La respuesta de `query.execute()`
+    """
+    global _query_limiter
+    if _query_limiter is None:
+        _query_limiter = anyio.CapacityLimiter(settings.SUPABASE_MAX_CONNECTIONS)
+    return await anyio.to_thread.run_sync(query.execute, limiter=_query_limiter)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Retorna el estado actual del pool de conexiones hacia PostgREST
+    """
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_pool_stats)
+
+    if _query_limiter is not None:
+        stats["hilos_ocupados"] = _query_limiter.borrowed_tokens
+        stats["consultas_en_espera"] = _query_limiter.statistics().tasks_waiting
+
+    stats.update({
+        "inicializado": _client is not None,
+        "max_conexiones": settings.SUPABASE_MAX_CONNECTIONS,
+        "max_keepalive": settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": settings.SUPABASE_KEEPALIVE_EXPIRY,
+        "conexiones_abiertas": 0,
+        "conexiones_inactivas": 0,
+    })
+
+    if _client is not None:
+        pool = getattr(_client.postgrest.session._transport, "_pool", None)
+        conexiones = getattr(pool, "connections", [])
+        stats["conexiones_abiertas"] = len(conexiones)
+        stats["conexiones_inactivas"] = len([c for c in conexiones if c.is_idle()])
+
+    return stats
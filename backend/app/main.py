@@ -4,7 +4,11 @@ Punto de entrada de la aplicación FastAPI
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
-from app.routes import usuarios, empleados, propietarios, clientes, direcciones, propiedades, imagenes_propiedad, documentos_propiedad, citas_visita, contratos_operacion, pagos, roles, desempeno_asesor, ganancias_empleado
+from app.database import init_supabase_client, close_supabase_client, get_pool_stats
+from app.utils.cache import query_cache
+from app.utils.security import get_password_hash_stats
+from app.utils.spatial_index import start_map_index, stop_map_index, get_map_index_stats
+from app.routes import usuarios, empleados, propietarios, clientes, direcciones, propiedades, imagenes_propiedad, documentos_propiedad, citas_visita, contratos_operacion, pagos, roles, desempeno_asesor, ganancias_empleado, dashboard, busqueda, lookup
 
 settings = get_settings()
 
@@ -23,9 +27,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
+@app.on_event("startup")
+async def startup():
+    """Abre el pool de conexiones hacia Supabase y carga el índice del mapa"""
+    init_supabase_client()
+    await start_map_index()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Cierra el pool de conexiones hacia Supabase y el backend de caché"""
+    await stop_map_index()
+    close_supabase_client()
+    await query_cache.close()
+
+
 # Incluir routers
 app.include_router(usuarios.router, prefix="/api", tags=["Usuarios"])
 app.include_router(empleados.router, prefix="/api", tags=["Empleados"])
@@ -41,6 +61,9 @@ app.include_router(pagos.router, prefix="/api", tags=["Pagos"])
 app.include_router(roles.router, prefix="/api", tags=["Roles"])
 app.include_router(desempeno_asesor.router, prefix="/api", tags=["Desempeño de Asesores"])
 app.include_router(ganancias_empleado.router, prefix="/api", tags=["Ganancias de Empleados"])
+app.include_router(dashboard.router, prefix="/api", tags=["Dashboard"])
+app.include_router(busqueda.router, prefix="/api", tags=["Búsqueda"])
+app.include_router(lookup.router, prefix="/api", tags=["Lookup"])
 
 
 @app.get("/")
@@ -59,6 +82,30 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/pool")
+async def pool_stats():
+    """Estadísticas del pool de conexiones hacia Supabase"""
+    return get_pool_stats()
+
+
+@app.get("/health/cache")
+async def cache_stats():
+    """Estadísticas del caché de consultas (aciertos, fallos, entradas)"""
+    return await query_cache.stats()
+
+
+@app.get("/health/passwords")
+async def password_hash_stats():
+    """Estadísticas del pool de bcrypt (operaciones en curso y en cola)"""
+    return get_password_hash_stats()
+
+
+@app.get("/health/map-index")
+async def map_index_stats():
+    """Estado del índice espacial del mapa (marcadores y celdas)"""
+    return get_map_index_stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
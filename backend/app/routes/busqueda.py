@@ -0,0 +1,49 @@
+"""
+Router de búsqueda global (clientes, propiedades y propietarios)
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional
+from app.database import get_supabase_client, execute_async
+from app.utils.dependencies import get_current_active_user
+
+router = APIRouter()
+
+TIPOS_BUSQUEDA = ["cliente", "propiedad", "propietario"]
+
+
+@router.get("/search", response_model=dict)
+async def buscar(
+    q: str = Query(..., min_length=2, max_length=100, description="Texto a buscar"),
+    limite: int = Query(10, ge=1, le=50, description="Cantidad máxima de resultados"),
+    tipos: Optional[List[str]] = Query(None, description="Restringir a: cliente, propiedad, propietario"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Busca en clientes (nombre, CI), propiedades (título, descripción, código
+    público) y propietarios (nombre, CI) y devuelve los mejores `limite`
+    resultados ordenados por relevancia.
+    
+    Se resuelve con una sola consulta (función `buscar_global`) sobre índices
+    de trigramas y full-text (ver migrations/005_busqueda.sql); tolera errores
+    de tipeo en nombres y títulos.
+    """
+    tipos = tipos or TIPOS_BUSQUEDA
+    invalidos = [t for t in tipos if t not in TIPOS_BUSQUEDA]
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Tipos de búsqueda inválidos: {', '.join(invalidos)}")
+    
+    supabase = get_supabase_client()
+    
+    try:
+        result = await execute_async(
+            supabase.rpc("buscar_global", {"p_q": q.strip(), "p_limite": limite, "p_tipos": tipos})
+        )
+        
+        return {
+            "q": q,
+            "total": len(result.data),
+            "resultados": result.data
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la búsqueda: {str(e)}")
@@ -5,13 +5,22 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from datetime import datetime, date, timezone
 from app.schemas.cita_visita import CitaVisitaCreate, CitaVisitaUpdate, CitaVisitaResponse
-from app.schemas.pagination import PaginatedResponse, create_paginated_response
-from app.database import get_supabase_client
+from app.schemas.pagination import PaginatedResponse, paginate_query
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.cache import cached, invalidate_tags
+from app.utils.export import stream_export
+from app.utils.references import Reference, fetch_references
+from app.utils.writes import update_or_404, delete_or_404
 
 router = APIRouter()
 
 
+def _tags_citas(citas: list) -> List[str]:
+    """Tags de caché de un listado de citas"""
+    return ["citas"] + [f"cita:{c['id_cita']}" for c in citas]
+
+
 @router.post("/citas-visita/", response_model=CitaVisitaResponse, status_code=201)
 async def crear_cita_visita(
     cita: CitaVisitaCreate,
@@ -34,30 +43,22 @@ async def crear_cita_visita(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que la propiedad existe
-        propiedad = supabase.table("propiedad").select("id_propiedad, titulo_propiedad, estado_propiedad").eq("id_propiedad", cita.id_propiedad).execute()
-        if not propiedad.data:
-            raise HTTPException(status_code=404, detail="La propiedad especificada no existe")
-        
-        # Verificar que la propiedad esté disponible
-        if propiedad.data[0].get("estado_propiedad") == "Cerrada":
-            raise HTTPException(status_code=400, detail="No se pueden agendar visitas a propiedades cerradas")
-        
-        # Verificar que el cliente existe
-        cliente = supabase.table("cliente").select("ci_cliente").eq("ci_cliente", cita.ci_cliente).execute()
-        if not cliente.data:
-            raise HTTPException(status_code=404, detail="El cliente especificado no existe")
-        
-        # Verificar que el asesor existe
-        asesor = supabase.table("usuario").select("id_usuario").eq("id_usuario", cita.id_usuario_asesor).execute()
-        if not asesor.data:
-            raise HTTPException(status_code=404, detail="El asesor especificado no existe")
-        
         # Verificar que la fecha no sea en el pasado
         ahora = datetime.now(timezone.utc)
         if cita.fecha_visita_cita < ahora:
             raise HTTPException(status_code=400, detail="No se pueden agendar citas en el pasado")
         
+        # Verificar propiedad, cliente y asesor (en paralelo)
+        propiedad, _, _ = await fetch_references(
+            Reference("propiedad", "id_propiedad", cita.id_propiedad, "La propiedad especificada no existe", "id_propiedad, titulo_propiedad, estado_propiedad"),
+            Reference("cliente", "ci_cliente", cita.ci_cliente, "El cliente especificado no existe", "ci_cliente"),
+            Reference("usuario", "id_usuario", cita.id_usuario_asesor, "El asesor especificado no existe", "id_usuario"),
+        )
+        
+        # Verificar que la propiedad esté disponible
+        if propiedad.get("estado_propiedad") == "Cerrada":
+            raise HTTPException(status_code=400, detail="No se pueden agendar visitas a propiedades cerradas")
+        
         # Preparar datos para inserción
         cita_data = cita.model_dump()
         
@@ -66,11 +67,12 @@ async def crear_cita_visita(
             cita_data["fecha_visita_cita"] = cita_data["fecha_visita_cita"].isoformat()
         
         # Insertar cita
-        result = supabase.table("citavisita").insert(cita_data).execute()
+        result = await execute_async(supabase.table("citavisita").insert(cita_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear la cita")
         
+        await invalidate_tags("citas")
         return result.data[0]
     
     except HTTPException:
@@ -81,6 +83,7 @@ async def crear_cita_visita(
 
 # ✅ NUEVO: Endpoint con paginación
 @router.get("/citas-visita/", response_model=PaginatedResponse[CitaVisitaResponse])
+@cached("citas", ttl=120, user_scoped=("mis_citas",), tags=lambda pagina: _tags_citas(pagina["items"]))
 async def listar_citas_paginadas(
     page: int = Query(1, ge=1, description="Número de página"),
     page_size: int = Query(20, ge=1, le=100, description="Items por página"),
@@ -90,6 +93,7 @@ async def listar_citas_paginadas(
     mis_citas: bool = Query(False, description="Solo mis citas como asesor"),
     fecha_desde: Optional[date] = Query(None, description="Fecha desde (YYYY-MM-DD)"),
     fecha_hasta: Optional[date] = Query(None, description="Fecha hasta (YYYY-MM-DD)"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (paginación keyset)"),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -97,6 +101,7 @@ async def listar_citas_paginadas(
     
     - **page**: Número de página (default: 1)
     - **page_size**: Items por página (default: 20, max: 100)
+    - **cursor**: `next_cursor` de la respuesta anterior; pagina por keyset (sin total)
     
     **Filtros:**
     - **estado**: "Programada", "Confirmada", "Realizada", "Cancelada", "No asistió"
@@ -108,64 +113,35 @@ async def listar_citas_paginadas(
     supabase = get_supabase_client()
     
     try:
-        # 🔹 PASO 1: Contar total
-        count_query = supabase.table("citavisita").select("id_cita")
+        # Datos y total en un solo request
+        query = supabase.table("citavisita").select("*", count=None if cursor else "exact")
         
         # Aplicar filtros
         if estado:
-            count_query = count_query.eq("estado_cita", estado)
-        if ci_cliente:
-            count_query = count_query.eq("ci_cliente", ci_cliente)
-        if id_propiedad:
-            count_query = count_query.eq("id_propiedad", id_propiedad)
-        if mis_citas:
-            count_query = count_query.eq("id_usuario_asesor", current_user["id_usuario"])
-        if fecha_desde:
-            count_query = count_query.gte("fecha_visita_cita", fecha_desde.isoformat())
-        if fecha_hasta:
-            fecha_hasta_str = f"{fecha_hasta.isoformat()}T23:59:59"
-            count_query = count_query.lte("fecha_visita_cita", fecha_hasta_str)
-        
-        all_items = count_query.execute()
-        total = len(all_items.data)
-        
-        # 🔹 PASO 2: Obtener datos paginados
-        skip = (page - 1) * page_size
-        data_query = supabase.table("citavisita").select("*")
-        
-        # Aplicar mismos filtros
-        if estado:
-            data_query = data_query.eq("estado_cita", estado)
+            query = query.eq("estado_cita", estado)
         if ci_cliente:
-            data_query = data_query.eq("ci_cliente", ci_cliente)
+            query = query.eq("ci_cliente", ci_cliente)
         if id_propiedad:
-            data_query = data_query.eq("id_propiedad", id_propiedad)
+            query = query.eq("id_propiedad", id_propiedad)
         if mis_citas:
-            data_query = data_query.eq("id_usuario_asesor", current_user["id_usuario"])
+            query = query.eq("id_usuario_asesor", current_user["id_usuario"])
         if fecha_desde:
-            data_query = data_query.gte("fecha_visita_cita", fecha_desde.isoformat())
+            query = query.gte("fecha_visita_cita", fecha_desde.isoformat())
         if fecha_hasta:
             fecha_hasta_str = f"{fecha_hasta.isoformat()}T23:59:59"
-            data_query = data_query.lte("fecha_visita_cita", fecha_hasta_str)
-        
-        # Ordenar y paginar
-        data_query = data_query.order("fecha_visita_cita", desc=False).range(skip, skip + page_size - 1)
-        result = data_query.execute()
+            query = query.lte("fecha_visita_cita", fecha_hasta_str)
         
-        # 🔹 PASO 3: Crear respuesta paginada
-        return create_paginated_response(
-            items=result.data,
-            total=total,
-            page=page,
-            page_size=page_size
-        )
+        return await paginate_query(query, page, page_size, cursor, "fecha_visita_cita", "id_cita", desc=False)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener citas: {str(e)}")
 
 
 # ✅ Endpoint legacy (sin paginación)
 @router.get("/citas-visita/all", response_model=List[CitaVisitaResponse])
+@cached("citas", ttl=120, user_scoped=("mis_citas",), tags=_tags_citas)
 async def listar_todas_citas(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
@@ -200,13 +176,49 @@ async def listar_todas_citas(
             fecha_hasta_str = f"{fecha_hasta.isoformat()}T23:59:59"
             query = query.lte("fecha_visita_cita", fecha_hasta_str)
         
-        result = query.order("fecha_visita_cita", desc=False).range(skip, skip + limit - 1).execute()
+        result = await execute_async(query.order("fecha_visita_cita", desc=False).range(skip, skip + limit - 1))
         return result.data
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener citas: {str(e)}")
 
 
+# ✅ Exportación completa en streaming (CSV / NDJSON)
+@router.get("/citas-visita/export")
+async def exportar_citas(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    mis_citas: bool = Query(False, description="Solo mis citas como asesor"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha desde (YYYY-MM-DD)"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha hasta (YYYY-MM-DD)"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Exporta todas las citas (ordenadas por fecha de visita) en streaming.
+    """
+    supabase = get_supabase_client()
+    
+    def _query():
+        query = supabase.table("citavisita").select("*")
+        if estado:
+            query = query.eq("estado_cita", estado)
+        if mis_citas:
+            query = query.eq("id_usuario_asesor", current_user["id_usuario"])
+        if fecha_desde:
+            query = query.gte("fecha_visita_cita", fecha_desde.isoformat())
+        if fecha_hasta:
+            query = query.lte("fecha_visita_cita", f"{fecha_hasta.isoformat()}T23:59:59")
+        return query
+    
+    try:
+        return await stream_export(_query, formato, "citas", "fecha_visita_cita", "id_cita", desc=False, columns=list(CitaVisitaResponse.model_fields))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar citas: {str(e)}")
+
+
 # ✅ Endpoint optimizado para Dashboard
 @router.get("/citas-visita/proximas", response_model=List[CitaVisitaResponse])
 async def obtener_proximas_citas(
@@ -223,13 +235,12 @@ async def obtener_proximas_citas(
     try:
         hoy = datetime.now().isoformat()
         
-        result = (
+        result = await execute_async(
             supabase.table("citavisita")
             .select("*")
             .gte("fecha_visita_cita", hoy)
             .order("fecha_visita_cita", desc=False)
             .limit(limit)
-            .execute()
         )
         
         return result.data
@@ -254,14 +265,13 @@ async def obtener_citas_hoy(
         inicio_dia = f"{hoy.isoformat()}T00:00:00"
         fin_dia = f"{hoy.isoformat()}T23:59:59"
         
-        citas = (
+        citas = await execute_async(
             supabase.table("citavisita")
             .select("*")
             .eq("id_usuario_asesor", current_user["id_usuario"])
             .gte("fecha_visita_cita", inicio_dia)
             .lte("fecha_visita_cita", fin_dia)
             .order("fecha_visita_cita")
-            .execute()
         )
         
         # Contar por estado
@@ -291,7 +301,7 @@ async def obtener_cita(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("citavisita").select("*").eq("id_cita", id_cita).execute()
+        result = await execute_async(supabase.table("citavisita").select("*").eq("id_cita", id_cita))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Cita no encontrada")
@@ -319,13 +329,7 @@ async def actualizar_cita(
     - Cancelar: `{ "estado_cita": "Cancelada", "nota_cita": "Cliente canceló" }`
     - Reprogramar: `{ "fecha_visita_cita": "2025-10-25T15:00:00" }`
     """
-    supabase = get_supabase_client()
-    
     try:
-        existing = supabase.table("citavisita").select("*").eq("id_cita", id_cita).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Cita no encontrada")
-        
         update_data = cita.model_dump(exclude_unset=True)
         
         if not update_data:
@@ -334,12 +338,10 @@ async def actualizar_cita(
         if "fecha_visita_cita" in update_data and update_data["fecha_visita_cita"]:
             update_data["fecha_visita_cita"] = update_data["fecha_visita_cita"].isoformat()
         
-        result = supabase.table("citavisita").update(update_data).eq("id_cita", id_cita).execute()
+        cita_actualizada = await update_or_404("citavisita", "id_cita", id_cita, update_data, "Cita no encontrada")
         
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar la cita")
-        
-        return result.data[0]
+        await invalidate_tags("citas", f"cita:{id_cita}")
+        return cita_actualizada
     
     except HTTPException:
         raise
@@ -357,18 +359,10 @@ async def eliminar_cita(
     
     💡 Recomendación: En lugar de eliminar, considera cambiar el estado a "Cancelada".
     """
-    supabase = get_supabase_client()
-    
     try:
-        cita = supabase.table("citavisita").select("*").eq("id_cita", id_cita).execute()
-        if not cita.data:
-            raise HTTPException(status_code=404, detail="Cita no encontrada")
-        
-        result = supabase.table("citavisita").delete().eq("id_cita", id_cita).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar la cita")
+        await delete_or_404("citavisita", "id_cita", id_cita, "Cita no encontrada")
         
+        await invalidate_tags("citas", f"cita:{id_cita}")
         return {
             "message": "Cita eliminada exitosamente",
             "id_cita": id_cita
@@ -2,15 +2,23 @@
 Router MEJORADO para endpoints de Clientes con PAGINACIÓN COMPLETA
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.schemas.cliente import ClienteCreate, ClienteUpdate, ClienteResponse
-from app.schemas.pagination import PaginatedResponse, create_paginated_response
-from app.database import get_supabase_client
+from app.schemas.pagination import PaginatedResponse, paginate_query
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.cache import cached, invalidate_tags
+from app.utils.bulk import BulkReport, validate_rows, mark_duplicates, existing_values, insert_rows
+from app.utils.export import stream_export
+from app.utils.writes import update_or_404
 from decimal import Decimal
 
 router = APIRouter()
 
+def _tags_listado_clientes(pagina: dict) -> List[str]:
+    """Tags de caché de una página de clientes"""
+    return ["clientes"] + [f"cliente:{c['ci_cliente']}" for c in pagina["items"]]
+
 @router.post("/clientes/", response_model=ClienteResponse, status_code=201)
 async def crear_cliente(
     cliente: ClienteCreate,
@@ -23,26 +31,17 @@ async def crear_cliente(
     
     try:
         # Verificar si el cliente ya existe
-        existing = supabase.table("cliente").select("*").eq("ci_cliente", cliente.ci_cliente).execute()
+        existing = await execute_async(supabase.table("cliente").select("*").eq("ci_cliente", cliente.ci_cliente))
         if existing.data:
             raise HTTPException(status_code=400, detail="Ya existe un cliente con ese CI")
         
-        # Preparar datos para inserción
-        cliente_data = cliente.model_dump()
-        
-        # Agregar el ID del usuario registrador
-        cliente_data["id_usuario_registrador"] = current_user["id_usuario"]
-        
-        # Convertir Decimal a float para Supabase
-        if cliente_data.get("presupuesto_max_cliente") is not None:
-            cliente_data["presupuesto_max_cliente"] = float(cliente_data["presupuesto_max_cliente"])
-        
         # Insertar cliente
-        result = supabase.table("cliente").insert(cliente_data).execute()
+        result = await execute_async(supabase.table("cliente").insert(_preparar_cliente_data(cliente, current_user)))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear el cliente")
         
+        await invalidate_tags("clientes")
         return result.data[0]
     
     except HTTPException:
@@ -51,8 +50,64 @@ async def crear_cliente(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 
+def _preparar_cliente_data(cliente: ClienteCreate, current_user: dict) -> dict:
+    """Fila de `cliente` lista para insertar"""
+    cliente_data = cliente.model_dump()
+    
+    # Agregar el ID del usuario registrador
+    cliente_data["id_usuario_registrador"] = current_user["id_usuario"]
+    
+    # Convertir Decimal a float para Supabase
+    if cliente_data.get("presupuesto_max_cliente") is not None:
+        cliente_data["presupuesto_max_cliente"] = float(cliente_data["presupuesto_max_cliente"])
+    
+    return cliente_data
+
+
+@router.post("/clientes/bulk", response_model=dict)
+async def crear_clientes_bulk(
+    clientes: List[Dict[str, Any]],
+    upsert: bool = Query(False, description="Actualizar los clientes cuyo CI ya existe"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Crea clientes en lote (cada fila con el formato de `POST /clientes/`).
+    
+    Los CI existentes se verifican con una sola consulta y la inserción se
+    hace en bloques. Devuelve el resultado de cada fila por su índice.
+    
+    - **upsert**: Si es true, los CI existentes se actualizan en lugar de rechazarse
+    """
+    try:
+        report = BulkReport(len(clientes))
+        validos = validate_rows(clientes, ClienteCreate, report)
+        mark_duplicates(validos, lambda c: c.ci_cliente, report, "CI repetido en el lote")
+        
+        # Con upsert los CI existentes no son error, pero se reportan como actualizados
+        existentes = await existing_values("cliente", "ci_cliente", [c.ci_cliente for _, c in validos])
+        if not upsert:
+            for indice, cliente in validos:
+                if cliente.ci_cliente in existentes:
+                    report.error(indice, "Ya existe un cliente con ese CI")
+        
+        filas = [
+            (indice, _preparar_cliente_data(cliente, current_user))
+            for indice, cliente in validos if not report.has_error(indice)
+        ]
+        await insert_rows("cliente", "ci_cliente", filas, report, on_conflict="ci_cliente" if upsert else None, existing=existentes)
+        
+        await invalidate_tags("clientes")
+        return report.as_dict()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la carga masiva de clientes: {str(e)}")
+
+
 # ✅ ENDPOINT CON PAGINACIÓN COMPLETA
 @router.get("/clientes/", response_model=PaginatedResponse[ClienteResponse])
+@cached("clientes", ttl=300, user_scoped=("mis_clientes",), tags=_tags_listado_clientes)
 async def listar_clientes(
     page: int = Query(1, ge=1, description="Número de página"),
     page_size: int = Query(30, ge=1, le=100, description="Items por página"),
@@ -60,6 +115,7 @@ async def listar_clientes(
     zona_preferencia: Optional[str] = Query(None, description="Filtrar por zona de preferencia"),
     mis_clientes: bool = Query(False, description="Mostrar solo mis clientes registrados"),
     search: Optional[str] = Query(None, description="Buscar por nombre o CI"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (paginación keyset)"),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -71,60 +127,32 @@ async def listar_clientes(
     - **zona_preferencia**: Filtrar por zona
     - **mis_clientes**: Solo mis clientes
     - **search**: Buscar por nombre o CI
+    - **cursor**: `next_cursor` de la respuesta anterior; pagina por keyset (sin total)
     """
     supabase = get_supabase_client()
     
     try:
-        # 🔹 PASO 1: Construir query base para CONTAR
-        query_count = supabase.table("cliente").select("ci_cliente", count="exact")
+        # Datos y total en un solo request
+        query = supabase.table("cliente").select("*", count=None if cursor else "exact")
         
         # Aplicar filtros
         if mis_clientes:
-            query_count = query_count.eq("id_usuario_registrador", current_user["id_usuario"])
+            query = query.eq("id_usuario_registrador", current_user["id_usuario"])
         
         if origen:
-            query_count = query_count.eq("origen_cliente", origen)
+            query = query.eq("origen_cliente", origen)
         
         if zona_preferencia:
-            query_count = query_count.ilike("preferencia_zona_cliente", f"%{zona_preferencia}%")
+            query = query.ilike("preferencia_zona_cliente", f"%{zona_preferencia}%")
         
         if search:
             # Buscar en nombre o CI
-            query_count = query_count.or_(f"nombres_completo_cliente.ilike.%{search}%,ci_cliente.ilike.%{search}%")
-        
-        # Obtener total
-        count_result = query_count.execute()
-        total = count_result.count if hasattr(count_result, 'count') else len(count_result.data)
-        
-        # 🔹 PASO 2: Construir query para datos paginados
-        skip = (page - 1) * page_size
-        
-        query_data = supabase.table("cliente").select("*")
-        
-        # Aplicar los mismos filtros
-        if mis_clientes:
-            query_data = query_data.eq("id_usuario_registrador", current_user["id_usuario"])
+            query = query.or_(f"nombres_completo_cliente.ilike.%{search}%,ci_cliente.ilike.%{search}%")
         
-        if origen:
-            query_data = query_data.eq("origen_cliente", origen)
-        
-        if zona_preferencia:
-            query_data = query_data.ilike("preferencia_zona_cliente", f"%{zona_preferencia}%")
-        
-        if search:
-            query_data = query_data.or_(f"nombres_completo_cliente.ilike.%{search}%,ci_cliente.ilike.%{search}%")
-        
-        # Aplicar paginación y ordenamiento
-        data_result = query_data.order("fecha_registro_cliente", desc=True).range(skip, skip + page_size - 1).execute()
-        
-        # 🔹 PASO 3: Crear respuesta paginada
-        return create_paginated_response(
-            items=data_result.data,
-            total=total,
-            page=page,
-            page_size=page_size
-        )
+        return await paginate_query(query, page, page_size, cursor, "fecha_registro_cliente", "ci_cliente")
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener clientes: {str(e)}")
 
@@ -142,11 +170,12 @@ async def listar_clientes_simple(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("cliente")\
-            .select("*")\
-            .order("nombres_completo_cliente")\
-            .limit(limit)\
-            .execute()
+        result = await execute_async(
+            supabase.table("cliente")
+            .select("*")
+            .order("nombres_completo_cliente")
+            .limit(limit)
+        )
         
         return result.data
     
@@ -154,6 +183,44 @@ async def listar_clientes_simple(
         raise HTTPException(status_code=500, detail=f"Error al obtener clientes: {str(e)}")
 
 
+# ✅ EXPORTACIÓN COMPLETA EN STREAMING (CSV / NDJSON)
+@router.get("/clientes/export")
+async def exportar_clientes(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    origen: Optional[str] = Query(None, description="Filtrar por origen del cliente"),
+    zona_preferencia: Optional[str] = Query(None, description="Filtrar por zona de preferencia"),
+    mis_clientes: bool = Query(False, description="Exportar solo mis clientes registrados"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Exporta todos los clientes (con los mismos filtros del listado).
+    Las filas se leen por páginas keyset y se envían a medida que llegan.
+    """
+    supabase = get_supabase_client()
+    
+    def _query():
+        query = supabase.table("cliente").select("*")
+        
+        if mis_clientes:
+            query = query.eq("id_usuario_registrador", current_user["id_usuario"])
+        
+        if origen:
+            query = query.eq("origen_cliente", origen)
+        
+        if zona_preferencia:
+            query = query.ilike("preferencia_zona_cliente", f"%{zona_preferencia}%")
+        
+        return query
+    
+    try:
+        return await stream_export(_query, formato, "clientes", "fecha_registro_cliente", "ci_cliente", columns=list(ClienteResponse.model_fields))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar clientes: {str(e)}")
+
+
 @router.get("/clientes/{ci_cliente}", response_model=ClienteResponse)
 async def obtener_cliente(
     ci_cliente: str,
@@ -165,7 +232,7 @@ async def obtener_cliente(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente).execute()
+        result = await execute_async(supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
@@ -187,14 +254,7 @@ async def actualizar_cliente(
     """
     Actualiza los datos de un cliente existente.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el cliente existe
-        existing = supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
         # Preparar datos actualizados (excluir None)
         update_data = cliente_update.model_dump(exclude_none=True)
         
@@ -203,12 +263,10 @@ async def actualizar_cliente(
             update_data["presupuesto_max_cliente"] = float(update_data["presupuesto_max_cliente"])
         
         # Actualizar
-        result = supabase.table("cliente").update(update_data).eq("ci_cliente", ci_cliente).execute()
+        cliente_actualizado = await update_or_404("cliente", "ci_cliente", ci_cliente, update_data, "Cliente no encontrado")
         
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar el cliente")
-        
-        return result.data[0]
+        await invalidate_tags("clientes", f"cliente:{ci_cliente}")
+        return cliente_actualizado
     
     except HTTPException:
         raise
@@ -224,23 +282,11 @@ async def eliminar_cliente(
     """
     Elimina (desactiva) un cliente del sistema.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el cliente existe
-        existing = supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
         # Soft delete
-        result = supabase.table("cliente")\
-            .update({"es_activo_cliente": False})\
-            .eq("ci_cliente", ci_cliente)\
-            .execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al desactivar el cliente")
+        await update_or_404("cliente", "ci_cliente", ci_cliente, {"es_activo_cliente": False}, "Cliente no encontrado")
         
+        await invalidate_tags("clientes", f"cliente:{ci_cliente}")
         return {"message": "Cliente desactivado correctamente"}
     
     except HTTPException:
@@ -5,7 +5,7 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from app.schemas.cliente import ClienteCreate, ClienteUpdate, ClienteResponse
 from app.schemas.pagination import PaginatedResponse, create_paginated_response
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
 from decimal import Decimal
 
@@ -23,7 +23,7 @@ async def crear_cliente(
     
     try:
         # Verificar si el cliente ya existe
-        existing = supabase.table("cliente").select("*").eq("ci_cliente", cliente.ci_cliente).execute()
+        existing = await execute_async(supabase.table("cliente").select("*").eq("ci_cliente", cliente.ci_cliente))
         if existing.data:
             raise HTTPException(status_code=400, detail="Ya existe un cliente con ese CI")
         
@@ -38,7 +38,7 @@ async def crear_cliente(
             cliente_data["presupuesto_max_cliente"] = float(cliente_data["presupuesto_max_cliente"])
         
         # Insertar cliente
-        result = supabase.table("cliente").insert(cliente_data).execute()
+        result = await execute_async(supabase.table("cliente").insert(cliente_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear el cliente")
@@ -93,7 +93,7 @@ async def listar_clientes(
             query_count = query_count.or_(f"nombres_completo_cliente.ilike.%{search}%,ci_cliente.ilike.%{search}%")
         
         # Obtener total
-        count_result = query_count.execute()
+        count_result = await execute_async(query_count)
         total = count_result.count if hasattr(count_result, 'count') else len(count_result.data)
         
         # 🔹 PASO 2: Construir query para datos paginados
@@ -115,7 +115,7 @@ async def listar_clientes(
             query_data = query_data.or_(f"nombres_completo_cliente.ilike.%{search}%,ci_cliente.ilike.%{search}%")
         
         # Aplicar paginación y ordenamiento
-        data_result = query_data.order("fecha_registro_cliente", desc=True).range(skip, skip + page_size - 1).execute()
+        data_result = await execute_async(query_data.order("fecha_registro_cliente", desc=True).range(skip, skip + page_size - 1))
         
         # 🔹 PASO 3: Crear respuesta paginada
         return create_paginated_response(
@@ -142,11 +142,12 @@ async def listar_clientes_simple(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("cliente")\
-            .select("*")\
-            .order("nombres_completo_cliente")\
-            .limit(limit)\
-            .execute()
+        result = await execute_async(
+            supabase.table("cliente")
+            .select("*")
+            .order("nombres_completo_cliente")
+            .limit(limit)
+        )
         
         return result.data
     
@@ -165,7 +166,7 @@ async def obtener_cliente(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente).execute()
+        result = await execute_async(supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
@@ -191,7 +192,7 @@ async def actualizar_cliente(
     
     try:
         # Verificar que el cliente existe
-        existing = supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente).execute()
+        existing = await execute_async(supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente))
         if not existing.data:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
@@ -203,7 +204,7 @@ async def actualizar_cliente(
             update_data["presupuesto_max_cliente"] = float(update_data["presupuesto_max_cliente"])
         
         # Actualizar
-        result = supabase.table("cliente").update(update_data).eq("ci_cliente", ci_cliente).execute()
+        result = await execute_async(supabase.table("cliente").update(update_data).eq("ci_cliente", ci_cliente))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al actualizar el cliente")
@@ -228,15 +229,16 @@ async def eliminar_cliente(
     
     try:
         # Verificar que el cliente existe
-        existing = supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente).execute()
+        existing = await execute_async(supabase.table("cliente").select("*").eq("ci_cliente", ci_cliente))
         if not existing.data:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
         # Soft delete
-        result = supabase.table("cliente")\
-            .update({"es_activo_cliente": False})\
-            .eq("ci_cliente", ci_cliente)\
-            .execute()
+        result = await execute_async(
+            supabase.table("cliente")
+            .update({"es_activo_cliente": False})
+            .eq("ci_cliente", ci_cliente)
+        )
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al desactivar el cliente")
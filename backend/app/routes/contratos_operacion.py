@@ -1,12 +1,22 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
-from datetime import date
+from postgrest.exceptions import APIError
 from app.schemas.contrato_operacion import ContratoOperacionCreate, ContratoOperacionUpdate, ContratoOperacionResponse
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.cache import invalidate_tags
+from app.utils.spatial_index import unindex_propiedad
+from app.utils.writes import update_or_404, delete_or_404
+from app.utils.export import stream_export
 
 router = APIRouter()
 
+# Errores de la función `crear_contrato_operacion` (migrations/007_crear_contrato.sql)
+ERRORES_CONTRATO = {
+    "CO404": 404,
+    "CO400": 400,
+}
+
 
 @router.post("/contratos/", response_model=ContratoOperacionResponse, status_code=201)
 async def crear_contrato(
@@ -28,37 +38,14 @@ async def crear_contrato(
     - **fecha_cierre_contrato**: Fecha en que se cerró el negocio
     - **observaciones_contrato**: Notas adicionales
     
-    💡 Al crear un contrato, considera actualizar el estado de la propiedad a "Cerrada"
+    Si el contrato se crea Activo, la propiedad pasa a "Cerrada". Validación,
+    inserción y cierre se hacen en una sola transacción (función
+    `crear_contrato_operacion`, ver migrations/007_crear_contrato.sql): dos
+    contratos simultáneos sobre la misma propiedad no pueden cerrarla ambos.
     """
     supabase = get_supabase_client()
     
     try:
-        # Verificar que la propiedad existe
-        propiedad = supabase.table("propiedad").select("id_propiedad, estado_propiedad, tipo_operacion_propiedad").eq("id_propiedad", contrato.id_propiedad).execute()
-        if not propiedad.data:
-            raise HTTPException(status_code=404, detail="La propiedad especificada no existe")
-        
-        # Verificar que la propiedad no esté ya cerrada
-        if propiedad.data[0].get("estado_propiedad") == "Cerrada":
-            raise HTTPException(status_code=400, detail="La propiedad ya está cerrada")
-        
-        # Verificar que el cliente existe
-        cliente = supabase.table("cliente").select("ci_cliente").eq("ci_cliente", contrato.ci_cliente).execute()
-        if not cliente.data:
-            raise HTTPException(status_code=404, detail="El cliente especificado no existe")
-        
-        # Verificar que el usuario colocador existe
-        colocador = supabase.table("usuario").select("id_usuario").eq("id_usuario", contrato.id_usuario_colocador).execute()
-        if not colocador.data:
-            raise HTTPException(status_code=404, detail="El usuario colocador especificado no existe")
-        
-        # Validar que tipo de operación coincida con la propiedad
-        if propiedad.data[0].get("tipo_operacion_propiedad") != contrato.tipo_operacion_contrato:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"El tipo de operación del contrato debe coincidir con el de la propiedad ({propiedad.data[0].get('tipo_operacion_propiedad')})"
-            )
-        
         # Para alquileres, fecha_fin es obligatoria
         if contrato.tipo_operacion_contrato == "Alquiler" and not contrato.fecha_fin_contrato:
             raise HTTPException(status_code=400, detail="Los contratos de alquiler deben tener fecha de finalización")
@@ -78,21 +65,23 @@ async def crear_contrato(
         if contrato_data.get("fecha_cierre_contrato"):
             contrato_data["fecha_cierre_contrato"] = contrato_data["fecha_cierre_contrato"].isoformat()
         
-        # Insertar contrato
-        result = supabase.table("contratooperacion").insert(contrato_data).execute()
+        # Validar, insertar y cerrar la propiedad en un solo viaje
+        try:
+            result = await execute_async(supabase.rpc("crear_contrato_operacion", {"p_contrato": contrato_data}))
+        except APIError as e:
+            if e.code in ERRORES_CONTRATO:
+                raise HTTPException(status_code=ERRORES_CONTRATO[e.code], detail=e.message)
+            raise
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear el contrato")
         
-        # Si el contrato está activo, actualizar la propiedad a cerrada
         if contrato.estado_contrato == "Activo":
-            supabase.table("propiedad").update({
-                "estado_propiedad": "Cerrada",
-                "fecha_cierre_propiedad": date.today().isoformat(),
-                "id_usuario_colocador": contrato.id_usuario_colocador
-            }).eq("id_propiedad", contrato.id_propiedad).execute()
+            # La propiedad pasa a Cerrada: cambian su detalle y los listados filtrados por estado
+            await invalidate_tags("propiedades", f"propiedad:{contrato.id_propiedad}")
+            unindex_propiedad(contrato.id_propiedad)
         
-        return result.data[0]
+        return result.data
     
     except HTTPException:
         raise
@@ -134,7 +123,7 @@ async def listar_contratos(
             query = query.eq("id_usuario_colocador", id_usuario_colocador)
         
         query = query.order("fecha_cierre_contrato", desc=True).range(skip, skip + limit - 1)
-        result = query.execute()
+        result = await execute_async(query)
         
         return result.data
     
@@ -142,6 +131,35 @@ async def listar_contratos(
         raise HTTPException(status_code=500, detail=f"Error al listar contratos: {str(e)}")
 
 
+@router.get("/contratos/export")
+async def exportar_contratos(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    tipo_operacion: Optional[str] = Query(None, description="Filtrar por tipo de operación"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Exporta todos los contratos (por fecha de cierre, los más recientes primero) en streaming.
+    """
+    supabase = get_supabase_client()
+    
+    def _query():
+        query = supabase.table("contratooperacion").select("*")
+        if estado:
+            query = query.eq("estado_contrato", estado)
+        if tipo_operacion:
+            query = query.eq("tipo_operacion_contrato", tipo_operacion)
+        return query
+    
+    try:
+        return await stream_export(_query, formato, "contratos", "fecha_cierre_contrato", "id_contrato_operacion", columns=list(ContratoOperacionResponse.model_fields))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar contratos: {str(e)}")
+
+
 @router.get("/contratos/{id_contrato}", response_model=ContratoOperacionResponse)
 async def obtener_contrato(
     id_contrato: str,
@@ -153,7 +171,7 @@ async def obtener_contrato(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("contratooperacion").select("*").eq("id_contrato_operacion", id_contrato).execute()
+        result = await execute_async(supabase.table("contratooperacion").select("*").eq("id_contrato_operacion", id_contrato))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Contrato no encontrado")
@@ -177,18 +195,7 @@ async def actualizar_contrato(
     
     ⚠️ Solo se pueden actualizar contratos en estado "Borrador" o "Activo"
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el contrato existe
-        contrato_actual = supabase.table("contratooperacion").select("*").eq("id_contrato_operacion", id_contrato).execute()
-        if not contrato_actual.data:
-            raise HTTPException(status_code=404, detail="Contrato no encontrado")
-        
-        # No permitir editar contratos finalizados o cancelados
-        if contrato_actual.data[0].get("estado_contrato") in ["Finalizado", "Cancelado"]:
-            raise HTTPException(status_code=400, detail="No se pueden editar contratos finalizados o cancelados")
-        
         # Preparar datos para actualización (solo campos no None)
         contrato_data = contrato.model_dump(exclude_unset=True)
         
@@ -204,13 +211,12 @@ async def actualizar_contrato(
             if field in contrato_data and contrato_data[field]:
                 contrato_data[field] = contrato_data[field].isoformat()
         
-        # Actualizar
-        result = supabase.table("contratooperacion").update(contrato_data).eq("id_contrato_operacion", id_contrato).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar el contrato")
-        
-        return result.data[0]
+        # Actualizar (no se editan contratos finalizados o cancelados)
+        return await update_or_404(
+            "contratooperacion", "id_contrato_operacion", id_contrato, contrato_data, "Contrato no encontrado",
+            where=lambda q: q.not_.in_("estado_contrato", ["Finalizado", "Cancelado"]),
+            rule_detail="No se pueden editar contratos finalizados o cancelados"
+        )
     
     except HTTPException:
         raise
@@ -229,23 +235,13 @@ async def eliminar_contrato(
     ⚠️ Esto también eliminará todos los pagos asociados (CASCADE).
     Solo se pueden eliminar contratos en estado "Borrador" o "Cancelado".
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el contrato existe
-        contrato = supabase.table("contratooperacion").select("estado_contrato").eq("id_contrato_operacion", id_contrato).execute()
-        if not contrato.data:
-            raise HTTPException(status_code=404, detail="Contrato no encontrado")
-        
-        # Solo permitir eliminar borradores o cancelados
-        if contrato.data[0].get("estado_contrato") not in ["Borrador", "Cancelado"]:
-            raise HTTPException(status_code=400, detail="Solo se pueden eliminar contratos en estado Borrador o Cancelado")
-        
-        # Eliminar
-        result = supabase.table("contratooperacion").delete().eq("id_contrato_operacion", id_contrato).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar el contrato")
+        # Eliminar solo borradores o cancelados
+        await delete_or_404(
+            "contratooperacion", "id_contrato_operacion", id_contrato, "Contrato no encontrado",
+            where=lambda q: q.in_("estado_contrato", ["Borrador", "Cancelado"]),
+            rule_detail="Solo se pueden eliminar contratos en estado Borrador o Cancelado"
+        )
         
         return None
     
@@ -272,23 +268,23 @@ async def resumen_contrato(
     
     try:
         # Obtener contrato
-        contrato = supabase.table("contratooperacion").select("*").eq("id_contrato_operacion", id_contrato).execute()
+        contrato = await execute_async(supabase.table("contratooperacion").select("*").eq("id_contrato_operacion", id_contrato))
         if not contrato.data:
             raise HTTPException(status_code=404, detail="Contrato no encontrado")
         
         contrato_data = contrato.data[0]
         
         # Obtener propiedad
-        propiedad = supabase.table("propiedad").select("titulo_propiedad, tipo_operacion_propiedad, precio_publicado_propiedad").eq("id_propiedad", contrato_data["id_propiedad"]).execute()
+        propiedad = await execute_async(supabase.table("propiedad").select("titulo_propiedad, tipo_operacion_propiedad, precio_publicado_propiedad").eq("id_propiedad", contrato_data["id_propiedad"]))
         
         # Obtener cliente
-        cliente = supabase.table("cliente").select("nombres_completo_cliente, apellidos_completo_cliente, telefono_cliente").eq("ci_cliente", contrato_data["ci_cliente"]).execute()
+        cliente = await execute_async(supabase.table("cliente").select("nombres_completo_cliente, apellidos_completo_cliente, telefono_cliente").eq("ci_cliente", contrato_data["ci_cliente"]))
         
         # Obtener pagos
-        pagos = supabase.table("pago").select("*").eq("id_contrato_operacion", id_contrato).order("fecha_pago", desc=False).execute()
+        pagos = await execute_async(supabase.table("pago").select("*").eq("id_contrato_operacion", id_contrato).order("fecha_pago", desc=False))
         
-        # Calcular total pagado
-        total_pagado = sum(float(p["monto_pago"]) for p in pagos.data)
+        # Total pagado mantenido por el trigger `pago_saldo_contrato`
+        total_pagado = float(contrato_data["total_pagado_contrato"] or 0)
         precio_contrato = float(contrato_data["precio_cierre_contrato"])
         saldo_pendiente = precio_contrato - total_pagado
         
@@ -302,7 +298,7 @@ async def resumen_contrato(
                 "total_pagado": total_pagado,
                 "saldo_pendiente": saldo_pendiente,
                 "porcentaje_pagado": (total_pagado / precio_contrato * 100) if precio_contrato > 0 else 0,
-                "numero_pagos": len(pagos.data)
+                "numero_pagos": contrato_data["numero_pagos_contrato"]
             }
         }
     
@@ -0,0 +1,49 @@
+"""
+Router del dashboard: contadores y listas cortas en un solo request
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from datetime import date
+from app.database import get_supabase_client, execute_async
+from app.utils.dependencies import get_current_active_user
+from app.utils.cache import cached
+
+router = APIRouter()
+
+# Las escrituras que invalidan estos tags refrescan el resumen antes del TTL
+# (contratos y pagos no usan tags: sus cambios aparecen al vencer el TTL)
+TAGS_DASHBOARD = ["propiedades", "clientes", "citas"]
+
+
+@router.get("/dashboard/resumen", response_model=dict)
+@cached("dashboard", ttl=30, tags=lambda _: TAGS_DASHBOARD)
+async def obtener_resumen_dashboard(
+    limite: int = Query(5, ge=1, le=20, description="Largo de las listas de próximas citas y pagos recientes"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Resumen del dashboard calculado en la base de datos (función `dashboard_resumen`).
+    
+    Reemplaza las cinco consultas que hacía el dashboard (propiedades, clientes,
+    citas, contratos y pagos) por un único JSON de pocos KB:
+    
+    - **propiedades**: total y disponibles (no cerradas)
+    - **propiedades_por_tipo**: cantidad por tipo de operación
+    - **clientes**: total
+    - **citas**: citas de hoy y de los próximos 7 días
+    - **proximas_citas**: las próximas `limite` citas
+    - **contratos** / **contratos_por_estado**: activos, monto activo y conteo por estado
+    - **ventas_por_mes**: contratos y monto de los últimos 6 meses
+    - **pagos_mes** / **pagos_recientes**: pagos cobrados del mes y los últimos `limite` pagos
+    
+    Se cachea 30 segundos.
+    """
+    supabase = get_supabase_client()
+    
+    try:
+        result = await execute_async(
+            supabase.rpc("dashboard_resumen", {"p_hoy": date.today().isoformat(), "p_limite": limite})
+        )
+        return result.data
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener el resumen del dashboard: {str(e)}")
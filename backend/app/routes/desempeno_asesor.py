@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from app.schemas.desempeno_asesor import DesempenoAsesorCreate, DesempenoAsesorUpdate, DesempenoAsesorResponse
-from app.database import get_supabase_client
+from app.schemas.pagination import paginate_query
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.writes import update_or_404, delete_or_404
 
 router = APIRouter()
 
@@ -29,12 +31,12 @@ async def registrar_desempeno(
     
     try:
         # Verificar que el asesor existe
-        asesor = supabase.table("usuario").select("id_usuario").eq("id_usuario", desempeno.id_usuario_asesor).execute()
+        asesor = await execute_async(supabase.table("usuario").select("id_usuario").eq("id_usuario", desempeno.id_usuario_asesor))
         if not asesor.data:
             raise HTTPException(status_code=404, detail="El asesor especificado no existe")
         
         # Verificar que no exista un registro para este asesor y periodo
-        existing = supabase.table("desempenoasesor").select("id_desempeno").eq("id_usuario_asesor", desempeno.id_usuario_asesor).eq("periodo_desempeno", desempeno.periodo_desempeno).execute()
+        existing = await execute_async(supabase.table("desempenoasesor").select("id_desempeno").eq("id_usuario_asesor", desempeno.id_usuario_asesor).eq("periodo_desempeno", desempeno.periodo_desempeno))
         if existing.data:
             raise HTTPException(status_code=400, detail=f"Ya existe un registro de desempeño para este asesor en el periodo {desempeno.periodo_desempeno}")
         
@@ -42,7 +44,7 @@ async def registrar_desempeno(
         desempeno_data = desempeno.model_dump()
         
         # Insertar desempeño
-        result = supabase.table("desempenoasesor").insert(desempeno_data).execute()
+        result = await execute_async(supabase.table("desempenoasesor").insert(desempeno_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al registrar el desempeño")
@@ -81,7 +83,7 @@ async def listar_desempenos(
             query = query.eq("periodo_desempeno", periodo)
         
         query = query.order("periodo_desempeno", desc=True).range(skip, skip + limit - 1)
-        result = query.execute()
+        result = await execute_async(query)
         
         return result.data
     
@@ -100,7 +102,7 @@ async def obtener_desempeno(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("desempenoasesor").select("*").eq("id_desempeno", id_desempeno).execute()
+        result = await execute_async(supabase.table("desempenoasesor").select("*").eq("id_desempeno", id_desempeno))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Registro de desempeño no encontrado")
@@ -122,14 +124,7 @@ async def actualizar_desempeno(
     """
     Actualiza los datos de un registro de desempeño existente.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el desempeño existe
-        desempeno_actual = supabase.table("desempenoasesor").select("*").eq("id_desempeno", id_desempeno).execute()
-        if not desempeno_actual.data:
-            raise HTTPException(status_code=404, detail="Registro de desempeño no encontrado")
-        
         # Preparar datos para actualización (solo campos no None)
         desempeno_data = desempeno.model_dump(exclude_unset=True)
         
@@ -137,12 +132,7 @@ async def actualizar_desempeno(
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
         # Actualizar
-        result = supabase.table("desempenoasesor").update(desempeno_data).eq("id_desempeno", id_desempeno).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar el desempeño")
-        
-        return result.data[0]
+        return await update_or_404("desempenoasesor", "id_desempeno", id_desempeno, desempeno_data, "Registro de desempeño no encontrado")
     
     except HTTPException:
         raise
@@ -158,19 +148,9 @@ async def eliminar_desempeno(
     """
     Elimina un registro de desempeño.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el desempeño existe
-        desempeno = supabase.table("desempenoasesor").select("id_desempeno").eq("id_desempeno", id_desempeno).execute()
-        if not desempeno.data:
-            raise HTTPException(status_code=404, detail="Registro de desempeño no encontrado")
-        
         # Eliminar
-        result = supabase.table("desempenoasesor").delete().eq("id_desempeno", id_desempeno).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar el desempeño")
+        await delete_or_404("desempenoasesor", "id_desempeno", id_desempeno, "Registro de desempeño no encontrado")
         
         return None
     
@@ -190,28 +170,45 @@ async def ranking_asesores(
     Obtiene un ranking de los mejores asesores basado en operaciones cerradas.
     
     Ordena por número de operaciones cerradas (descendente).
+    
+    - Con **periodo**: ranking de ese periodo, con los datos del asesor embebidos
+    - Sin **periodo**: ranking acumulado de todos los periodos, calculado en la BD
+      (función `ranking_asesores_total`, ver `migrations/001_ranking_asesores.sql`)
+    
+    En ambos casos se resuelve en una sola consulta, sin importar el valor de `top`.
     """
     supabase = get_supabase_client()
     
     try:
-        query = supabase.table("desempenoasesor").select("*")
+        ranking = []
         
         if periodo:
-            query = query.eq("periodo_desempeno", periodo)
-        
-        query = query.order("operaciones_cerradas_desempeno", desc=True).limit(top)
-        result = query.execute()
-        
-        # Enriquecer con datos del asesor
-        ranking = []
-        for idx, desempeno in enumerate(result.data, 1):
-            asesor = supabase.table("usuario").select("nombre_usuario, ci_empleado").eq("id_usuario", desempeno["id_usuario_asesor"]).execute()
+            result = await execute_async(
+                supabase.table("desempenoasesor")
+                .select("*, usuario(nombre_usuario, ci_empleado)")
+                .eq("periodo_desempeno", periodo)
+                .order("operaciones_cerradas_desempeno", desc=True)
+                .limit(top)
+            )
+            
+            for idx, desempeno in enumerate(result.data, 1):
+                asesor = desempeno.pop("usuario", None)
+                ranking.append({
+                    "posicion": idx,
+                    "asesor": asesor,
+                    "desempeno": desempeno
+                })
+        else:
+            result = await execute_async(supabase.rpc("ranking_asesores_total", {"p_top": top}))
             
-            ranking.append({
-                "posicion": idx,
-                "asesor": asesor.data[0] if asesor.data else None,
-                "desempeno": desempeno
-            })
+            for idx, fila in enumerate(result.data, 1):
+                nombre_usuario = fila.pop("nombre_usuario", None)
+                ci_empleado = fila.pop("ci_empleado", None)
+                ranking.append({
+                    "posicion": idx,
+                    "asesor": {"nombre_usuario": nombre_usuario, "ci_empleado": ci_empleado} if nombre_usuario else None,
+                    "desempeno": fila
+                })
         
         return {
             "periodo": periodo or "Todos",
@@ -226,39 +223,46 @@ async def ranking_asesores(
 @router.get("/desempeno/asesor/{id_usuario_asesor}/historico")
 async def historico_asesor(
     id_usuario_asesor: str,
+    incluir_detalle: bool = Query(False, description="Incluir los periodos (paginados) además de los totales"),
+    page: int = Query(1, ge=1, description="Página del detalle"),
+    page_size: int = Query(24, ge=1, le=100, description="Periodos por página del detalle"),
+    cursor: Optional[str] = Query(None, description="Cursor del detalle (paginación keyset)"),
     current_user = Depends(get_current_active_user)
 ):
     """
-    Obtiene el histórico completo de desempeño de un asesor.
+    Obtiene el histórico de desempeño de un asesor.
+    
+    Los totales se calculan en la base de datos (función `resumen_desempeno_asesor`),
+    así la respuesta no crece con los años de histórico. Con **incluir_detalle**
+    se agrega `historico` como página de periodos (más recientes primero).
     """
     supabase = get_supabase_client()
     
     try:
         # Verificar que el asesor existe
-        asesor = supabase.table("usuario").select("nombre_usuario, ci_empleado").eq("id_usuario", id_usuario_asesor).execute()
+        asesor = await execute_async(supabase.table("usuario").select("nombre_usuario, ci_empleado").eq("id_usuario", id_usuario_asesor))
         if not asesor.data:
             raise HTTPException(status_code=404, detail="Asesor no encontrado")
         
-        # Obtener todos los registros de desempeño
-        desempenos = supabase.table("desempenoasesor").select("*").eq("id_usuario_asesor", id_usuario_asesor).order("periodo_desempeno", desc=True).execute()
-        
-        # Calcular totales
-        total_captaciones = sum(d["captaciones_desempeno"] for d in desempenos.data)
-        total_publicaciones = sum(d["publicaciones_desempeno"] for d in desempenos.data)
-        total_visitas = sum(d["visitas_agendadas_desempeno"] for d in desempenos.data)
-        total_operaciones = sum(d["operaciones_cerradas_desempeno"] for d in desempenos.data)
+        # Totales agregados en la BD
+        resumen = (await execute_async(supabase.rpc("resumen_desempeno_asesor", {"p_id_usuario": id_usuario_asesor}))).data
+        total_periodos = resumen.pop("total_periodos")
         
-        return {
+        respuesta = {
             "asesor": asesor.data[0],
-            "total_periodos": len(desempenos.data),
-            "resumen_total": {
-                "captaciones": total_captaciones,
-                "publicaciones": total_publicaciones,
-                "visitas": total_visitas,
-                "operaciones_cerradas": total_operaciones
-            },
-            "historico": desempenos.data
+            "total_periodos": total_periodos,
+            "resumen_total": resumen
         }
+        
+        if incluir_detalle:
+            query = (
+                supabase.table("desempenoasesor")
+                .select("*", count=None if cursor else "exact")
+                .eq("id_usuario_asesor", id_usuario_asesor)
+            )
+            respuesta["historico"] = await paginate_query(query, page, page_size, cursor, "periodo_desempeno", "id_desempeno")
+        
+        return respuesta
     
     except HTTPException:
         raise
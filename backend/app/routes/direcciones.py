@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.schemas.direccion import DireccionCreate, DireccionUpdate, DireccionResponse
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.cache import invalidate_tags
+from app.utils.spatial_index import refresh_map_index
+from app.utils.writes import update_or_404, delete_or_404
+from app.utils.bulk import BulkReport, validate_rows, insert_rows
 
 router = APIRouter()
 
@@ -24,17 +28,8 @@ async def crear_direccion(
     supabase = get_supabase_client()
     
     try:
-        # Preparar datos para inserción
-        direccion_data = direccion.model_dump()
-        
-        # Convertir Decimal a float para Supabase
-        if direccion_data.get("latitud_direccion") is not None:
-            direccion_data["latitud_direccion"] = float(direccion_data["latitud_direccion"])
-        if direccion_data.get("longitud_direccion") is not None:
-            direccion_data["longitud_direccion"] = float(direccion_data["longitud_direccion"])
-        
         # Insertar dirección
-        result = supabase.table("direccion").insert(direccion_data).execute()
+        result = await execute_async(supabase.table("direccion").insert(preparar_direccion_data(direccion)))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear la dirección")
@@ -47,6 +42,44 @@ async def crear_direccion(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 
+def preparar_direccion_data(direccion: DireccionCreate) -> dict:
+    """Fila de `direccion` lista para insertar (también la usan las propiedades)"""
+    direccion_data = direccion.model_dump()
+    
+    # Convertir Decimal a float para Supabase
+    if direccion_data.get("latitud_direccion") is not None:
+        direccion_data["latitud_direccion"] = float(direccion_data["latitud_direccion"])
+    if direccion_data.get("longitud_direccion") is not None:
+        direccion_data["longitud_direccion"] = float(direccion_data["longitud_direccion"])
+    
+    return direccion_data
+
+
+@router.post("/direcciones/bulk", response_model=dict)
+async def crear_direcciones_bulk(
+    direcciones: List[Dict[str, Any]],
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Crea direcciones en lote (cada fila con el formato de `POST /direcciones/`).
+    
+    Devuelve el resultado de cada fila por su índice, con el `id` creado.
+    """
+    try:
+        report = BulkReport(len(direcciones))
+        validos = validate_rows(direcciones, DireccionCreate, report)
+        
+        filas = [(indice, preparar_direccion_data(direccion)) for indice, direccion in validos]
+        await insert_rows("direccion", "id_direccion", filas, report)
+        
+        return report.as_dict()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la carga masiva de direcciones: {str(e)}")
+
+
 @router.get("/direcciones/", response_model=List[DireccionResponse])
 async def listar_direcciones(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
@@ -77,7 +110,7 @@ async def listar_direcciones(
             query = query.ilike("zona_direccion", f"%{zona}%")
         
         # Aplicar paginación y ordenamiento
-        result = query.order("ciudad_direccion").order("zona_direccion").range(skip, skip + limit - 1).execute()
+        result = await execute_async(query.order("ciudad_direccion").order("zona_direccion").range(skip, skip + limit - 1))
         
         return result.data
     
@@ -96,7 +129,7 @@ async def obtener_direccion(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("direccion").select("*").eq("id_direccion", id_direccion).execute()
+        result = await execute_async(supabase.table("direccion").select("*").eq("id_direccion", id_direccion))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Dirección no encontrada")
@@ -120,14 +153,7 @@ async def actualizar_direccion(
     
     Todos los campos son opcionales. Solo se actualizarán los campos proporcionados.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que la dirección existe
-        existing = supabase.table("direccion").select("*").eq("id_direccion", id_direccion).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Dirección no encontrada")
-        
         # Preparar datos para actualización (solo campos no-None)
         update_data = direccion.model_dump(exclude_unset=True)
         
@@ -141,12 +167,13 @@ async def actualizar_direccion(
             update_data["longitud_direccion"] = float(update_data["longitud_direccion"])
         
         # Actualizar dirección
-        result = supabase.table("direccion").update(update_data).eq("id_direccion", id_direccion).execute()
+        direccion_actualizada = await update_or_404("direccion", "id_direccion", id_direccion, update_data, "Dirección no encontrada")
         
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar la dirección")
+        # Las propiedades cacheadas (y los marcadores del mapa) usan la dirección
+        await invalidate_tags(f"direccion:{id_direccion}")
+        await refresh_map_index("id_direccion", [id_direccion])
         
-        return result.data[0]
+        return direccion_actualizada
     
     except HTTPException:
         raise
@@ -167,13 +194,8 @@ async def eliminar_direccion(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que la dirección existe
-        direccion_exist = supabase.table("direccion").select("*").eq("id_direccion", id_direccion).execute()
-        if not direccion_exist.data:
-            raise HTTPException(status_code=404, detail="Dirección no encontrada")
-        
         # Verificar si tiene propiedades asociadas
-        propiedades = supabase.table("propiedad").select("id_propiedad").eq("id_direccion", id_direccion).execute()
+        propiedades = await execute_async(supabase.table("propiedad").select("id_propiedad").eq("id_direccion", id_direccion))
         
         if propiedades.data:
             raise HTTPException(
@@ -181,11 +203,10 @@ async def eliminar_direccion(
                 detail=f"No se puede eliminar la dirección porque tiene {len(propiedades.data)} propiedad(es) asociada(s)"
             )
         
-        # Eliminar dirección
-        result = supabase.table("direccion").delete().eq("id_direccion", id_direccion).execute()
+        # Eliminar dirección (404 si no existe)
+        await delete_or_404("direccion", "id_direccion", id_direccion, "Dirección no encontrada")
         
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar la dirección")
+        await invalidate_tags(f"direccion:{id_direccion}")
         
         return {
             "message": "Dirección eliminada exitosamente",
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from app.schemas.documento_propiedad import DocumentoPropiedadCreate, DocumentoPropiedadUpdate, DocumentoPropiedadResponse
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.writes import update_or_404, delete_or_404
 
 router = APIRouter()
 
@@ -27,7 +28,7 @@ async def crear_documento_propiedad(
     
     try:
         # Verificar que la propiedad existe
-        propiedad = supabase.table("propiedad").select("id_propiedad").eq("id_propiedad", documento.id_propiedad).execute()
+        propiedad = await execute_async(supabase.table("propiedad").select("id_propiedad").eq("id_propiedad", documento.id_propiedad))
         if not propiedad.data:
             raise HTTPException(status_code=404, detail="La propiedad especificada no existe")
         
@@ -35,7 +36,7 @@ async def crear_documento_propiedad(
         documento_data = documento.model_dump()
         
         # Insertar documento
-        result = supabase.table("documentopropiedad").insert(documento_data).execute()
+        result = await execute_async(supabase.table("documentopropiedad").insert(documento_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al registrar el documento")
@@ -74,7 +75,7 @@ async def listar_documentos(
             query = query.eq("tipo_documento", tipo_documento)
         
         # Ordenar por fecha de subida (más recientes primero)
-        result = query.order("fecha_subida_documento", desc=True).range(skip, skip + limit - 1).execute()
+        result = await execute_async(query.order("fecha_subida_documento", desc=True).range(skip, skip + limit - 1))
         
         return result.data
     
@@ -93,7 +94,7 @@ async def obtener_documento(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("documentopropiedad").select("*").eq("id_documento", id_documento).execute()
+        result = await execute_async(supabase.table("documentopropiedad").select("*").eq("id_documento", id_documento))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Documento no encontrado")
@@ -120,14 +121,7 @@ async def actualizar_documento(
     - Cambiar ruta del archivo (si se reemplaza)
     - Agregar/modificar observaciones
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el documento existe
-        existing = supabase.table("documentopropiedad").select("*").eq("id_documento", id_documento).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Documento no encontrado")
-        
         # Preparar datos para actualización
         update_data = documento.model_dump(exclude_unset=True)
         
@@ -135,12 +129,7 @@ async def actualizar_documento(
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
         # Actualizar documento
-        result = supabase.table("documentopropiedad").update(update_data).eq("id_documento", id_documento).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar el documento")
-        
-        return result.data[0]
+        return await update_or_404("documentopropiedad", "id_documento", id_documento, update_data, "Documento no encontrado")
     
     except HTTPException:
         raise
@@ -159,24 +148,14 @@ async def eliminar_documento(
     ⚠️ Nota: Esto NO elimina el archivo físico del storage.
     Deberás eliminarlo manualmente del servicio de almacenamiento.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el documento existe
-        documento = supabase.table("documentopropiedad").select("*").eq("id_documento", id_documento).execute()
-        if not documento.data:
-            raise HTTPException(status_code=404, detail="Documento no encontrado")
-        
-        # Eliminar documento
-        result = supabase.table("documentopropiedad").delete().eq("id_documento", id_documento).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar el documento")
+        # Eliminar documento (el DELETE devuelve la fila eliminada)
+        documento = await delete_or_404("documentopropiedad", "id_documento", id_documento, "Documento no encontrado")
         
         return {
             "message": "Documento eliminado exitosamente de la base de datos",
             "id_documento": id_documento,
-            "ruta_archivo": documento.data[0]["ruta_archivo_documento"],
+            "ruta_archivo": documento["ruta_archivo_documento"],
             "nota": "Recuerda eliminar el archivo físico del storage si es necesario"
         }
     
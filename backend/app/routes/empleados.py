@@ -4,13 +4,14 @@ Router para endpoints de Empleados
 from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
 
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.schemas.empleado import (
     EmpleadoCreate,
     EmpleadoUpdate,
     EmpleadoResponse
 )
 from app.utils.dependencies import get_current_active_user
+from app.utils.writes import update_or_404
 
 router = APIRouter()
 
@@ -28,7 +29,7 @@ async def crear_empleado(
     
     try:
         # Verificar si el empleado ya existe
-        existing = supabase.table("empleado").select("*").eq("ci_empleado", empleado.ci_empleado).execute()
+        existing = await execute_async(supabase.table("empleado").select("*").eq("ci_empleado", empleado.ci_empleado))
         
         if existing.data and len(existing.data) > 0:
             raise HTTPException(
@@ -47,7 +48,7 @@ async def crear_empleado(
             "es_activo_empleado": True
         }
         
-        response = supabase.table("empleado").insert(nuevo_empleado).execute()
+        response = await execute_async(supabase.table("empleado").insert(nuevo_empleado))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -89,7 +90,7 @@ async def listar_empleados(
         if activos_solo:
             query = query.eq("es_activo_empleado", True)
         
-        response = query.range(skip, skip + limit - 1).execute()
+        response = await execute_async(query.range(skip, skip + limit - 1))
         return response.data
         
     except Exception as e:
@@ -111,7 +112,7 @@ async def obtener_empleado(
     supabase = get_supabase_client()
     
     try:
-        response = supabase.table("empleado").select("*").eq("ci_empleado", ci_empleado).execute()
+        response = await execute_async(supabase.table("empleado").select("*").eq("ci_empleado", ci_empleado))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -140,18 +141,7 @@ async def actualizar_empleado(
     Actualizar un empleado existente
     Requiere autenticación
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar si el empleado existe
-        existing = supabase.table("empleado").select("*").eq("ci_empleado", ci_empleado).execute()
-        
-        if not existing.data or len(existing.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Empleado no encontrado"
-            )
-        
         # Preparar datos para actualizar (solo los campos que no son None)
         update_data = {}
         
@@ -179,16 +169,8 @@ async def actualizar_empleado(
                 detail="No hay datos para actualizar"
             )
         
-        # Actualizar empleado
-        response = supabase.table("empleado").update(update_data).eq("ci_empleado", ci_empleado).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al actualizar empleado"
-            )
-        
-        return response.data[0]
+        # Actualizar empleado (404 si no existe)
+        return await update_or_404("empleado", "ci_empleado", ci_empleado, update_data, "Empleado no encontrado")
         
     except HTTPException:
         raise
@@ -211,17 +193,8 @@ async def desactivar_empleado(
     supabase = get_supabase_client()
     
     try:
-        # Verificar si el empleado existe
-        existing = supabase.table("empleado").select("*").eq("ci_empleado", ci_empleado).execute()
-        
-        if not existing.data or len(existing.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Empleado no encontrado"
-            )
-        
         # Verificar si el empleado tiene usuarios asociados activos
-        usuarios = supabase.table("usuario").select("*").eq("ci_empleado", ci_empleado).eq("es_activo_usuario", True).execute()
+        usuarios = await execute_async(supabase.table("usuario").select("*").eq("ci_empleado", ci_empleado).eq("es_activo_usuario", True))
         
         if usuarios.data and len(usuarios.data) > 0:
             raise HTTPException(
@@ -229,14 +202,8 @@ async def desactivar_empleado(
                 detail="No se puede desactivar el empleado porque tiene usuarios activos asociados"
             )
         
-        # Desactivar empleado
-        response = supabase.table("empleado").update({"es_activo_empleado": False}).eq("ci_empleado", ci_empleado).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al desactivar empleado"
-            )
+        # Desactivar empleado (404 si no existe)
+        await update_or_404("empleado", "ci_empleado", ci_empleado, {"es_activo_empleado": False}, "Empleado no encontrado")
         
         return {"message": "Empleado desactivado exitosamente", "ci_empleado": ci_empleado}
         
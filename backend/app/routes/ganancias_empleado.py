@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
 from typing import List, Optional
 from app.schemas.ganancia_empleado import GananciaEmpleadoCreate, GananciaEmpleadoUpdate, GananciaEmpleadoResponse
-from app.database import get_supabase_client
+from app.schemas.pagination import paginate_query
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.idempotency import begin_idempotent, finish_idempotent
+from app.utils.references import Reference, fetch_references
+from app.utils.writes import update_or_404, delete_or_404
 
 router = APIRouter()
 
+# IDs por UPDATE ... WHERE id_ganancia IN (...) (acota el largo de la URL)
+MARCAR_PAGADAS_CHUNK = 200
+
 
 @router.post("/ganancias/", response_model=GananciaEmpleadoResponse, status_code=201)
 async def registrar_ganancia(
@@ -28,15 +35,11 @@ async def registrar_ganancia(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que la propiedad existe
-        propiedad = supabase.table("propiedad").select("id_propiedad, titulo_propiedad").eq("id_propiedad", ganancia.id_propiedad).execute()
-        if not propiedad.data:
-            raise HTTPException(status_code=404, detail="La propiedad especificada no existe")
-        
-        # Verificar que el empleado existe
-        empleado = supabase.table("usuario").select("id_usuario").eq("id_usuario", ganancia.id_usuario_empleado).execute()
-        if not empleado.data:
-            raise HTTPException(status_code=404, detail="El empleado especificado no existe")
+        # Verificar propiedad y empleado (en paralelo)
+        await fetch_references(
+            Reference("propiedad", "id_propiedad", ganancia.id_propiedad, "La propiedad especificada no existe", "id_propiedad"),
+            Reference("usuario", "id_usuario", ganancia.id_usuario_empleado, "El empleado especificado no existe", "id_usuario"),
+        )
         
         # Preparar datos para inserción
         ganancia_data = ganancia.model_dump()
@@ -50,7 +53,7 @@ async def registrar_ganancia(
             ganancia_data["fecha_cierre_ganancia"] = ganancia_data["fecha_cierre_ganancia"].isoformat()
         
         # Insertar ganancia
-        result = supabase.table("gananciaempleado").insert(ganancia_data).execute()
+        result = await execute_async(supabase.table("gananciaempleado").insert(ganancia_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al registrar la ganancia")
@@ -97,7 +100,7 @@ async def listar_ganancias(
             query = query.eq("esta_concretado_ganancia", False)
         
         query = query.order("fecha_cierre_ganancia", desc=True).range(skip, skip + limit - 1)
-        result = query.execute()
+        result = await execute_async(query)
         
         return result.data
     
@@ -116,7 +119,7 @@ async def obtener_ganancia(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("gananciaempleado").select("*").eq("id_ganancia", id_ganancia).execute()
+        result = await execute_async(supabase.table("gananciaempleado").select("*").eq("id_ganancia", id_ganancia))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Ganancia no encontrada")
@@ -140,14 +143,7 @@ async def actualizar_ganancia(
     
     Típicamente usado para marcar como "concretado" cuando se paga.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que la ganancia existe
-        ganancia_actual = supabase.table("gananciaempleado").select("*").eq("id_ganancia", id_ganancia).execute()
-        if not ganancia_actual.data:
-            raise HTTPException(status_code=404, detail="Ganancia no encontrada")
-        
         # Preparar datos para actualización (solo campos no None)
         ganancia_data = ganancia.model_dump(exclude_unset=True)
         
@@ -165,12 +161,7 @@ async def actualizar_ganancia(
             ganancia_data["fecha_cierre_ganancia"] = ganancia_data["fecha_cierre_ganancia"].isoformat()
         
         # Actualizar
-        result = supabase.table("gananciaempleado").update(ganancia_data).eq("id_ganancia", id_ganancia).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar la ganancia")
-        
-        return result.data[0]
+        return await update_or_404("gananciaempleado", "id_ganancia", id_ganancia, ganancia_data, "Ganancia no encontrada")
     
     except HTTPException:
         raise
@@ -188,23 +179,13 @@ async def eliminar_ganancia(
     
     ⚠️ Solo se recomienda eliminar ganancias no concretadas
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que la ganancia existe
-        ganancia = supabase.table("gananciaempleado").select("esta_concretado_ganancia").eq("id_ganancia", id_ganancia).execute()
-        if not ganancia.data:
-            raise HTTPException(status_code=404, detail="Ganancia no encontrada")
-        
-        # Advertir si se intenta eliminar una ganancia ya pagada
-        if ganancia.data[0].get("esta_concretado_ganancia"):
-            raise HTTPException(status_code=400, detail="No se recomienda eliminar ganancias ya pagadas")
-        
-        # Eliminar
-        result = supabase.table("gananciaempleado").delete().eq("id_ganancia", id_ganancia).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar la ganancia")
+        # Eliminar solo ganancias no pagadas
+        await delete_or_404(
+            "gananciaempleado", "id_ganancia", id_ganancia, "Ganancia no encontrada",
+            where=lambda q: q.not_.is_("esta_concretado_ganancia", "true"),
+            rule_detail="No se recomienda eliminar ganancias ya pagadas"
+        )
         
         return None
     
@@ -217,87 +198,128 @@ async def eliminar_ganancia(
 @router.post("/ganancias/marcar-pagadas")
 async def marcar_ganancias_pagadas(
     ids_ganancias: List[str],
+    idempotency_key: Optional[str] = Header(None, description="Clave para reintentar el lote sin reprocesarlo"),
     current_user = Depends(get_current_active_user)
 ):
     """
     Marca múltiples ganancias como pagadas (concretadas) en lote.
     
-    Útil para procesar pagos masivos.
+    Útil para procesar pagos masivos. Se hace un UPDATE por bloque de
+    hasta 200 IDs y el estado de cada ID sale de comparar las filas devueltas:
+    
+    - **pagado**: se marcó en este request
+    - **ya_pagado**: ya estaba concretada (no se vuelve a procesar)
+    - **no_encontrado**: el ID no existe
+    
+    Con el header **Idempotency-Key**, un reintento del mismo lote devuelve
+    la respuesta original.
     """
     supabase = get_supabase_client()
+    scope = f"marcar-pagadas:{current_user['id_usuario']}"
+    
+    respuesta_previa = await begin_idempotent(scope, idempotency_key, ids_ganancias)
+    if respuesta_previa is not None:
+        return respuesta_previa
     
     try:
-        resultados = []
+        ids_unicos = list(dict.fromkeys(ids_ganancias))
+        pagados = set()
         
-        for id_ganancia in ids_ganancias:
-            result = supabase.table("gananciaempleado").update({
-                "esta_concretado_ganancia": True
-            }).eq("id_ganancia", id_ganancia).execute()
-            
-            if result.data:
-                resultados.append({"id_ganancia": id_ganancia, "status": "pagado"})
-            else:
-                resultados.append({"id_ganancia": id_ganancia, "status": "error"})
+        for i in range(0, len(ids_unicos), MARCAR_PAGADAS_CHUNK):
+            bloque = ids_unicos[i:i + MARCAR_PAGADAS_CHUNK]
+            # Solo las pendientes (false o NULL): las ya pagadas no se tocan
+            result = await execute_async(
+                supabase.table("gananciaempleado")
+                .update({"esta_concretado_ganancia": True})
+                .in_("id_ganancia", bloque)
+                .not_.is_("esta_concretado_ganancia", "true")
+            )
+            pagados.update(row["id_ganancia"] for row in result.data)
         
-        exitosos = len([r for r in resultados if r["status"] == "pagado"])
+        # Los no actualizados están ya pagados o no existen
+        restantes = [id_ganancia for id_ganancia in ids_unicos if id_ganancia not in pagados]
+        existentes = set()
+        for i in range(0, len(restantes), MARCAR_PAGADAS_CHUNK):
+            bloque = restantes[i:i + MARCAR_PAGADAS_CHUNK]
+            result = await execute_async(supabase.table("gananciaempleado").select("id_ganancia").in_("id_ganancia", bloque))
+            existentes.update(row["id_ganancia"] for row in result.data)
         
-        return {
-            "total_procesados": len(ids_ganancias),
-            "exitosos": exitosos,
-            "fallidos": len(ids_ganancias) - exitosos,
+        resultados = []
+        for id_ganancia in ids_unicos:
+            if id_ganancia in pagados:
+                estado = "pagado"
+            elif id_ganancia in existentes:
+                estado = "ya_pagado"
+            else:
+                estado = "no_encontrado"
+            resultados.append({"id_ganancia": id_ganancia, "status": estado})
+        
+        respuesta = {
+            "total_procesados": len(ids_unicos),
+            "exitosos": len(pagados),
+            "ya_pagados": len(existentes),
+            "fallidos": len(ids_unicos) - len(pagados) - len(existentes),
             "detalles": resultados
         }
     
     except Exception as e:
+        await finish_idempotent(scope, idempotency_key, ids_ganancias, None)
         raise HTTPException(status_code=500, detail=f"Error al marcar ganancias como pagadas: {str(e)}")
+    
+    await finish_idempotent(scope, idempotency_key, ids_ganancias, respuesta)
+    return respuesta
 
 
 @router.get("/ganancias/empleado/{id_usuario}/resumen")
 async def resumen_ganancias_empleado(
     id_usuario: str,
+    incluir_detalle: bool = Query(False, description="Incluir las ganancias (paginadas) además de los totales"),
+    page: int = Query(1, ge=1, description="Página del detalle"),
+    page_size: int = Query(30, ge=1, le=100, description="Ganancias por página del detalle"),
+    cursor: Optional[str] = Query(None, description="Cursor del detalle (paginación keyset)"),
     current_user = Depends(get_current_active_user)
 ):
     """
     Obtiene un resumen de las ganancias de un empleado específico.
+    
+    Los totales se calculan en la base de datos (función `resumen_ganancias_empleado`).
+    Con **incluir_detalle** se agrega `ganancias` como página de registros
+    (más recientes primero).
     """
     supabase = get_supabase_client()
     
     try:
         # Verificar que el empleado existe
-        empleado = supabase.table("usuario").select("nombre_usuario, ci_empleado").eq("id_usuario", id_usuario).execute()
+        empleado = await execute_async(supabase.table("usuario").select("nombre_usuario, ci_empleado").eq("id_usuario", id_usuario))
         if not empleado.data:
             raise HTTPException(status_code=404, detail="Empleado no encontrado")
         
-        # Obtener todas las ganancias del empleado
-        ganancias = supabase.table("gananciaempleado").select("*").eq("id_usuario_empleado", id_usuario).execute()
-        
-        # Calcular totales
-        total_ganancias = sum(float(g["dinero_ganado_ganancia"]) for g in ganancias.data)
-        total_pagado = sum(float(g["dinero_ganado_ganancia"]) for g in ganancias.data if g["esta_concretado_ganancia"])
-        total_pendiente = total_ganancias - total_pagado
+        # Totales agregados en la BD
+        resumen = (await execute_async(supabase.rpc("resumen_ganancias_empleado", {"p_id_usuario": id_usuario}))).data
+        total_ganancias = float(resumen["total_ganancias"])
+        total_pagado = float(resumen["total_pagado"])
         
-        # Agrupar por tipo de operación
-        por_tipo = {
-            "Captación": 0.0,
-            "Colocación": 0.0,
-            "Ambas": 0.0
-        }
-        for g in ganancias.data:
-            tipo = g["tipo_operacion_ganancia"]
-            por_tipo[tipo] = por_tipo.get(tipo, 0.0) + float(g["dinero_ganado_ganancia"])
-        
-        return {
+        respuesta = {
             "empleado": empleado.data[0],
-            "total_registros": len(ganancias.data),
+            "total_registros": resumen["total_registros"],
             "resumen_financiero": {
                 "total_ganancias": total_ganancias,
                 "total_pagado": total_pagado,
-                "total_pendiente": total_pendiente,
+                "total_pendiente": total_ganancias - total_pagado,
                 "porcentaje_pagado": (total_pagado / total_ganancias * 100) if total_ganancias > 0 else 0
             },
-            "por_tipo_operacion": por_tipo,
-            "ganancias": ganancias.data
+            "por_tipo_operacion": {
+                "Captación": float(resumen["captacion"]),
+                "Colocación": float(resumen["colocacion"]),
+                "Ambas": float(resumen["ambas"])
+            }
         }
+        
+        if incluir_detalle:
+            query = supabase.table("gananciaempleado").select("*", count=None if cursor else "exact").eq("id_usuario_empleado", id_usuario)
+            respuesta["ganancias"] = await paginate_query(query, page, page_size, cursor, "fecha_cierre_ganancia", "id_ganancia")
+        
+        return respuesta
     
     except HTTPException:
         raise
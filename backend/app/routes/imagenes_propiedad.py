@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.schemas.imagen_propiedad import ImagenPropiedadCreate, ImagenPropiedadUpdate, ImagenPropiedadResponse
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.bulk import BulkReport, validate_rows, existing_values, insert_rows
+from app.utils.writes import update_or_404, delete_or_404
 
 router = APIRouter()
 
@@ -27,19 +29,19 @@ async def crear_imagen_propiedad(
     
     try:
         # Verificar que la propiedad existe
-        propiedad = supabase.table("propiedad").select("id_propiedad").eq("id_propiedad", imagen.id_propiedad).execute()
+        propiedad = await execute_async(supabase.table("propiedad").select("id_propiedad").eq("id_propiedad", imagen.id_propiedad))
         if not propiedad.data:
             raise HTTPException(status_code=404, detail="La propiedad especificada no existe")
         
         # Si se marca como portada, desmarcar las demás
         if imagen.es_portada_imagen:
-            supabase.table("imagenpropiedad").update({"es_portada_imagen": False}).eq("id_propiedad", imagen.id_propiedad).execute()
+            await execute_async(supabase.table("imagenpropiedad").update({"es_portada_imagen": False}).eq("id_propiedad", imagen.id_propiedad))
         
         # Preparar datos para inserción
         imagen_data = imagen.model_dump()
         
         # Insertar imagen
-        result = supabase.table("imagenpropiedad").insert(imagen_data).execute()
+        result = await execute_async(supabase.table("imagenpropiedad").insert(imagen_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al registrar la imagen")
@@ -52,6 +54,60 @@ async def crear_imagen_propiedad(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 
+@router.post("/imagenes-propiedad/bulk", response_model=dict)
+async def crear_imagenes_propiedad_bulk(
+    imagenes: List[Dict[str, Any]],
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Registra imágenes en lote (cada fila con el formato de `POST /imagenes-propiedad/`).
+    
+    Si varias imágenes de una misma propiedad vienen como portada, queda
+    como portada la última del lote. Devuelve el resultado de cada fila por su índice.
+    """
+    supabase = get_supabase_client()
+    
+    try:
+        report = BulkReport(len(imagenes))
+        validos = validate_rows(imagenes, ImagenPropiedadCreate, report)
+        
+        # Verificar las propiedades con una sola consulta
+        propiedades = await existing_values("propiedad", "id_propiedad", [i.id_propiedad for _, i in validos])
+        for indice, imagen in validos:
+            if imagen.id_propiedad not in propiedades:
+                report.error(indice, "La propiedad especificada no existe")
+        validos = [(indice, imagen) for indice, imagen in validos if not report.has_error(indice)]
+        
+        # Una sola portada por propiedad: la última del lote
+        ultima_portada = {imagen.id_propiedad: indice for indice, imagen in validos if imagen.es_portada_imagen}
+        
+        filas = []
+        for indice, imagen in validos:
+            imagen_data = imagen.model_dump()
+            imagen_data["es_portada_imagen"] = ultima_portada.get(imagen.id_propiedad) == indice
+            filas.append((indice, imagen_data))
+        
+        insertadas = await insert_rows("imagenpropiedad", "id_imagen", filas, report)
+        
+        # Las portadas anteriores se desmarcan solo donde la nueva quedó insertada:
+        # si su fila falló, la propiedad conserva la portada que tenía
+        for _, fila in insertadas:
+            if fila["es_portada_imagen"]:
+                await execute_async(
+                    supabase.table("imagenpropiedad")
+                    .update({"es_portada_imagen": False})
+                    .eq("id_propiedad", fila["id_propiedad"])
+                    .neq("id_imagen", fila["id_imagen"])
+                )
+        
+        return report.as_dict()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la carga masiva de imágenes: {str(e)}")
+
+
 @router.get("/imagenes-propiedad/", response_model=List[ImagenPropiedadResponse])
 async def listar_imagenes(
     id_propiedad: Optional[str] = Query(None, description="Filtrar por ID de propiedad"),
@@ -73,7 +129,7 @@ async def listar_imagenes(
             query = query.eq("id_propiedad", id_propiedad)
         
         # Ordenar por portada primero, luego por orden
-        result = query.order("es_portada_imagen", desc=True).order("orden_imagen").range(skip, skip + limit - 1).execute()
+        result = await execute_async(query.order("es_portada_imagen", desc=True).order("orden_imagen").range(skip, skip + limit - 1))
         
         return result.data
     
@@ -92,7 +148,7 @@ async def obtener_imagen(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("imagenpropiedad").select("*").eq("id_imagen", id_imagen).execute()
+        result = await execute_async(supabase.table("imagenpropiedad").select("*").eq("id_imagen", id_imagen))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Imagen no encontrada")
@@ -122,29 +178,25 @@ async def actualizar_imagen(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que la imagen existe
-        existing = supabase.table("imagenpropiedad").select("*").eq("id_imagen", id_imagen).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Imagen no encontrada")
-        
         # Preparar datos para actualización
         update_data = imagen.model_dump(exclude_unset=True)
         
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
-        # Si se marca como portada, desmarcar las demás de la misma propiedad
-        if update_data.get("es_portada_imagen") == True:
-            id_propiedad = existing.data[0]["id_propiedad"]
-            supabase.table("imagenpropiedad").update({"es_portada_imagen": False}).eq("id_propiedad", id_propiedad).execute()
-        
         # Actualizar imagen
-        result = supabase.table("imagenpropiedad").update(update_data).eq("id_imagen", id_imagen).execute()
+        imagen_actualizada = await update_or_404("imagenpropiedad", "id_imagen", id_imagen, update_data, "Imagen no encontrada")
         
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar la imagen")
-        
-        return result.data[0]
+        # Si se marca como portada, desmarcar las demás de la misma propiedad
+        if update_data.get("es_portada_imagen") == True:
+            await execute_async(
+                supabase.table("imagenpropiedad")
+                .update({"es_portada_imagen": False})
+                .eq("id_propiedad", imagen_actualizada["id_propiedad"])
+                .neq("id_imagen", id_imagen)
+            )
+        
+        return imagen_actualizada
     
     except HTTPException:
         raise
@@ -163,24 +215,14 @@ async def eliminar_imagen(
     ⚠️ Nota: Esto NO elimina el archivo físico del storage.
     Deberás eliminarlo manualmente del servicio de almacenamiento.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que la imagen existe
-        imagen = supabase.table("imagenpropiedad").select("*").eq("id_imagen", id_imagen).execute()
-        if not imagen.data:
-            raise HTTPException(status_code=404, detail="Imagen no encontrada")
-        
-        # Eliminar imagen
-        result = supabase.table("imagenpropiedad").delete().eq("id_imagen", id_imagen).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar la imagen")
+        # Eliminar imagen (el DELETE devuelve la fila eliminada)
+        imagen = await delete_or_404("imagenpropiedad", "id_imagen", id_imagen, "Imagen no encontrada")
         
         return {
             "message": "Imagen eliminada exitosamente de la base de datos",
             "id_imagen": id_imagen,
-            "url_imagen": imagen.data[0]["url_imagen"],
+            "url_imagen": imagen["url_imagen"],
             "nota": "Recuerda eliminar el archivo físico del storage si es necesario"
         }
     
@@ -0,0 +1,125 @@
+"""
+Router de lookups para selectores/dropdowns de los formularios
+
+GET /api/lookup/{entidad} devuelve pares [id, etiqueta] con un ETag fuerte
+armado con la versión de la tabla (suma de sus contadores, ver
+migrations/009_version_tablas.sql). Si el cliente manda ese ETag en
+If-None-Match y la tabla no cambió, la respuesta es 304 sin cuerpo y sin
+leer la tabla.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from app.database import get_supabase_client, execute_async
+from app.utils.dependencies import get_current_active_user
+
+router = APIRouter()
+
+LOOKUP_MAX = 10000
+
+
+class Lookup(NamedTuple):
+    """Tabla, clave y etiqueta de un lookup"""
+    tabla: str
+    id: str
+    columnas: str
+    orden: str
+    etiqueta: Callable[[dict], str]
+    filtro: Optional[Callable[[Any], Any]] = None
+
+
+def _nombre_con_ci(fila: dict, entidad: str) -> str:
+    return f"{fila[f'nombres_completo_{entidad}']} {fila[f'apellidos_completo_{entidad}']} - CI: {fila[f'ci_{entidad}']}"
+
+
+def _etiqueta_propiedad(fila: dict) -> str:
+    etiqueta = " - ".join(v for v in (fila.get("codigo_publico_propiedad"), fila["titulo_propiedad"]) if v)
+    if fila.get("tipo_operacion_propiedad"):
+        etiqueta += f" ({fila['tipo_operacion_propiedad']})"
+    return etiqueta
+
+
+LOOKUPS: Dict[str, Lookup] = {
+    "clientes": Lookup(
+        "cliente", "ci_cliente",
+        "ci_cliente, nombres_completo_cliente, apellidos_completo_cliente",
+        "nombres_completo_cliente",
+        lambda f: _nombre_con_ci(f, "cliente"),
+    ),
+    "empleados": Lookup(
+        "empleado", "ci_empleado",
+        "ci_empleado, nombres_completo_empleado, apellidos_completo_empleado",
+        "nombres_completo_empleado",
+        lambda f: f"{f['ci_empleado']} - {f['nombres_completo_empleado']} {f['apellidos_completo_empleado']}",
+    ),
+    # Solo las propiedades que aún admiten citas y contratos
+    "propiedades": Lookup(
+        "propiedad", "id_propiedad",
+        "id_propiedad, codigo_publico_propiedad, titulo_propiedad, tipo_operacion_propiedad",
+        "titulo_propiedad",
+        _etiqueta_propiedad,
+        lambda q: q.or_("estado_propiedad.is.null,estado_propiedad.neq.Cerrada"),
+    ),
+    "propietarios": Lookup(
+        "propietario", "ci_propietario",
+        "ci_propietario, nombres_completo_propietario, apellidos_completo_propietario",
+        "nombres_completo_propietario",
+        lambda f: _nombre_con_ci(f, "propietario"),
+    ),
+    "roles": Lookup("rol", "id_rol", "id_rol, nombre_rol", "nombre_rol", lambda f: f["nombre_rol"]),
+    "usuarios": Lookup("usuario", "id_usuario", "id_usuario, nombre_usuario", "nombre_usuario", lambda f: f["nombre_usuario"]),
+}
+
+def _etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    etiquetas = [e.strip() for e in if_none_match.split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+
+@router.get("/lookup/{entidad}")
+async def obtener_lookup(
+    entidad: str,
+    request: Request,
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Lista compacta `[[id, etiqueta], ...]` para los selectores de formularios.
+    
+    Entidades: clientes, empleados, propiedades (no cerradas), propietarios,
+    roles y usuarios.
+    
+    La respuesta trae `ETag` y `Cache-Control: no-cache`: el navegador la
+    guarda y revalida en cada apertura del formulario; mientras la tabla no
+    cambie, el servidor contesta 304 con una sola consulta mínima.
+    """
+    definicion = LOOKUPS.get(entidad)
+    if definicion is None:
+        raise HTTPException(status_code=404, detail=f"Lookup no disponible: {entidad}. Opciones: {', '.join(LOOKUPS)}")
+    
+    supabase = get_supabase_client()
+    
+    try:
+        # La versión se lee antes que los datos: una escritura en medio deja
+        # datos más nuevos que el ETag (nunca más viejos) y se corrige sola
+        version_result = await execute_async(supabase.table("version_tabla").select("version").eq("tabla", definicion.tabla))
+        version = sum(fila["version"] for fila in version_result.data)
+        
+        etag = f'"{entidad}-{version}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        
+        if _etag_coincide(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        query = supabase.table(definicion.tabla).select(definicion.columnas)
+        if definicion.filtro is not None:
+            query = definicion.filtro(query)
+        result = await execute_async(query.order(definicion.orden).limit(LOOKUP_MAX))
+        
+        pares = [[fila[definicion.id], definicion.etiqueta(fila)] for fila in result.data]
+        return JSONResponse(content=pares, headers=headers)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener el lookup: {str(e)}")
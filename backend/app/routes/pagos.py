@@ -2,64 +2,134 @@
 Router para endpoints de Pagos con PAGINACIÓN
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import date
+from postgrest.exceptions import APIError
 from app.schemas.pago import PagoCreate, PagoUpdate, PagoResponse
-from app.schemas.pagination import PaginatedResponse, create_paginated_response
-from app.database import get_supabase_client
+from app.schemas.pagination import PaginatedResponse, paginate_query
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.bulk import BulkReport, validate_rows, fetch_in, insert_rows
+from app.utils.export import stream_export
+from app.utils.writes import update_or_404, delete_or_404
 
 
 router = APIRouter()
 
+# Errores del trigger `pago_saldo_contrato` (migrations/004_saldo_contrato.sql)
+ERRORES_SALDO = {
+    "PA404": 404,
+    "PA400": 400,
+}
+
+
+def _error_saldo(e: APIError) -> Exception:
+    """Traduce un error del trigger de saldo (o de FK del contrato) a HTTPException"""
+    if e.code in ERRORES_SALDO:
+        return HTTPException(status_code=ERRORES_SALDO[e.code], detail=e.message)
+    if e.code == "23503":
+        return HTTPException(status_code=404, detail="El contrato especificado no existe")
+    return e
+
 
 @router.post("/pagos/", response_model=PagoResponse, status_code=201)
 async def registrar_pago(
     pago: PagoCreate,
     current_user = Depends(get_current_active_user)
 ):
-    """Registra un nuevo pago asociado a un contrato."""
+    """
+    Registra un nuevo pago asociado a un contrato.
+    
+    El contrato activo y el límite del precio de cierre los valida el trigger
+    `pago_saldo_contrato` en el mismo INSERT, contra el saldo guardado en el
+    contrato: no se leen los pagos previos y dos pagos concurrentes no pueden
+    superar juntos el precio.
+    """
     supabase = get_supabase_client()
     
     try:
-        # Verificar que el contrato existe y está activo
-        contrato = supabase.table("contratooperacion").select("id_contrato_operacion, estado_contrato, precio_cierre_contrato").eq("id_contrato_operacion", pago.id_contrato_operacion).execute()
-        if not contrato.data:
-            raise HTTPException(status_code=404, detail="El contrato especificado no existe")
-        
-        if contrato.data[0].get("estado_contrato") != "Activo":
-            raise HTTPException(status_code=400, detail="Solo se pueden registrar pagos en contratos activos")
+        try:
+            result = await execute_async(supabase.table("pago").insert(_preparar_pago_data(pago)))
+        except APIError as e:
+            raise _error_saldo(e)
         
-        # Verificar que no se exceda el precio del contrato
-        pagos_existentes = supabase.table("pago").select("monto_pago").eq("id_contrato_operacion", pago.id_contrato_operacion).execute()
-        total_pagado = sum(float(p["monto_pago"]) for p in pagos_existentes.data)
-        precio_contrato = float(contrato.data[0]["precio_cierre_contrato"])
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Error al registrar el pago")
         
-        if total_pagado + float(pago.monto_pago) > precio_contrato:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"El monto total de pagos excedería el precio del contrato"
-            )
+        return result.data[0]
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+def _preparar_pago_data(pago: PagoCreate) -> dict:
+    """Fila de `pago` lista para insertar"""
+    pago_data = pago.model_dump()
+    pago_data["monto_pago"] = float(pago_data["monto_pago"])
+    
+    if pago_data.get("fecha_pago"):
+        pago_data["fecha_pago"] = pago_data["fecha_pago"].isoformat()
+    
+    return pago_data
+
+
+@router.post("/pagos/bulk", response_model=dict)
+async def registrar_pagos_bulk(
+    pagos: List[Dict[str, Any]],
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Registra pagos en lote (cada fila con el formato de `POST /pagos/`).
+    
+    Los contratos (con su saldo pagado) se leen con una sola consulta. Los
+    pagos se validan en el orden del lote: cada uno suma al total de su
+    contrato, y una fila que haría superar el precio de cierre se rechaza.
+    """
+    try:
+        report = BulkReport(len(pagos))
+        validos = validate_rows(pagos, PagoCreate, report)
         
-        # Preparar datos
-        pago_data = pago.model_dump()
-        pago_data["monto_pago"] = float(pago_data["monto_pago"])
+        ids_contratos = [pago.id_contrato_operacion for _, pago in validos]
+        contratos = {
+            c["id_contrato_operacion"]: c
+            for c in await fetch_in("contratooperacion", "id_contrato_operacion", ids_contratos, "id_contrato_operacion, estado_contrato, precio_cierre_contrato, total_pagado_contrato")
+        }
         
-        if pago_data.get("fecha_pago"):
-            pago_data["fecha_pago"] = pago_data["fecha_pago"].isoformat()
+        # Saldo mantenido por el trigger; este pre-chequeo solo da mensajes por
+        # fila, el trigger vuelve a validar cada INSERT
+        total_pagado: Dict[str, float] = {
+            id_contrato: float(c["total_pagado_contrato"] or 0)
+            for id_contrato, c in contratos.items()
+        }
         
-        # Insertar
-        result = supabase.table("pago").insert(pago_data).execute()
+        filas = []
+        for indice, pago in validos:
+            contrato = contratos.get(pago.id_contrato_operacion)
+            if not contrato:
+                report.error(indice, "El contrato especificado no existe")
+                continue
+            if contrato.get("estado_contrato") != "Activo":
+                report.error(indice, "Solo se pueden registrar pagos en contratos activos")
+                continue
+            
+            nuevo_total = total_pagado.get(pago.id_contrato_operacion, 0.0) + float(pago.monto_pago)
+            if nuevo_total > float(contrato["precio_cierre_contrato"]):
+                report.error(indice, "El monto total de pagos excedería el precio del contrato")
+                continue
+            
+            total_pagado[pago.id_contrato_operacion] = nuevo_total
+            filas.append((indice, _preparar_pago_data(pago)))
         
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al registrar el pago")
+        await insert_rows("pago", "id_pago", filas, report)
         
-        return result.data[0]
+        return report.as_dict()
     
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en la carga masiva de pagos: {str(e)}")
 
 
 # ✅ ENDPOINT CON PAGINACIÓN (SIMPLIFICADO)
@@ -69,6 +139,7 @@ async def listar_pagos_paginados(
     page_size: int = Query(30, ge=1, le=100, description="Items por página"),
     id_contrato: Optional[str] = Query(None, description="Filtrar por contrato"),
     estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (paginación keyset)"),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -78,43 +149,23 @@ async def listar_pagos_paginados(
     - **page_size**: Items por página (default: 30, max: 100)
     - **id_contrato**: Filtrar por ID de contrato
     - **estado**: Filtrar por estado (Pendiente, Pagado, Atrasado, Cancelado)
+    - **cursor**: `next_cursor` de la respuesta anterior; pagina por keyset (sin total)
     """
     supabase = get_supabase_client()
     
     try:
-        # 🔹 PASO 1: Obtener TODOS los datos (para contar)
-        query_all = supabase.table("pago").select("id_pago")
-        
-        if id_contrato:
-            query_all = query_all.eq("id_contrato_operacion", id_contrato)
-        if estado:
-            query_all = query_all.eq("estado_pago", estado)
-        
-        all_items = query_all.execute()
-        total = len(all_items.data)
-        
-        # 🔹 PASO 2: Obtener datos paginados
-        skip = (page - 1) * page_size
-        
-        query_paginated = supabase.table("pago").select("*")
+        # Datos y total en un solo request
+        query = supabase.table("pago").select("*", count=None if cursor else "exact")
         
         if id_contrato:
-            query_paginated = query_paginated.eq("id_contrato_operacion", id_contrato)
+            query = query.eq("id_contrato_operacion", id_contrato)
         if estado:
-            query_paginated = query_paginated.eq("estado_pago", estado)
-        
-        query_paginated = query_paginated.order("fecha_pago", desc=True).range(skip, skip + page_size - 1)
-        
-        result = query_paginated.execute()
+            query = query.eq("estado_pago", estado)
         
-        # 🔹 PASO 3: Crear respuesta paginada
-        return create_paginated_response(
-            items=result.data,
-            total=total,
-            page=page,
-            page_size=page_size
-        )
+        return await paginate_query(query, page, page_size, cursor, "fecha_pago", "id_pago")
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar pagos: {str(e)}")
 
@@ -132,12 +183,11 @@ async def listar_pagos_dashboard(
     supabase = get_supabase_client()
     
     try:
-        result = (
+        result = await execute_async(
             supabase.table("pago")
             .select("*")
             .order("fecha_pago", desc=True)
             .limit(limit)
-            .execute()
         )
         return result.data
     
@@ -154,12 +204,11 @@ async def listar_pagos_atrasados(
     
     try:
         hoy = date.today().isoformat()
-        result = (
+        result = await execute_async(
             supabase.table("pago")
             .select("*")
             .eq("estado_pago", "Pendiente")
             .lt("fecha_pago", hoy)
-            .execute()
         )
         
         return {
@@ -171,6 +220,36 @@ async def listar_pagos_atrasados(
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+# ✅ EXPORTACIÓN COMPLETA EN STREAMING (CSV / NDJSON)
+@router.get("/pagos/export")
+async def exportar_pagos(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    id_contrato: Optional[str] = Query(None, description="Filtrar por contrato"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Exporta todos los pagos (con los mismos filtros del listado) en streaming.
+    """
+    supabase = get_supabase_client()
+    
+    def _query():
+        query = supabase.table("pago").select("*")
+        if id_contrato:
+            query = query.eq("id_contrato_operacion", id_contrato)
+        if estado:
+            query = query.eq("estado_pago", estado)
+        return query
+    
+    try:
+        return await stream_export(_query, formato, "pagos", "fecha_pago", "id_pago", columns=list(PagoResponse.model_fields))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar pagos: {str(e)}")
+
+
 @router.get("/pagos/{id_pago}", response_model=PagoResponse)
 async def obtener_pago(
     id_pago: str,
@@ -180,7 +259,7 @@ async def obtener_pago(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("pago").select("*").eq("id_pago", id_pago).execute()
+        result = await execute_async(supabase.table("pago").select("*").eq("id_pago", id_pago))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Pago no encontrado")
@@ -200,14 +279,7 @@ async def actualizar_pago(
     current_user = Depends(get_current_active_user)
 ):
     """Actualiza un pago existente."""
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que existe
-        pago_actual = supabase.table("pago").select("*").eq("id_pago", id_pago).execute()
-        if not pago_actual.data:
-            raise HTTPException(status_code=404, detail="Pago no encontrado")
-        
         # Preparar datos
         pago_data = pago.model_dump(exclude_unset=True)
         
@@ -220,13 +292,11 @@ async def actualizar_pago(
         if "fecha_pago" in pago_data and pago_data["fecha_pago"]:
             pago_data["fecha_pago"] = pago_data["fecha_pago"].isoformat()
         
-        # Actualizar
-        result = supabase.table("pago").update(pago_data).eq("id_pago", id_pago).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar")
-        
-        return result.data[0]
+        # Actualizar (el trigger ajusta el saldo del contrato y valida el precio)
+        try:
+            return await update_or_404("pago", "id_pago", id_pago, pago_data, "Pago no encontrado")
+        except APIError as e:
+            raise _error_saldo(e)
     
     except HTTPException:
         raise
@@ -240,26 +310,13 @@ async def eliminar_pago(
     current_user = Depends(get_current_active_user)
 ):
     """Elimina un pago."""
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que existe
-        pago = supabase.table("pago").select("estado_pago").eq("id_pago", id_pago).execute()
-        if not pago.data:
-            raise HTTPException(status_code=404, detail="Pago no encontrado")
-        
-        # Validar estado
-        if pago.data[0].get("estado_pago") == "Pagado":
-            raise HTTPException(
-                status_code=400, 
-                detail="No se puede eliminar un pago confirmado"
-            )
-        
-        # Eliminar
-        result = supabase.table("pago").delete().eq("id_pago", id_pago).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar")
+        # Eliminar solo si no está confirmado (la regla va en el mismo DELETE)
+        await delete_or_404(
+            "pago", "id_pago", id_pago, "Pago no encontrado",
+            where=lambda q: q.or_("estado_pago.is.null,estado_pago.neq.Pagado"),
+            rule_detail="No se puede eliminar un pago confirmado"
+        )
         
         return None
     
@@ -1,97 +1,68 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
 from app.schemas.propiedad import PropiedadCreate, PropiedadUpdate, PropiedadResponse
-from app.database import get_supabase_client
-from app.utils.dependencies import (
-    get_current_active_user,
-    get_propiedades_cached,
-    set_propiedades_cached,
-    clear_propiedades_cache
-)
+from app.schemas.pagination import apply_keyset, encode_cursor
+from app.database import get_supabase_client, execute_async
+from app.utils.dependencies import get_current_active_user
+from app.utils.cache import cached, invalidate_tags
+from app.utils.bulk import BulkReport, validate_rows, mark_duplicates, existing_values, insert_rows
+from app.utils.export import stream_export
+from app.utils.writes import update_or_404, delete_or_404
+from app.utils.spatial_index import ESTADO_MAPA, cluster_marcadores, get_map_index, index_propiedad, marcador_desde_fila, refresh_map_index, unindex_propiedad
+from app.routes.direcciones import preparar_direccion_data
+from app.config import get_settings
 
 router = APIRouter()
+settings = get_settings()
+
+# Propiedad con su dirección embebida (un solo round trip vía FK id_direccion)
+PROPIEDAD_CON_DIRECCION = "*, direccion(*)"
+
+def _tags_propiedad(propiedad: dict) -> List[str]:
+    """Tags de caché de una propiedad y de la dirección que embebe"""
+    tags = [f"propiedad:{propiedad['id_propiedad']}"]
+    if propiedad.get("id_direccion"):
+        tags.append(f"direccion:{propiedad['id_direccion']}")
+    return tags
+
+def _tags_listado_propiedades(propiedades: list) -> List[str]:
+    """El listado se invalida al crear propiedades o al cambiar cualquiera de las suyas"""
+    return ["propiedades"] + [tag for p in propiedades for tag in _tags_propiedad(p)]
 
 @router.post("/propiedades/", response_model=PropiedadResponse, status_code=201)
 async def crear_propiedad(
     propiedad: PropiedadCreate,
     current_user = Depends(get_current_active_user)
 ):
-    """Crea una nueva propiedad en el sistema."""
+    """
+    Crea una nueva propiedad en el sistema.
+    
+    La dirección anidada (si viene) y la propiedad se crean en una sola
+    transacción con la función `crear_propiedad` (ver
+    migrations/008_crear_propiedad.sql), que devuelve la propiedad con su
+    dirección embebida. El código público repetido lo rechaza el índice único.
+    """
     supabase = get_supabase_client()
     
     try:
-        direccion_id = None
-        
-        # OPCIÓN B: Si viene dirección anidada, créala primero
-        if propiedad.direccion:
-            direccion_data = propiedad.direccion.model_dump()
-            
-            # Convertir Decimal a float
-            if direccion_data.get("latitud_direccion") is not None:
-                direccion_data["latitud_direccion"] = float(direccion_data["latitud_direccion"])
-            if direccion_data.get("longitud_direccion") is not None:
-                direccion_data["longitud_direccion"] = float(direccion_data["longitud_direccion"])
-            
-            result_dir = supabase.table("direccion").insert(direccion_data).execute()
-            if not result_dir.data:
-                raise HTTPException(status_code=500, detail="Error al crear la dirección")
-            
-            direccion_id = result_dir.data[0]["id_direccion"]
-        
-        # OPCIÓN A: Si viene id_direccion, verificar que existe
-        elif propiedad.id_direccion:
-            existing_dir = supabase.table("direccion").select("id_direccion").eq("id_direccion", propiedad.id_direccion).execute()
-            if not existing_dir.data:
-                raise HTTPException(status_code=404, detail="La dirección especificada no existe")
-            direccion_id = propiedad.id_direccion
-        
-        # Verificar que el propietario existe
-        propietario = supabase.table("propietario").select("ci_propietario").eq("ci_propietario", propiedad.ci_propietario).execute()
-        if not propietario.data:
-            raise HTTPException(status_code=404, detail="El propietario especificado no existe")
-        
-        # Verificar código público único si se proporciona
-        if propiedad.codigo_publico_propiedad:
-            existing_code = supabase.table("propiedad").select("codigo_publico_propiedad").eq("codigo_publico_propiedad", propiedad.codigo_publico_propiedad).execute()
-            if existing_code.data:
-                raise HTTPException(status_code=400, detail="Ya existe una propiedad con ese código público")
-        
-        # Preparar datos de la propiedad
-        propiedad_data = propiedad.model_dump(exclude={"direccion"})
-        propiedad_data["id_direccion"] = direccion_id
-        propiedad_data["id_usuario_captador"] = current_user["id_usuario"]
+        propiedad_data = _preparar_propiedad_data(propiedad, propiedad.id_direccion, current_user)
+        direccion_data = preparar_direccion_data(propiedad.direccion) if propiedad.direccion else None
         
-        # Convertir Decimales a float
-        if propiedad_data.get("precio_publicado_propiedad") is not None:
-            propiedad_data["precio_publicado_propiedad"] = float(propiedad_data["precio_publicado_propiedad"])
-        if propiedad_data.get("superficie_propiedad") is not None:
-            propiedad_data["superficie_propiedad"] = float(propiedad_data["superficie_propiedad"])
-        if propiedad_data.get("porcentaje_captacion_propiedad") is not None:
-            propiedad_data["porcentaje_captacion_propiedad"] = float(propiedad_data["porcentaje_captacion_propiedad"])
-        if propiedad_data.get("porcentaje_colocacion_propiedad") is not None:
-            propiedad_data["porcentaje_colocacion_propiedad"] = float(propiedad_data["porcentaje_colocacion_propiedad"])
-        
-        # Convertir fechas a string
-        if propiedad_data.get("fecha_captacion_propiedad"):
-            propiedad_data["fecha_captacion_propiedad"] = propiedad_data["fecha_captacion_propiedad"].isoformat()
-        if propiedad_data.get("fecha_publicacion_propiedad"):
-            propiedad_data["fecha_publicacion_propiedad"] = propiedad_data["fecha_publicacion_propiedad"].isoformat()
-        if propiedad_data.get("fecha_cierre_propiedad"):
-            propiedad_data["fecha_cierre_propiedad"] = propiedad_data["fecha_cierre_propiedad"].isoformat()
-        
-        # Crear propiedad
-        result = supabase.table("propiedad").insert(propiedad_data).execute()
+        try:
+            result = await execute_async(supabase.rpc("crear_propiedad", {"p_propiedad": propiedad_data, "p_direccion": direccion_data}))
+        except APIError as e:
+            raise _error_crear_propiedad(e)
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear la propiedad")
         
-        # ✅ Invalidar caché
-        clear_propiedades_cache()
+        # ✅ Invalidar caché (la propiedad nueva puede entrar en cualquier listado)
+        await invalidate_tags("propiedades")
         
-        propiedad_creada = result.data[0]
-        direccion = supabase.table("direccion").select("*").eq("id_direccion", direccion_id).execute()
-        if direccion.data:
-            propiedad_creada["direccion"] = direccion.data[0]
+        propiedad_creada = result.data
+        index_propiedad(propiedad_creada)
         
         return propiedad_creada
     
@@ -100,8 +71,106 @@ async def crear_propiedad(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+def _error_crear_propiedad(e: APIError) -> Exception:
+    """Traduce un error de la función `crear_propiedad` a HTTPException"""
+    if e.code == "PR404":
+        return HTTPException(status_code=404, detail=e.message)
+    if e.code == "23505":
+        return HTTPException(status_code=400, detail="Ya existe una propiedad con ese código público")
+    return e
+
+def _preparar_propiedad_data(propiedad: PropiedadCreate, direccion_id: Optional[str], current_user: dict) -> dict:
+    """Fila de `propiedad` lista para insertar"""
+    propiedad_data = propiedad.model_dump(exclude={"direccion"})
+    propiedad_data["id_direccion"] = direccion_id
+    propiedad_data["id_usuario_captador"] = current_user["id_usuario"]
+    
+    # Convertir Decimales a float
+    if propiedad_data.get("precio_publicado_propiedad") is not None:
+        propiedad_data["precio_publicado_propiedad"] = float(propiedad_data["precio_publicado_propiedad"])
+    if propiedad_data.get("superficie_propiedad") is not None:
+        propiedad_data["superficie_propiedad"] = float(propiedad_data["superficie_propiedad"])
+    if propiedad_data.get("porcentaje_captacion_propiedad") is not None:
+        propiedad_data["porcentaje_captacion_propiedad"] = float(propiedad_data["porcentaje_captacion_propiedad"])
+    if propiedad_data.get("porcentaje_colocacion_propiedad") is not None:
+        propiedad_data["porcentaje_colocacion_propiedad"] = float(propiedad_data["porcentaje_colocacion_propiedad"])
+    
+    # Convertir fechas a string
+    if propiedad_data.get("fecha_captacion_propiedad"):
+        propiedad_data["fecha_captacion_propiedad"] = propiedad_data["fecha_captacion_propiedad"].isoformat()
+    if propiedad_data.get("fecha_publicacion_propiedad"):
+        propiedad_data["fecha_publicacion_propiedad"] = propiedad_data["fecha_publicacion_propiedad"].isoformat()
+    if propiedad_data.get("fecha_cierre_propiedad"):
+        propiedad_data["fecha_cierre_propiedad"] = propiedad_data["fecha_cierre_propiedad"].isoformat()
+    
+    return propiedad_data
+
+@router.post("/propiedades/bulk", response_model=dict)
+async def crear_propiedades_bulk(
+    propiedades: List[Dict[str, Any]],
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Crea propiedades en lote (cada fila con el formato de `POST /propiedades/`).
+    
+    Direcciones, propietarios y códigos públicos se validan con una consulta
+    por tabla; las direcciones anidadas se crean en bloque antes que las
+    propiedades. Devuelve el resultado de cada fila por su índice.
+    """
+    try:
+        report = BulkReport(len(propiedades))
+        validos = validate_rows(propiedades, PropiedadCreate, report)
+        mark_duplicates(validos, lambda p: p.codigo_publico_propiedad, report, "Código público repetido en el lote")
+        
+        # Claves foráneas y unicidad: una consulta por tabla
+        direcciones = await existing_values("direccion", "id_direccion", [p.id_direccion for _, p in validos if not p.direccion])
+        propietarios = await existing_values("propietario", "ci_propietario", [p.ci_propietario for _, p in validos])
+        codigos = await existing_values("propiedad", "codigo_publico_propiedad", [p.codigo_publico_propiedad for _, p in validos])
+        
+        for indice, propiedad in validos:
+            if not propiedad.direccion and propiedad.id_direccion not in direcciones:
+                report.error(indice, "La dirección especificada no existe")
+            elif propiedad.ci_propietario not in propietarios:
+                report.error(indice, "El propietario especificado no existe")
+            elif propiedad.codigo_publico_propiedad and propiedad.codigo_publico_propiedad in codigos:
+                report.error(indice, "Ya existe una propiedad con ese código público")
+        
+        validos = [(indice, propiedad) for indice, propiedad in validos if not report.has_error(indice)]
+        
+        # Direcciones anidadas: se insertan en bloque y se asocian por índice
+        direcciones_report = BulkReport(len(propiedades))
+        nuevas_direcciones = await insert_rows(
+            "direccion",
+            "id_direccion",
+            [(indice, preparar_direccion_data(propiedad.direccion)) for indice, propiedad in validos if propiedad.direccion],
+            direcciones_report
+        )
+        id_direccion_por_indice = {indice: fila["id_direccion"] for indice, fila in nuevas_direcciones}
+        
+        filas = []
+        for indice, propiedad in validos:
+            if direcciones_report.has_error(indice):
+                report.error(indice, f"Error al crear la dirección: {direcciones_report.resultados[indice]['detalle']}")
+                continue
+            direccion_id = id_direccion_por_indice.get(indice, propiedad.id_direccion)
+            filas.append((indice, _preparar_propiedad_data(propiedad, direccion_id, current_user)))
+        
+        insertadas = await insert_rows("propiedad", "id_propiedad", filas, report)
+        
+        # ✅ Invalidar caché e indexar en el mapa
+        await invalidate_tags("propiedades")
+        await refresh_map_index("id_propiedad", [fila["id_propiedad"] for _, fila in insertadas])
+        return report.as_dict()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la carga masiva de propiedades: {str(e)}")
+
 @router.get("/propiedades/", response_model=List[PropiedadResponse])
+@cached("propiedades", ttl=600, user_scoped=("mis_captaciones",), tags=_tags_listado_propiedades)
 async def listar_propiedades(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     tipo_operacion: Optional[str] = Query(None),
@@ -109,21 +178,19 @@ async def listar_propiedades(
     precio_min: Optional[float] = Query(None),
     precio_max: Optional[float] = Query(None),
     mis_captaciones: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (header X-Next-Cursor)"),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista todas las propiedades CON CACHÉ"""
-    
-    # ✅ Intentar caché solo para consulta básica sin filtros
-    if (skip == 0 and limit == 100 and not tipo_operacion and not estado and 
-        not precio_min and not precio_max and not mis_captaciones):
-        cached = get_propiedades_cached()
-        if cached:
-            return cached
+    """
+    Lista todas las propiedades CON CACHÉ
     
+    Si la página viene llena, el header **X-Next-Cursor** trae el cursor de la
+    siguiente. Enviarlo como `cursor` pagina por keyset (se ignora `skip`).
+    """
     supabase = get_supabase_client()
     
     try:
-        query = supabase.table("propiedad").select("*")
+        query = supabase.table("propiedad").select(PROPIEDAD_CON_DIRECCION)
         
         # Filtros
         if tipo_operacion:
@@ -141,27 +208,169 @@ async def listar_propiedades(
         if mis_captaciones:
             query = query.eq("id_usuario_captador", current_user["id_usuario"])
         
-        # Paginación y orden
-        result = query.order("fecha_captacion_propiedad", desc=True).range(skip, skip + limit - 1).execute()
+        # Orden (y filtro de cursor si viene); la dirección viene embebida en cada fila
+        query = apply_keyset(query, cursor, "fecha_captacion_propiedad", "id_propiedad")
         
-        # Enriquecer con datos de dirección
+        if cursor:
+            result = await execute_async(query.limit(limit))
+        else:
+            result = await execute_async(query.range(skip, skip + limit - 1))
         propiedades = result.data
-        for propiedad in propiedades:
-            direccion = supabase.table("direccion").select("*").eq("id_direccion", propiedad["id_direccion"]).execute()
-            if direccion.data:
-                propiedad["direccion"] = direccion.data[0]
-        
-        # ✅ Guardar en caché solo consulta básica
-        if (skip == 0 and limit == 100 and not tipo_operacion and not estado and 
-            not precio_min and not precio_max and not mis_captaciones):
-            set_propiedades_cached(propiedades)
         
+        _set_next_cursor(response, propiedades, limit)
         return propiedades
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener propiedades: {str(e)}")
 
+def _set_next_cursor(response: Response, propiedades: list, limit: int):
+    """Agrega el header X-Next-Cursor cuando la página vino completa"""
+    if len(propiedades) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(propiedades[-1], "fecha_captacion_propiedad", "id_propiedad")
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Convierte `min_lng,min_lat,max_lng,max_lat` en una tupla validada"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox debe tener el formato min_lng,min_lat,max_lng,max_lat")
+    
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox fuera de rango o con mínimos mayores que máximos")
+    
+    return min_lng, min_lat, max_lng, max_lat
+
+@router.get("/propiedades/cerca", response_model=List[dict])
+async def propiedades_cerca(
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud del centro"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitud del centro"),
+    radio_km: float = Query(2.0, gt=0, le=50, description="Radio de búsqueda en km"),
+    bbox: Optional[str] = Query(None, description="Viewport: min_lng,min_lat,max_lng,max_lat (reemplaza lat/lng/radio_km)"),
+    estado: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Propiedades cercanas a un punto, con su dirección embebida
+    
+    - Con **lat**/**lng**: las que están a menos de `radio_km`, ordenadas por
+      distancia (cada fila trae `distancia_km`)
+    - Con **bbox**: las que caen dentro del rectángulo (viewport del mapa)
+    
+    Usa el índice espacial GiST de `direccion` (ver migrations/006_propiedades_cerca.sql).
+    """
+    supabase = get_supabase_client()
+    
+    if bbox:
+        min_lng, min_lat, max_lng, max_lat = _parse_bbox(bbox)
+        consulta = supabase.rpc("propiedades_en_bbox", {
+            "p_min_lng": min_lng,
+            "p_min_lat": min_lat,
+            "p_max_lng": max_lng,
+            "p_max_lat": max_lat,
+            "p_limite": limit,
+            "p_estado": estado,
+        })
+    elif lat is not None and lng is not None:
+        consulta = supabase.rpc("propiedades_cerca", {
+            "p_lat": lat,
+            "p_lng": lng,
+            "p_radio_km": radio_km,
+            "p_limite": limit,
+            "p_estado": estado,
+        })
+    else:
+        raise HTTPException(status_code=400, detail="Indique lat y lng, o bbox")
+    
+    try:
+        result = await execute_async(consulta)
+        return result.data
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar propiedades cercanas: {str(e)}")
+
+@router.get("/propiedades/mapa", response_model=dict)
+async def propiedades_mapa(
+    bbox: str = Query(..., description="Viewport: min_lng,min_lat,max_lng,max_lat"),
+    zoom: int = Query(14, ge=0, le=22, description="Zoom del mapa (bajo el umbral se agrupa en clusters)"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Marcadores de propiedades publicadas dentro del viewport
+    
+    Respuesta compacta para el mapa:
+    - **marcadores**: `[id, lat, lng, precio, tipo_operacion]`
+    - **clusters**: `[lat, lng, cantidad]` (solo con zoom < MAP_CLUSTER_MAX_ZOOM)
+    
+    Con MAP_INDEX_ENABLED se responde desde el índice en memoria sin consultar
+    Supabase; si no, desde `propiedades_en_bbox` (índice espacial de la BD).
+    """
+    min_lng, min_lat, max_lng, max_lat = _parse_bbox(bbox)
+    
+    try:
+        index = get_map_index()
+        if index is not None:
+            marcadores = index.query(min_lng, min_lat, max_lng, max_lat)
+        else:
+            supabase = get_supabase_client()
+            result = await execute_async(supabase.rpc("propiedades_en_bbox", {
+                "p_min_lng": min_lng,
+                "p_min_lat": min_lat,
+                "p_max_lng": max_lng,
+                "p_max_lat": max_lat,
+                "p_limite": 5000,
+                "p_estado": ESTADO_MAPA,
+            }))
+            marcadores = [m for m in map(marcador_desde_fila, result.data) if m is not None]
+        
+        clusters = []
+        if zoom < settings.MAP_CLUSTER_MAX_ZOOM:
+            marcadores, clusters = cluster_marcadores(marcadores, zoom)
+        
+        return {
+            "total": len(marcadores) + sum(c[2] for c in clusters),
+            "marcadores": marcadores,
+            "clusters": clusters
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener el mapa: {str(e)}")
+
+@router.get("/propiedades/export")
+async def exportar_propiedades(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    tipo_operacion: Optional[str] = Query(None),
+    estado: Optional[str] = Query(None),
+    mis_captaciones: bool = Query(False),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Exporta todas las propiedades con su dirección embebida (en CSV va como JSON)
+    """
+    supabase = get_supabase_client()
+    
+    def _query():
+        query = supabase.table("propiedad").select(PROPIEDAD_CON_DIRECCION)
+        if tipo_operacion:
+            query = query.eq("tipo_operacion_propiedad", tipo_operacion)
+        if estado:
+            query = query.eq("estado_propiedad", estado)
+        if mis_captaciones:
+            query = query.eq("id_usuario_captador", current_user["id_usuario"])
+        return query
+    
+    try:
+        return await stream_export(_query, formato, "propiedades", "fecha_captacion_propiedad", "id_propiedad", columns=list(PropiedadResponse.model_fields))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar propiedades: {str(e)}")
+
 @router.get("/propiedades/{id_propiedad}", response_model=PropiedadResponse)
+@cached("propiedades", ttl=600, tags=_tags_propiedad)
 async def obtener_propiedad(
     id_propiedad: str,
     current_user = Depends(get_current_active_user)
@@ -170,19 +379,12 @@ async def obtener_propiedad(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("propiedad").select("*").eq("id_propiedad", id_propiedad).execute()
+        result = await execute_async(supabase.table("propiedad").select(PROPIEDAD_CON_DIRECCION).eq("id_propiedad", id_propiedad))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Propiedad no encontrada")
         
-        propiedad = result.data[0]
-        
-        # Incluir dirección
-        direccion = supabase.table("direccion").select("*").eq("id_direccion", propiedad["id_direccion"]).execute()
-        if direccion.data:
-            propiedad["direccion"] = direccion.data[0]
-        
-        return propiedad
+        return result.data[0]
     
     except HTTPException:
         raise
@@ -199,10 +401,6 @@ async def actualizar_propiedad(
     supabase = get_supabase_client()
     
     try:
-        existing = supabase.table("propiedad").select("*").eq("id_propiedad", id_propiedad).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Propiedad no encontrada")
-        
         update_data = propiedad.model_dump(exclude_unset=True)
         
         if not update_data:
@@ -224,19 +422,18 @@ async def actualizar_propiedad(
         if "fecha_cierre_propiedad" in update_data and update_data["fecha_cierre_propiedad"]:
             update_data["fecha_cierre_propiedad"] = update_data["fecha_cierre_propiedad"].isoformat()
         
-        result = supabase.table("propiedad").update(update_data).eq("id_propiedad", id_propiedad).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar la propiedad")
+        # La dirección no cambia al actualizar la propiedad: se lee embebida en paralelo
+        propiedad_actualizada, con_direccion = await asyncio.gather(
+            update_or_404("propiedad", "id_propiedad", id_propiedad, update_data, "Propiedad no encontrada"),
+            execute_async(supabase.table("propiedad").select("direccion(*)").eq("id_propiedad", id_propiedad))
+        )
         
-        # ✅ Invalidar caché
-        clear_propiedades_cache()
+        # ✅ Invalidar caché (el cambio puede sacarla o meterla en un listado filtrado)
+        await invalidate_tags("propiedades", f"propiedad:{id_propiedad}")
         
-        propiedad_actualizada = result.data[0]
+        propiedad_actualizada["direccion"] = con_direccion.data[0]["direccion"] if con_direccion.data else None
         
-        direccion = supabase.table("direccion").select("*").eq("id_direccion", propiedad_actualizada["id_direccion"]).execute()
-        if direccion.data:
-            propiedad_actualizada["direccion"] = direccion.data[0]
+        index_propiedad(propiedad_actualizada)
         
         return propiedad_actualizada
     
@@ -254,31 +451,28 @@ async def eliminar_propiedad(
     supabase = get_supabase_client()
     
     try:
-        propiedad = supabase.table("propiedad").select("*").eq("id_propiedad", id_propiedad).execute()
-        if not propiedad.data:
-            raise HTTPException(status_code=404, detail="Propiedad no encontrada")
-        
-        citas = supabase.table("citavisita").select("id_cita").eq("id_propiedad", id_propiedad).execute()
+        citas, contratos = await asyncio.gather(
+            execute_async(supabase.table("citavisita").select("id_cita").eq("id_propiedad", id_propiedad)),
+            execute_async(supabase.table("contratooperacion").select("id_contrato_operacion").eq("id_propiedad", id_propiedad))
+        )
         if citas.data:
             raise HTTPException(
                 status_code=400, 
                 detail=f"No se puede eliminar la propiedad porque tiene {len(citas.data)} cita(s) de visita registrada(s)"
             )
         
-        contratos = supabase.table("contratooperacion").select("id_contrato_operacion").eq("id_propiedad", id_propiedad).execute()
         if contratos.data:
             raise HTTPException(
                 status_code=400, 
                 detail=f"No se puede eliminar la propiedad porque tiene {len(contratos.data)} contrato(s) registrado(s)"
             )
         
-        result = supabase.table("propiedad").delete().eq("id_propiedad", id_propiedad).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar la propiedad")
+        # 404 si no existe
+        await delete_or_404("propiedad", "id_propiedad", id_propiedad, "Propiedad no encontrada")
         
         # ✅ Invalidar caché
-        clear_propiedades_cache()
+        await invalidate_tags("propiedades", f"propiedad:{id_propiedad}")
+        unindex_propiedad(id_propiedad)
         
         return {
             "message": "Propiedad eliminada exitosamente (imágenes y documentos eliminados en cascada)",
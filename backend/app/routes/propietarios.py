@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.schemas.propietario import PropietarioCreate, PropietarioUpdate, PropietarioResponse
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.bulk import BulkReport, validate_rows, mark_duplicates, existing_values, insert_rows
+from app.utils.export import stream_export
+from app.utils.writes import update_or_404
 from datetime import datetime
 
 router = APIRouter()
@@ -27,19 +30,12 @@ async def crear_propietario(
     
     try:
         # Verificar si el propietario ya existe
-        existing = supabase.table("propietario").select("*").eq("ci_propietario", propietario.ci_propietario).execute()
+        existing = await execute_async(supabase.table("propietario").select("*").eq("ci_propietario", propietario.ci_propietario))
         if existing.data:
             raise HTTPException(status_code=400, detail="Ya existe un propietario con ese CI")
         
-        # Preparar datos para inserción
-        propietario_data = propietario.model_dump()
-        
-        # Convertir fecha a string si existe
-        if propietario_data.get("fecha_nacimiento_propietario"):
-            propietario_data["fecha_nacimiento_propietario"] = propietario_data["fecha_nacimiento_propietario"].isoformat()
-        
         # Insertar propietario
-        result = supabase.table("propietario").insert(propietario_data).execute()
+        result = await execute_async(supabase.table("propietario").insert(_preparar_propietario_data(propietario)))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear el propietario")
@@ -52,6 +48,56 @@ async def crear_propietario(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 
+def _preparar_propietario_data(propietario: PropietarioCreate) -> dict:
+    """Fila de `propietario` lista para insertar"""
+    propietario_data = propietario.model_dump()
+    
+    # Convertir fecha a string si existe
+    if propietario_data.get("fecha_nacimiento_propietario"):
+        propietario_data["fecha_nacimiento_propietario"] = propietario_data["fecha_nacimiento_propietario"].isoformat()
+    
+    return propietario_data
+
+
+@router.post("/propietarios/bulk", response_model=dict)
+async def crear_propietarios_bulk(
+    propietarios: List[Dict[str, Any]],
+    upsert: bool = Query(False, description="Actualizar los propietarios cuyo CI ya existe"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Crea propietarios en lote (cada fila con el formato de `POST /propietarios/`).
+    
+    Devuelve el resultado de cada fila por su índice.
+    
+    - **upsert**: Si es true, los CI existentes se actualizan en lugar de rechazarse
+    """
+    try:
+        report = BulkReport(len(propietarios))
+        validos = validate_rows(propietarios, PropietarioCreate, report)
+        mark_duplicates(validos, lambda p: p.ci_propietario, report, "CI repetido en el lote")
+        
+        # Con upsert los CI existentes no son error, pero se reportan como actualizados
+        existentes = await existing_values("propietario", "ci_propietario", [p.ci_propietario for _, p in validos])
+        if not upsert:
+            for indice, propietario in validos:
+                if propietario.ci_propietario in existentes:
+                    report.error(indice, "Ya existe un propietario con ese CI")
+        
+        filas = [
+            (indice, _preparar_propietario_data(propietario))
+            for indice, propietario in validos if not report.has_error(indice)
+        ]
+        await insert_rows("propietario", "ci_propietario", filas, report, on_conflict="ci_propietario" if upsert else None, existing=existentes)
+        
+        return report.as_dict()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la carga masiva de propietarios: {str(e)}")
+
+
 @router.get("/propietarios/", response_model=List[PropietarioResponse])
 async def listar_propietarios(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
@@ -76,7 +122,7 @@ async def listar_propietarios(
             query = query.eq("es_activo_propietario", True)
         
         # Aplicar paginación y ordenamiento
-        result = query.order("ci_propietario").range(skip, skip + limit - 1).execute()
+        result = await execute_async(query.order("ci_propietario").range(skip, skip + limit - 1))
         
         return result.data
     
@@ -84,6 +130,33 @@ async def listar_propietarios(
         raise HTTPException(status_code=500, detail=f"Error al obtener propietarios: {str(e)}")
 
 
+@router.get("/propietarios/export")
+async def exportar_propietarios(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    activos_solo: bool = Query(False, description="Exportar solo propietarios activos"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Exporta todos los propietarios en CSV o NDJSON (streaming, ordenados por CI).
+    """
+    supabase = get_supabase_client()
+    
+    def _query():
+        query = supabase.table("propietario").select("*")
+        if activos_solo:
+            query = query.eq("es_activo_propietario", True)
+        return query
+    
+    try:
+        # Sin columna de fecha: el CI es orden y desempate a la vez
+        return await stream_export(_query, formato, "propietarios", "ci_propietario", "ci_propietario", desc=False, columns=list(PropietarioResponse.model_fields))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar propietarios: {str(e)}")
+
+
 @router.get("/propietarios/{ci_propietario}", response_model=PropietarioResponse)
 async def obtener_propietario(
     ci_propietario: str,
@@ -95,7 +168,7 @@ async def obtener_propietario(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("propietario").select("*").eq("ci_propietario", ci_propietario).execute()
+        result = await execute_async(supabase.table("propietario").select("*").eq("ci_propietario", ci_propietario))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Propietario no encontrado")
@@ -119,14 +192,7 @@ async def actualizar_propietario(
     
     Todos los campos son opcionales. Solo se actualizarán los campos proporcionados.
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar que el propietario existe
-        existing = supabase.table("propietario").select("*").eq("ci_propietario", ci_propietario).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Propietario no encontrado")
-        
         # Preparar datos para actualización (solo campos no-None)
         update_data = propietario.model_dump(exclude_unset=True)
         
@@ -138,12 +204,7 @@ async def actualizar_propietario(
             update_data["fecha_nacimiento_propietario"] = update_data["fecha_nacimiento_propietario"].isoformat()
         
         # Actualizar propietario
-        result = supabase.table("propietario").update(update_data).eq("ci_propietario", ci_propietario).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar el propietario")
-        
-        return result.data[0]
+        return await update_or_404("propietario", "ci_propietario", ci_propietario, update_data, "Propietario no encontrado")
     
     except HTTPException:
         raise
@@ -164,13 +225,8 @@ async def desactivar_propietario(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que el propietario existe
-        propietario_exist = supabase.table("propietario").select("*").eq("ci_propietario", ci_propietario).execute()
-        if not propietario_exist.data:
-            raise HTTPException(status_code=404, detail="Propietario no encontrado")
-        
         # Verificar si tiene propiedades activas
-        propiedades = supabase.table("propiedad").select("id_propiedad").eq("ci_propietario", ci_propietario).neq("estado_propiedad", "Cerrada").execute()
+        propiedades = await execute_async(supabase.table("propiedad").select("id_propiedad").eq("ci_propietario", ci_propietario).neq("estado_propiedad", "Cerrada"))
         
         if propiedades.data:
             raise HTTPException(
@@ -178,11 +234,8 @@ async def desactivar_propietario(
                 detail=f"No se puede desactivar el propietario porque tiene {len(propiedades.data)} propiedad(es) activa(s)"
             )
         
-        # Desactivar propietario
-        result = supabase.table("propietario").update({"es_activo_propietario": False}).eq("ci_propietario", ci_propietario).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al desactivar el propietario")
+        # Desactivar propietario (404 si no existe)
+        await update_or_404("propietario", "ci_propietario", ci_propietario, {"es_activo_propietario": False}, "Propietario no encontrado")
         
         return {
             "message": "Propietario desactivado exitosamente",
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from app.schemas.rol import RolCreate, RolUpdate, RolResponse
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.dependencies import get_current_active_user
+from app.utils.writes import update_or_404, delete_or_404
 
 router = APIRouter()
 
@@ -25,7 +26,7 @@ async def crear_rol(
     
     try:
         # Verificar que no exista un rol con el mismo nombre
-        existing = supabase.table("rol").select("id_rol").eq("nombre_rol", rol.nombre_rol).execute()
+        existing = await execute_async(supabase.table("rol").select("id_rol").eq("nombre_rol", rol.nombre_rol))
         if existing.data:
             raise HTTPException(status_code=400, detail=f"Ya existe un rol con el nombre '{rol.nombre_rol}'")
         
@@ -33,7 +34,7 @@ async def crear_rol(
         rol_data = rol.model_dump()
         
         # Insertar rol
-        result = supabase.table("rol").insert(rol_data).execute()
+        result = await execute_async(supabase.table("rol").insert(rol_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al crear el rol")
@@ -68,7 +69,7 @@ async def listar_roles(
             query = query.eq("es_activo_rol", True)
         
         query = query.order("id_rol", desc=False).range(skip, skip + limit - 1)
-        result = query.execute()
+        result = await execute_async(query)
         
         return result.data
     
@@ -87,7 +88,7 @@ async def obtener_rol(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table("rol").select("*").eq("id_rol", id_rol).execute()
+        result = await execute_async(supabase.table("rol").select("*").eq("id_rol", id_rol))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Rol no encontrado")
@@ -112,11 +113,6 @@ async def actualizar_rol(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que el rol existe
-        rol_actual = supabase.table("rol").select("*").eq("id_rol", id_rol).execute()
-        if not rol_actual.data:
-            raise HTTPException(status_code=404, detail="Rol no encontrado")
-        
         # Preparar datos para actualización (solo campos no None)
         rol_data = rol.model_dump(exclude_unset=True)
         
@@ -125,17 +121,12 @@ async def actualizar_rol(
         
         # Si se actualiza el nombre, verificar que no exista otro con ese nombre
         if "nombre_rol" in rol_data:
-            existing = supabase.table("rol").select("id_rol").eq("nombre_rol", rol_data["nombre_rol"]).execute()
+            existing = await execute_async(supabase.table("rol").select("id_rol").eq("nombre_rol", rol_data["nombre_rol"]))
             if existing.data and existing.data[0]["id_rol"] != id_rol:
                 raise HTTPException(status_code=400, detail=f"Ya existe otro rol con el nombre '{rol_data['nombre_rol']}'")
         
         # Actualizar
-        result = supabase.table("rol").update(rol_data).eq("id_rol", id_rol).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al actualizar el rol")
-        
-        return result.data[0]
+        return await update_or_404("rol", "id_rol", id_rol, rol_data, "Rol no encontrado")
     
     except HTTPException:
         raise
@@ -157,24 +148,16 @@ async def eliminar_rol(
     supabase = get_supabase_client()
     
     try:
-        # Verificar que el rol existe
-        rol = supabase.table("rol").select("id_rol").eq("id_rol", id_rol).execute()
-        if not rol.data:
-            raise HTTPException(status_code=404, detail="Rol no encontrado")
-        
         # Verificar que no haya usuarios con este rol
-        usuarios = supabase.table("usuario").select("id_usuario").eq("id_rol", id_rol).execute()
+        usuarios = await execute_async(supabase.table("usuario").select("id_usuario").eq("id_rol", id_rol))
         if usuarios.data:
             raise HTTPException(
                 status_code=400, 
                 detail=f"No se puede eliminar el rol porque hay {len(usuarios.data)} usuario(s) asignado(s) a él. Considere desactivarlo."
             )
         
-        # Eliminar
-        result = supabase.table("rol").delete().eq("id_rol", id_rol).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar el rol")
+        # Eliminar (404 si no existe)
+        await delete_or_404("rol", "id_rol", id_rol, "Rol no encontrado")
         
         return None
     
@@ -196,12 +179,12 @@ async def obtener_usuarios_por_rol(
     
     try:
         # Verificar que el rol existe
-        rol = supabase.table("rol").select("*").eq("id_rol", id_rol).execute()
+        rol = await execute_async(supabase.table("rol").select("*").eq("id_rol", id_rol))
         if not rol.data:
             raise HTTPException(status_code=404, detail="Rol no encontrado")
         
         # Obtener usuarios con este rol
-        usuarios = supabase.table("usuario").select("id_usuario, nombre_usuario, es_activo_usuario, ci_empleado").eq("id_rol", id_rol).execute()
+        usuarios = await execute_async(supabase.table("usuario").select("id_usuario, nombre_usuario, es_activo_usuario, ci_empleado").eq("id_rol", id_rol))
         
         return {
             "rol": rol.data[0],
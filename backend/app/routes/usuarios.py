@@ -6,8 +6,9 @@ from fastapi.security import OAuth2PasswordRequestForm
 from typing import List
 from datetime import timedelta
 from uuid import UUID
+import logging
 
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.schemas.usuario import (
     UsuarioCreate,
     UsuarioUpdate,
@@ -17,14 +18,16 @@ from app.schemas.usuario import (
     TokenWithUser
 )
 from app.utils.security import (
-    get_password_hash,
-    verify_password,
+    hash_password_async,
+    verify_and_update_password,
     create_access_token
 )
-from app.utils.dependencies import get_current_active_user
+from app.utils.dependencies import get_current_active_user, invalidate_user_cache, revoke_user_tokens
+from app.utils.writes import update_or_404
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -41,7 +44,7 @@ async def crear_usuario(
     
     try:
         # Verificar si el usuario ya existe
-        existing = supabase.table("usuario").select("*").eq("nombre_usuario", usuario.nombre_usuario).execute()
+        existing = await execute_async(supabase.table("usuario").select("*").eq("nombre_usuario", usuario.nombre_usuario))
         
         if existing.data and len(existing.data) > 0:
             raise HTTPException(
@@ -50,7 +53,7 @@ async def crear_usuario(
             )
         
         # Verificar si el empleado existe
-        empleado = supabase.table("empleado").select("*").eq("ci_empleado", usuario.ci_empleado).execute()
+        empleado = await execute_async(supabase.table("empleado").select("*").eq("ci_empleado", usuario.ci_empleado))
         
         if not empleado.data or len(empleado.data) == 0:
             raise HTTPException(
@@ -59,7 +62,7 @@ async def crear_usuario(
             )
         
         # Verificar si el rol existe
-        rol = supabase.table("rol").select("*").eq("id_rol", usuario.id_rol).execute()
+        rol = await execute_async(supabase.table("rol").select("*").eq("id_rol", usuario.id_rol))
         
         if not rol.data or len(rol.data) == 0:
             raise HTTPException(
@@ -68,7 +71,7 @@ async def crear_usuario(
             )
         
         # Hash de la contraseña
-        hashed_password = get_password_hash(usuario.contrasenia_usuario)
+        hashed_password = await hash_password_async(usuario.contrasenia_usuario)
         
         # Crear usuario
         nuevo_usuario = {
@@ -79,7 +82,7 @@ async def crear_usuario(
             "es_activo_usuario": True
         }
         
-        response = supabase.table("usuario").insert(nuevo_usuario).execute()
+        response = await execute_async(supabase.table("usuario").insert(nuevo_usuario))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -111,7 +114,7 @@ async def listar_usuarios(
     supabase = get_supabase_client()
     
     try:
-        response = supabase.table("usuario").select("*").range(skip, skip + limit - 1).execute()
+        response = await execute_async(supabase.table("usuario").select("*").range(skip, skip + limit - 1))
         return response.data
         
     except Exception as e:
@@ -133,7 +136,7 @@ async def obtener_usuario(
     supabase = get_supabase_client()
     
     try:
-        response = supabase.table("usuario").select("*").eq("id_usuario", str(id_usuario)).execute()
+        response = await execute_async(supabase.table("usuario").select("*").eq("id_usuario", str(id_usuario)))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -165,21 +168,12 @@ async def actualizar_usuario(
     supabase = get_supabase_client()
     
     try:
-        # Verificar si el usuario existe
-        existing = supabase.table("usuario").select("*").eq("id_usuario", str(id_usuario)).execute()
-        
-        if not existing.data or len(existing.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuario no encontrado"
-            )
-        
         # Preparar datos para actualizar (solo los campos que no son None)
         update_data = {}
         
         if usuario_update.ci_empleado is not None:
             # Verificar si el empleado existe
-            empleado = supabase.table("empleado").select("*").eq("ci_empleado", usuario_update.ci_empleado).execute()
+            empleado = await execute_async(supabase.table("empleado").select("*").eq("ci_empleado", usuario_update.ci_empleado))
             if not empleado.data or len(empleado.data) == 0:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -189,7 +183,7 @@ async def actualizar_usuario(
         
         if usuario_update.id_rol is not None:
             # Verificar si el rol existe
-            rol = supabase.table("rol").select("*").eq("id_rol", usuario_update.id_rol).execute()
+            rol = await execute_async(supabase.table("rol").select("*").eq("id_rol", usuario_update.id_rol))
             if not rol.data or len(rol.data) == 0:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -199,7 +193,7 @@ async def actualizar_usuario(
         
         if usuario_update.nombre_usuario is not None:
             # Verificar si el nombre de usuario ya existe (en otro usuario)
-            nombre_exists = supabase.table("usuario").select("*").eq("nombre_usuario", usuario_update.nombre_usuario).neq("id_usuario", str(id_usuario)).execute()
+            nombre_exists = await execute_async(supabase.table("usuario").select("*").eq("nombre_usuario", usuario_update.nombre_usuario).neq("id_usuario", str(id_usuario)))
             if nombre_exists.data and len(nombre_exists.data) > 0:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -208,7 +202,7 @@ async def actualizar_usuario(
             update_data["nombre_usuario"] = usuario_update.nombre_usuario
         
         if usuario_update.contrasenia_usuario is not None:
-            update_data["contrasenia_usuario"] = get_password_hash(usuario_update.contrasenia_usuario)
+            update_data["contrasenia_usuario"] = await hash_password_async(usuario_update.contrasenia_usuario)
         
         if usuario_update.es_activo_usuario is not None:
             update_data["es_activo_usuario"] = usuario_update.es_activo_usuario
@@ -219,16 +213,16 @@ async def actualizar_usuario(
                 detail="No hay datos para actualizar"
             )
         
-        # Actualizar usuario
-        response = supabase.table("usuario").update(update_data).eq("id_usuario", str(id_usuario)).execute()
+        # Actualizar usuario (404 si no existe)
+        usuario_actualizado = await update_or_404("usuario", "id_usuario", str(id_usuario), update_data, "Usuario no encontrado")
         
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al actualizar usuario"
-            )
+        # Los tokens emitidos llevan id_rol y es_activo_usuario: si cambian, se revocan
+        if "id_rol" in update_data or update_data.get("es_activo_usuario") is False:
+            await revoke_user_tokens(str(id_usuario))
+        else:
+            await invalidate_user_cache(str(id_usuario))
         
-        return response.data[0]
+        return usuario_actualizado
         
     except HTTPException:
         raise
@@ -248,26 +242,12 @@ async def desactivar_usuario(
     Desactivar un usuario (soft delete)
     Requiere autenticación
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Verificar si el usuario existe
-        existing = supabase.table("usuario").select("*").eq("id_usuario", str(id_usuario)).execute()
-        
-        if not existing.data or len(existing.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuario no encontrado"
-            )
+        # Desactivar usuario (404 si no existe)
+        await update_or_404("usuario", "id_usuario", str(id_usuario), {"es_activo_usuario": False}, "Usuario no encontrado")
         
-        # Desactivar usuario
-        response = supabase.table("usuario").update({"es_activo_usuario": False}).eq("id_usuario", str(id_usuario)).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al desactivar usuario"
-            )
+        # La desactivación tiene efecto inmediato aunque el token aún no venza
+        await revoke_user_tokens(str(id_usuario))
         
         return {"message": "Usuario desactivado exitosamente", "id_usuario": str(id_usuario)}
         
@@ -290,7 +270,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     
     try:
         # Buscar usuario por nombre de usuario
-        response = supabase.table("usuario").select("*").eq("nombre_usuario", form_data.username).execute()
+        response = await execute_async(supabase.table("usuario").select("*").eq("nombre_usuario", form_data.username))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -301,14 +281,28 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         
         usuario = response.data[0]
         
-        # Verificar contraseña
-        if not verify_password(form_data.password, usuario["contrasenia_usuario"]):
+        # Verificar contraseña (en el pool de bcrypt, fuera del event loop)
+        password_valida, nuevo_hash = await verify_and_update_password(form_data.password, usuario["contrasenia_usuario"])
+        if not password_valida:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Credenciales incorrectas",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Rehash transparente si el hash guardado usa un costo desactualizado
+        if nuevo_hash:
+            try:
+                await execute_async(
+                    supabase.table("usuario")
+                    .update({"contrasenia_usuario": nuevo_hash})
+                    .eq("id_usuario", usuario["id_usuario"])
+                )
+            except Exception:
+                # No es crítico (se reintentará en el próximo login), pero si
+                # falla siempre cada login vuelve a pagar el rehash
+                logger.exception("No se pudo guardar el nuevo hash del usuario %s", usuario["id_usuario"])
+        
         # Verificar que el usuario esté activo
         if not usuario.get("es_activo_usuario", False):
             raise HTTPException(
@@ -318,8 +312,16 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         
         # Crear token JWT
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        token_data = {"sub": usuario["id_usuario"]}
+        if settings.JWT_EMBED_USER_CLAIMS:
+            # Con estos claims get_current_user no necesita consultar la BD
+            token_data.update({
+                "id_rol": usuario["id_rol"],
+                "es_activo_usuario": usuario["es_activo_usuario"],
+                "nombre_usuario": usuario["nombre_usuario"],
+            })
         access_token = create_access_token(
-            data={"sub": usuario["id_usuario"]},
+            data=token_data,
             expires_delta=access_token_expires
         )
         
@@ -347,13 +349,20 @@ async def obtener_usuario_actual(current_user: dict = Depends(get_current_active
     """
     Obtener información del usuario autenticado actualmente
     """
-    print("🔍 [DEBUG /me] ========== Endpoint /me llamado ==========")
-    print(f"📦 [DEBUG /me] current_user keys: {list(current_user.keys())}")
+    user_data = {**current_user}
+    
+    # Si el usuario se armó desde los claims del token, se completa desde la BD
+    if "fecha_creacion_usuario" not in user_data:
+        supabase = get_supabase_client()
+        response = await execute_async(supabase.table("usuario").select("*").eq("id_usuario", current_user["id_usuario"]))
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Usuario no encontrado"
+            )
+        user_data = response.data[0]
     
     # Remover la contraseña antes de retornar
-    user_data = {**current_user}
     user_data.pop('contrasenia_usuario', None)
     
-    print(f"✅ [DEBUG /me] user_data sin contraseña, keys: {list(user_data.keys())}")
-    print(f"✅ [DEBUG /me] ========== Retornando ==========")
     return user_data
@@ -59,6 +59,8 @@ class ContratoOperacionUpdate(BaseModel):
 
 class ContratoOperacionResponse(ContratoOperacionBase):
     id_contrato_operacion: str
+    total_pagado_contrato: Optional[Decimal] = None  # Mantenido por trigger sobre `pago`
+    numero_pagos_contrato: Optional[int] = None
     
     class Config:
         from_attributes = True
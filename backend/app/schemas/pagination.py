@@ -1,8 +1,14 @@
 """
 Schemas para respuestas paginadas
 """
+from fastapi import HTTPException
 from pydantic import BaseModel
-from typing import Generic, TypeVar, List
+from typing import Any, Generic, TypeVar, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from app.database import execute_async
+import base64
+import binascii
+import json
 import math
 
 T = TypeVar('T')
@@ -14,14 +20,18 @@ class PaginatedResponse(BaseModel, Generic[T]):
     Ejemplo de uso:
         PaginatedResponse[PropiedadResponse]
         PaginatedResponse[ClienteResponse]
+    
+    En modo cursor (keyset) `total` y `total_pages` son null: contar las
+    filas restantes costaría lo mismo que la paginación por offset.
     """
     items: List[T]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -29,22 +39,36 @@ class PaginatedResponse(BaseModel, Generic[T]):
 
 def create_paginated_response(
     items: List,
-    total: int,
+    total: Optional[int],
     page: int,
-    page_size: int
+    page_size: int,
+    next_cursor: Optional[str] = None
 ) -> dict:
     """
     Crear diccionario de respuesta paginada
     
     Args:
         items: Lista de items de la página actual
-        total: Total de registros
+        total: Total de registros (None en modo cursor)
         page: Número de página actual
         page_size: Tamaño de página
+        next_cursor: Cursor opaco para pedir la página siguiente
     
     Returns:
         Dict con estructura de PaginatedResponse
     """
+    if total is None:
+        return {
+            "items": items,
+            "total": None,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": None,
+            "has_next": next_cursor is not None,
+            "has_prev": True,
+            "next_cursor": next_cursor
+        }
+    
     total_pages = math.ceil(total / page_size) if total > 0 else 0
     
     return {
@@ -54,5 +78,146 @@ def create_paginated_response(
         "page_size": page_size,
         "total_pages": total_pages,
         "has_next": page < total_pages,
-        "has_prev": page > 1
+        "has_prev": page > 1,
+        "next_cursor": next_cursor
     }
+
+
+def encode_cursor(item: dict, order_by: str, pk: str) -> str:
+    """Codifica la clave de orden + PK de la última fila en un cursor opaco"""
+    raw = json.dumps([item.get(order_by), item.get(pk)], default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Decodifica un cursor generado por `encode_cursor`"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        valor, pk_valor = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+    return valor, pk_valor
+
+
+def _quote(valor: Any) -> str:
+    """Escapa un valor para usarlo dentro de un filtro or=(...) de PostgREST"""
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def apply_keyset(query: Any, cursor: Optional[str], order_by: str, pk: str, desc: bool = True) -> Any:
+    """
+    Ordena por (order_by, pk) y, si hay cursor, filtra las filas posteriores a él
+    
+    Sigue el orden por defecto de Postgres para NULL (primero en DESC, al
+    final en ASC), así las filas sin valor en `order_by` no se pierden.
+    
+    Args:
+        query: Select de supabase-py con sus filtros aplicados
+        cursor: Cursor recibido del cliente (o None para la primera página)
+        order_by: Columna de orden
+        pk: Clave primaria (desempate)
+        desc: Orden descendente
+    
+    Returns:
+        La consulta con filtro de cursor y orden aplicados
+    """
+    if cursor:
+        valor, pk_valor = decode_cursor(cursor)
+        op = "lt" if desc else "gt"
+        siguiente_pk = f"{pk}.{op}.{_quote(pk_valor)}"
+        
+        if valor is None:
+            condiciones = [f"and({order_by}.is.null,{siguiente_pk})"]
+            if desc:
+                condiciones.append(f"{order_by}.not.is.null")
+        else:
+            condiciones = [
+                f"{order_by}.{op}.{_quote(valor)}",
+                f"and({order_by}.eq.{_quote(valor)},{siguiente_pk})"
+            ]
+            if not desc:
+                condiciones.append(f"{order_by}.is.null")
+        
+        query = query.or_(",".join(condiciones))
+    
+    return query.order(order_by, desc=desc, nullsfirst=desc).order(pk, desc=desc)
+
+
+async def paginate_query(
+    query: Any,
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+    order_by: Optional[str] = None,
+    pk: Optional[str] = None,
+    desc: bool = True
+) -> dict:
+    """
+    Ejecuta una consulta paginada obteniendo datos y total en un solo request
+    
+    La consulta debe construirse con `select(..., count=...)` y sus filtros;
+    aquí se aplica el orden y `range()`. PostgREST devuelve el total en el
+    header Content-Range de la misma respuesta.
+    
+    Modos de conteo:
+        - "exact": COUNT(*) real (tablas chicas/medianas)
+        - "planned": estimación del planner de Postgres (tablas muy grandes)
+        - "estimated": exacto hasta el límite de filas de PostgREST, luego estimado
+    
+    Paginación por cursor (opt-in): si se indica `order_by` y `pk`, cada
+    respuesta incluye `next_cursor`. Al enviarlo como `cursor` se pasa a modo
+    keyset: se filtra por (order_by, pk) en lugar de usar offset, así una
+    página profunda cuesta lo mismo que la primera. En ese modo no se cuenta
+    (construir el select con count=None).
+    
+    Ejemplo de uso:
+        query = supabase.table("pago").select("*", count=None if cursor else "exact")
+        return await paginate_query(query, page, page_size, cursor, "fecha_pago", "id_pago")
+    
+    Args:
+        query: Select de supabase-py con count y filtros aplicados
+        page: Número de página (desde 1, ignorado en modo cursor)
+        page_size: Tamaño de página
+        cursor: Cursor de la página anterior
+        order_by: Columna de orden
+        pk: Clave primaria (desempate del orden y parte del cursor)
+        desc: Orden descendente
+    
+    Returns:
+        Dict con estructura de PaginatedResponse
+    """
+    if order_by and pk:
+        query = apply_keyset(query, cursor, order_by, pk, desc)
+    
+    if cursor:
+        # Modo keyset: se pide una fila extra para saber si hay página siguiente
+        result = await execute_async(query.limit(page_size + 1))
+        items = result.data[:page_size]
+        next_cursor = encode_cursor(items[-1], order_by, pk) if len(result.data) > page_size else None
+        return create_paginated_response(items=items, total=None, page=page, page_size=page_size, next_cursor=next_cursor)
+    
+    skip = (page - 1) * page_size
+    base_params = query.params
+    
+    try:
+        result = await execute_async(query.range(skip, skip + page_size - 1))
+    except APIError as e:
+        # Página fuera de rango: PostgREST responde 416, se pide solo el total
+        if e.code != "PGRST103":
+            raise
+        query.params = base_params.set("limit", 0)
+        result = await execute_async(query)
+    
+    total = result.count if result.count is not None else len(result.data)
+    
+    next_cursor = None
+    if order_by and pk and result.data and skip + len(result.data) < total:
+        next_cursor = encode_cursor(result.data[-1], order_by, pk)
+    
+    return create_paginated_response(
+        items=result.data,
+        total=total,
+        page=page,
+        page_size=page_size,
+        next_cursor=next_cursor
+    )
@@ -0,0 +1,168 @@
+"""
+Utilidades para endpoints de alta masiva (POST /api/<entidad>/bulk)
+
+Un lote se procesa en tres pasos, cada uno con pocas consultas:
+
+    1. Validar cada fila contra su schema (errores por fila, no 422 global)
+    2. Validar claves foráneas con un `in_()` por tabla referenciada
+    3. Insertar en bloques; si un bloque falla se reintenta fila por fila
+       para reportar exactamente cuál rompió la restricción
+
+La respuesta siempre es un reporte con el resultado de cada fila.
+"""
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from pydantic import BaseModel, ValidationError
+
+from app.database import get_supabase_client, execute_async
+
+# Filas por INSERT / valores por filtro in_() (acota cuerpo y largo de URL)
+BULK_CHUNK_SIZE = 500
+BULK_MAX_ITEMS = 10000
+
+
+def chunked(items: List[Any], size: int = BULK_CHUNK_SIZE) -> Iterable[List[Any]]:
+    """Divide una lista en bloques de `size` elementos"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BulkReport:
+    """Resultado por fila de una operación masiva"""
+
+    def __init__(self, total: int):
+        self.resultados: List[Optional[dict]] = [None] * total
+
+    def error(self, indice: int, detalle: str):
+        self.resultados[indice] = {"indice": indice, "status": "error", "detalle": detalle}
+
+    def created(self, indice: int, id_creado: Any):
+        self.resultados[indice] = {"indice": indice, "status": "creado", "id": id_creado}
+
+    def updated(self, indice: int, id_actualizado: Any):
+        self.resultados[indice] = {"indice": indice, "status": "actualizado", "id": id_actualizado}
+
+    def has_error(self, indice: int) -> bool:
+        resultado = self.resultados[indice]
+        return resultado is not None and resultado["status"] == "error"
+
+    def as_dict(self) -> dict:
+        creados = len([r for r in self.resultados if r and r["status"] == "creado"])
+        actualizados = len([r for r in self.resultados if r and r["status"] == "actualizado"])
+        return {
+            "total": len(self.resultados),
+            "creados": creados,
+            "actualizados": actualizados,
+            "fallidos": len(self.resultados) - creados - actualizados,
+            "resultados": self.resultados,
+        }
+
+
+def validate_rows(items: List[dict], schema: Type[BaseModel], report: BulkReport) -> List[Tuple[int, BaseModel]]:
+    """
+    Valida cada fila contra el schema de creación
+
+    Returns:
+        Lista de (índice, modelo) de las filas válidas
+    """
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {BULK_MAX_ITEMS} filas")
+
+    validas = []
+    for indice, item in enumerate(items):
+        try:
+            validas.append((indice, schema.model_validate(item)))
+        except ValidationError as e:
+            errores = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+            report.error(indice, errores)
+    return validas
+
+
+def mark_duplicates(rows: List[Tuple[int, Any]], key, report: BulkReport, detalle: str):
+    """Marca como error las filas cuya clave ya apareció antes en el mismo lote"""
+    vistos = set()
+    for indice, row in rows:
+        valor = key(row)
+        if valor is None:
+            continue
+        if valor in vistos:
+            report.error(indice, detalle)
+        vistos.add(valor)
+
+
+async def fetch_in(table: str, column: str, values: Iterable[Any], columns: str = "*") -> List[dict]:
+    """
+    Trae las filas de `table` cuyo `column` está en `values`
+
+    Un `in_()` por bloque de BULK_CHUNK_SIZE valores (uno solo en lotes chicos).
+    """
+    supabase = get_supabase_client()
+    unicos = list(dict.fromkeys(v for v in values if v is not None))
+
+    filas = []
+    for bloque in chunked(unicos):
+        result = await execute_async(supabase.table(table).select(columns).in_(column, bloque))
+        filas.extend(result.data)
+    return filas
+
+
+async def existing_values(table: str, column: str, values: Iterable[Any]) -> set:
+    """Valores de `values` que ya existen en `table.column`"""
+    return {fila[column] for fila in await fetch_in(table, column, values, column)}
+
+
+async def insert_rows(
+    table: str,
+    pk: str,
+    rows: List[Tuple[int, dict]],
+    report: BulkReport,
+    on_conflict: Optional[str] = None,
+    existing: Iterable[Any] = ()
+) -> List[Tuple[int, dict]]:
+    """
+    Inserta (o hace upsert si se indica `on_conflict`) en bloques
+
+    Las filas vuelven en el mismo orden en que se enviaron, así cada fila
+    insertada se asocia con su índice del lote. Si un bloque es rechazado se
+    reintenta fila por fila y solo las filas culpables quedan con error.
+
+    En un upsert, `existing` son los valores de `pk` que ya existían antes
+    (ver `existing_values`): esas filas se reportan como actualizadas.
+
+    Returns:
+        Lista de (índice, fila insertada)
+    """
+    supabase = get_supabase_client()
+    insertadas = []
+    existing = set(existing)
+
+    def _query(datos):
+        if on_conflict:
+            return supabase.table(table).upsert(datos, on_conflict=on_conflict)
+        return supabase.table(table).insert(datos)
+
+    for bloque in chunked(rows):
+        try:
+            result = await execute_async(_query([data for _, data in bloque]))
+            pares = list(zip([indice for indice, _ in bloque], result.data))
+            for indice, _ in bloque[len(result.data):]:
+                report.error(indice, "La fila no fue insertada")
+        except APIError:
+            pares = []
+            for indice, data in bloque:
+                try:
+                    result = await execute_async(_query(data))
+                    pares.append((indice, result.data[0]))
+                except APIError as e:
+                    report.error(indice, e.message or str(e))
+
+        for indice, fila in pares:
+            if fila[pk] in existing:
+                report.updated(indice, fila[pk])
+            else:
+                report.created(indice, fila[pk])
+            insertadas.append((indice, fila))
+
+    return insertadas
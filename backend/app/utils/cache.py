@@ -0,0 +1,459 @@
+"""
+Caché de resultados de consultas para endpoints GET
+
+Las entradas se identifican por namespace + handler + parámetros
+normalizados del request, con expiración por entrada (TTL) y contadores de
+aciertos/fallos. Cada entrada lleva tags por entidad (`propiedad:<id>`,
+`direccion:<id>`, `cliente:<ci>`, o el listado completo, p. ej.
+`propiedades`) y los endpoints de escritura invalidan solo los tags que
+afectan. El almacenamiento es intercambiable (CACHE_BACKEND):
+
+    - "memory": LRU en memoria del proceso, con tamaño máximo
+    - "redis": compartido por todos los workers; invalidar en uno invalida
+      en todos y las entradas calientes se reutilizan entre procesos.
+      REDIS_URL="fakeredis://" usa fakeredis para desarrollo local.
+"""
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+from uuid import UUID
+
+from fastapi import Response
+from app.config import get_settings
+
+settings = get_settings()
+
+_PRIMITIVOS = (str, int, float, bool, Decimal, date, datetime, UUID, Enum)
+
+
+class CacheBackend(ABC):
+    """
+    Interfaz común de los backends de caché
+
+    Los backends implementan los métodos abstractos (`_get`, `_set`,
+    `delete`, `invalidate_tags`, `_invalidate_all`, `generation` y
+    `_backend_stats`): a uno incompleto no se lo puede instanciar. Aquí se
+    llevan los contadores de aciertos/fallos. Toda entrada lleva además el tag
+    implícito `ns:<namespace>`.
+
+    La generación es un contador que sube con cada invalidación. Quien lee
+    de la BD para cachear el resultado la captura antes de la consulta y la
+    pasa a `set`: si entre medio hubo una invalidación, el resultado puede
+    ser anterior a ella y no se guarda.
+    """
+
+    def __init__(self, default_ttl: float):
+        self.default_ttl = default_ttl
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _namespace_stats(self, namespace: str) -> Dict[str, int]:
+        return self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "evictions": 0})
+
+    async def get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        """Retorna (encontrado, valor); las entradas vencidas cuentan como fallo"""
+        hit, value = await self._get(namespace, key)
+        self._namespace_stats(namespace)["hits" if hit else "misses"] += 1
+        return hit, value
+
+    async def set(
+        self,
+        namespace: str,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+        generation: Optional[int] = None
+    ) -> bool:
+        """
+        Guarda un valor con su TTL (default: CACHE_DEFAULT_TTL_SECONDS) y tags
+
+        Con `generation`, solo lo guarda si no hubo invalidaciones desde que
+        se capturó. Retorna si se guardó.
+        """
+        all_tags = {f"ns:{namespace}", *tags}
+        return await self._set(namespace, key, value, ttl or self.default_ttl, all_tags, generation)
+
+    @abstractmethod
+    async def _get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _set(self, namespace: str, key: str, value: Any, ttl: float, tags: Set[str], generation: Optional[int]) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def generation(self) -> int:
+        """Generación actual (ver `set`)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str):
+        """Elimina una entrada puntual"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Elimina las entradas que llevan alguno de los tags y retorna cuántas eran"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _invalidate_all(self) -> int:
+        raise NotImplementedError
+
+    async def invalidate(self, namespace: Optional[str] = None) -> int:
+        """Elimina las entradas de un namespace (o todas) y retorna cuántas eran"""
+        if namespace is None:
+            return await self._invalidate_all()
+        return await self.invalidate_tags([f"ns:{namespace}"])
+
+    @abstractmethod
+    async def _backend_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def close(self):
+        """Libera las conexiones del backend (evento shutdown)"""
+
+    async def stats(self) -> Dict[str, Any]:
+        """Estadísticas del backend y contadores por namespace de este proceso"""
+        backend = await self._backend_stats()
+        entradas = backend.pop("namespace_entries", {})
+
+        por_namespace = {}
+        for namespace, counters in self._stats.items():
+            total = counters["hits"] + counters["misses"]
+            por_namespace[namespace] = {
+                **counters,
+                "entries": entradas.get(namespace, 0),
+                "hit_rate": round(counters["hits"] / total, 3) if total else 0.0,
+            }
+
+        return {**backend, "default_ttl": self.default_ttl, "namespaces": por_namespace}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Caché LRU en memoria del proceso, con TTL por entrada y tamaño máximo"""
+
+    def __init__(self, max_entries: int, default_ttl: float):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any, Set[str]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Tuple[str, str]]] = {}
+        self._generation = 0
+
+    def _remove(self, entry_key: Tuple[str, str]):
+        """Quita una entrada y sus referencias en el índice de tags"""
+        _, _, tags = self._entries.pop(entry_key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(entry_key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def _get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get((namespace, key))
+
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end((namespace, key))
+                return True, value
+            self._remove((namespace, key))
+
+        return False, None
+
+    async def _set(self, namespace: str, key: str, value: Any, ttl: float, tags: Set[str], generation: Optional[int]) -> bool:
+        if generation is not None and generation != self._generation:
+            return False
+
+        if (namespace, key) in self._entries:
+            self._remove((namespace, key))
+
+        self._entries[(namespace, key)] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add((namespace, key))
+
+        while len(self._entries) > self.max_entries:
+            evicted = next(iter(self._entries))
+            self._remove(evicted)
+            self._namespace_stats(evicted[0])["evictions"] += 1
+        return True
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def delete(self, namespace: str, key: str):
+        self._generation += 1
+        if (namespace, key) in self._entries:
+            self._remove((namespace, key))
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        self._generation += 1
+        keys = set()
+        for tag in tags:
+            keys |= self._tags.get(tag, set())
+
+        for entry_key in keys:
+            self._remove(entry_key)
+        return len(keys)
+
+    async def _invalidate_all(self) -> int:
+        self._generation += 1
+        count = len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+        return count
+
+    async def _backend_stats(self) -> Dict[str, Any]:
+        entradas: Dict[str, int] = {}
+        for namespace, _ in self._entries:
+            entradas[namespace] = entradas.get(namespace, 0) + 1
+
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "tags": len(self._tags),
+            "max_entries": self.max_entries,
+            "namespace_entries": entradas,
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Caché compartido en Redis
+
+    Cada entrada es un string JSON con expiración nativa (SET EX). Cada tag
+    es un set con las claves que lo llevan; el set vive al menos tanto como
+    su entrada más longeva (EXPIRE NX + GT, Redis >= 7). Invalidar un tag
+    borra solo esas entradas y el efecto es inmediato para todos los
+    workers. El desalojo por tamaño queda a cargo de Redis (maxmemory +
+    volatile-lru): toda entrada del caché tiene TTL y es desalojable,
+    mientras que las claves sin TTL que comparten la instancia (las
+    revocaciones de tokens) no se desalojan nunca.
+    """
+
+    def __init__(self, client: Any, default_ttl: float, prefix: str = "cache"):
+        super().__init__(default_ttl)
+        self.client = client
+        self.prefix = prefix
+
+    def _entry_key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    def _generation_key(self) -> str:
+        return f"{self.prefix}:generacion"
+
+    async def _get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        raw = await self.client.get(self._entry_key(namespace, key))
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    async def _set(self, namespace: str, key: str, value: Any, ttl: float, tags: Set[str], generation: Optional[int]) -> bool:
+        from redis.exceptions import WatchError
+
+        entry_key = self._entry_key(namespace, key)
+        seconds = max(int(ttl), 1)
+
+        # Con generación: WATCH sobre el contador y MULTI/EXEC, así una
+        # invalidación que llegue justo antes de escribir aborta la escritura
+        async with self.client.pipeline(transaction=generation is not None) as pipe:
+            if generation is not None:
+                await pipe.watch(self._generation_key())
+                if int(await pipe.get(self._generation_key()) or 0) != generation:
+                    return False
+                pipe.multi()
+
+            pipe.set(entry_key, json.dumps(value, default=str), ex=seconds)
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                pipe.sadd(tag_key, entry_key)
+                pipe.expire(tag_key, seconds, nx=True)
+                pipe.expire(tag_key, seconds, gt=True)
+
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def generation(self) -> int:
+        return int(await self.client.get(self._generation_key()) or 0)
+
+    async def delete(self, namespace: str, key: str):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(self._entry_key(namespace, key))
+            pipe.incr(self._generation_key())
+            await pipe.execute()
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        if not tag_keys:
+            return 0
+
+        keys = await self.client.sunion(tag_keys)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*tag_keys, *keys)
+            pipe.incr(self._generation_key())
+            await pipe.execute()
+        return len(keys)
+
+    async def _invalidate_all(self) -> int:
+        keys = [
+            key async for key in self.client.scan_iter(match=f"{self.prefix}:*")
+            if key != self._generation_key()
+        ]
+        async with self.client.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.delete(*keys)
+            pipe.incr(self._generation_key())
+            await pipe.execute()
+        return len(keys)
+
+    async def _backend_stats(self) -> Dict[str, Any]:
+        entradas = {}
+        for namespace in self._stats:
+            entradas[namespace] = await self.client.scard(self._tag_key(f"ns:{namespace}"))
+
+        return {
+            "backend": "redis",
+            "entries": sum(entradas.values()),
+            "namespace_entries": entradas,
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_cache_backend() -> CacheBackend:
+    """Crea el backend configurado en CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            default_ttl=settings.CACHE_DEFAULT_TTL_SECONDS,
+        )
+
+    if settings.CACHE_BACKEND == "redis":
+        if settings.REDIS_URL.startswith("fakeredis://"):
+            try:
+                from fakeredis import FakeAsyncRedis
+            except ImportError:
+                raise RuntimeError("REDIS_URL=fakeredis:// requiere el paquete 'fakeredis'")
+            client = FakeAsyncRedis(decode_responses=True)
+        else:
+            try:
+                from redis.asyncio import Redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis requiere el paquete 'redis'")
+            client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+        return RedisCacheBackend(client, default_ttl=settings.CACHE_DEFAULT_TTL_SECONDS)
+
+    raise RuntimeError(f"CACHE_BACKEND desconocido: {settings.CACHE_BACKEND}")
+
+
+query_cache = create_cache_backend()
+
+
+async def invalidate_tags(*tags: str) -> int:
+    """
+    Invalida las entradas cacheadas que llevan alguno de los tags
+
+    Ejemplo de uso (al actualizar una propiedad):
+        await invalidate_tags("propiedades", f"propiedad:{id_propiedad}")
+    """
+    return await query_cache.invalidate_tags(tags)
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, (list, tuple, set)):
+        return sorted(str(v) for v in value)
+    return str(value) if not isinstance(value, (str, int, float, bool)) else value
+
+
+def _make_key(handler: str, kwargs: Dict[str, Any], user_scoped: Iterable[str]) -> str:
+    """
+    Clave = handler + hash de los parámetros de query/path normalizados.
+
+    Se ignoran dependencias (usuario actual, Response, etc.) y valores None,
+    salvo que un flag de `user_scoped` esté activo: ahí el resultado depende
+    del usuario y su id entra en la clave.
+    """
+    params = sorted(
+        (name, _normalize(value))
+        for name, value in kwargs.items()
+        if value is not None and (isinstance(value, _PRIMITIVOS) or isinstance(value, (list, tuple, set)))
+    )
+
+    usuario = None
+    if any(kwargs.get(flag) for flag in user_scoped):
+        current_user = kwargs.get("current_user") or {}
+        usuario = current_user.get("id_usuario")
+
+    digest = hashlib.sha1(json.dumps([params, usuario]).encode()).hexdigest()
+    return f"{handler}:{digest}"
+
+
+def cached(
+    namespace: str,
+    ttl: Optional[float] = None,
+    user_scoped: Iterable[str] = (),
+    tags: Optional[Callable[[Any], Iterable[str]]] = None
+) -> Callable:
+    """
+    Decorador para cachear la respuesta de un handler GET
+
+    Se aplica debajo de `@router.get(...)`. FastAPI sigue resolviendo las
+    dependencias (autenticación incluida) en cada request; solo se evita
+    la consulta a la base de datos. Los headers que el handler agregue al
+    parámetro `response` también se guardan y se repiten en los aciertos.
+
+    Ejemplo de uso:
+        @router.get("/clientes/")
+        @cached("clientes", ttl=300, user_scoped=("mis_clientes",), tags=tags_clientes)
+        async def listar_clientes(...):
+
+    Args:
+        namespace: Grupo de entradas, usado para invalidarlas juntas
+        ttl: Segundos de vida de cada entrada (default: CACHE_DEFAULT_TTL_SECONDS)
+        user_scoped: Parámetros que, si están activos, hacen la respuesta propia del usuario
+        tags: Función que recibe el resultado y retorna sus tags
+    """
+    user_scoped = tuple(user_scoped)
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = _make_key(func.__name__, kwargs, user_scoped)
+            response: Optional[Response] = next(
+                (value for value in kwargs.values() if isinstance(value, Response)), None
+            )
+
+            hit, entry = await query_cache.get(namespace, key)
+            if hit:
+                value, headers = entry
+                if response is not None:
+                    response.headers.update(headers)
+                return value
+
+            # Capturada antes de la consulta: si una escritura invalida
+            # mientras tanto, este resultado puede ser viejo y no se guarda
+            generation = await query_cache.generation()
+            value = await func(*args, **kwargs)
+            headers = dict(response.headers) if response is not None else {}
+            await query_cache.set(namespace, key, (value, headers), ttl, tags(value) if tags else (), generation)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -1,99 +1,167 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.database import get_supabase_client
+from app.database import get_supabase_client, execute_async
 from app.utils.security import decode_access_token
-from app.schemas.usuario import TokenData
-from typing import Optional, Dict, Any  # ✅ Agregar Dict y Any
-from datetime import datetime, timedelta
+from app.utils.cache import query_cache, MemoryCacheBackend, RedisCacheBackend
+from app.config import get_settings
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import time
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Esquema de autenticación OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/usuarios/login")
 
-# ✅ Caché simple de usuarios (en memoria) - CON TIPO
-_user_cache: Dict[str, Dict[str, Any]] = {}
+# ✅ Caché de usuarios (en el backend de caché compartido). Con el backend en
+# memoria cada worker tiene el suyo y una revocación solo lo invalida en el
+# worker que la recibió: ahí el TTL es corto (USER_CACHE_LOCAL_SECONDS)
 USER_CACHE_DURATION = timedelta(minutes=5)
+USER_CACHE_LOCAL_DURATION = timedelta(seconds=settings.USER_CACHE_LOCAL_SECONDS)
+
+# ✅ Claims ya verificados, por hash del token y hasta su `exp` (local al proceso:
+# verificar la firma HS256 es más barato que ir a Redis)
+_token_cache = MemoryCacheBackend(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    default_ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
 
-# ✅ Caché de propiedades (en memoria) - CON TIPO
-_propiedades_cache: Dict[str, Any] = {"data": None, "timestamp": None}
-PROPIEDADES_CACHE_DURATION = timedelta(minutes=2)
+# ✅ Revocaciones fuera del caché de consultas (que desaloja y se vacía). La
+# fuente de verdad es la columna usuario.tokens_revocados_desde; con Redis se
+# replica además en una clave sin TTL por usuario (`revocacion:<id>`), que
+# la política volatile-lru nunca desaloja y que todos los workers ven.
+# Con el backend en memoria no hay dónde compartirlas: se consulta la fila
+# del usuario, cacheada en el proceso durante USER_CACHE_LOCAL_DURATION.
+_revocaciones = query_cache.client if isinstance(query_cache, RedisCacheBackend) else None
 
-def _get_cached_user(usuario_id: str):
+async def _get_cached_user(usuario_id: str):
     """Obtiene usuario del caché si existe y es válido"""
-    if usuario_id in _user_cache:
-        cached_data = _user_cache[usuario_id]
-        if datetime.now() - cached_data["timestamp"] < USER_CACHE_DURATION:
-            print(f"✅ [CACHE] Usuario {usuario_id} encontrado en caché")
-            return cached_data["user"]
-    return None
-
-def _set_cached_user(usuario_id: str, user: dict):
-    """Guarda usuario en caché"""
-    _user_cache[usuario_id] = {
-        "user": user,
-        "timestamp": datetime.now()
-    }
-    print(f"💾 [CACHE] Usuario {usuario_id} guardado en caché")
+    hit, user = await query_cache.get("usuarios", usuario_id)
+    return user if hit else None
+
+async def _set_cached_user(usuario_id: str, user: dict, generation: int):
+    """Guarda usuario en caché (si no se invalidó desde `generation`)"""
+    duracion = USER_CACHE_DURATION if _revocaciones is not None else USER_CACHE_LOCAL_DURATION
+    await query_cache.set("usuarios", usuario_id, user, duracion.total_seconds(), generation=generation)
+
+async def _load_user(usuario_id: str) -> Optional[dict]:
+    """Obtiene el usuario del caché o, si no está, de la BD (y lo cachea)"""
+    cached_user = await _get_cached_user(usuario_id)
+    if cached_user:
+        return cached_user
+
+    generation = await query_cache.generation()
+    response = await execute_async(get_supabase_client().table("usuario").select("*").eq("id_usuario", usuario_id))
+    if not response.data:
+        return None
+
+    await _set_cached_user(usuario_id, response.data[0], generation)
+    return response.data[0]
+
+async def _verify_token(token: str) -> Optional[dict]:
+    """Decodifica el token, reutilizando los claims si ya se verificó antes"""
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    hit, payload = await _token_cache.get("tokens", token_hash)
+
+    if hit:
+        if payload["exp"] > time.time():
+            return payload
+        await _token_cache.delete("tokens", token_hash)
+        return None
+
+    payload = decode_access_token(token)
+    if payload is not None and "exp" in payload:
+        await _token_cache.set("tokens", token_hash, payload, payload["exp"] - time.time())
+    return payload
+
+def _revocation_key(usuario_id: str) -> str:
+    return f"revocacion:{usuario_id}"
+
+def _issued_before(payload: dict, revocado_en: Optional[int]) -> bool:
+    """
+    Un token queda revocado si se emitió antes de la última revocación
+
+    `iat` viene en segundos enteros y la revocación se guarda truncada al
+    segundo: un token emitido en el mismo segundo (p. ej. el login que sigue
+    al cambio de rol) sigue siendo válido.
+    """
+    return revocado_en is not None and payload.get("iat", 0) < revocado_en
+
+async def _is_revoked(usuario_id: str, payload: dict) -> bool:
+    """Consulta la revocación en Redis (solo con CACHE_BACKEND=redis)"""
+    revocado_en = await _revocaciones.get(_revocation_key(usuario_id))
+    return _issued_before(payload, int(revocado_en) if revocado_en is not None else None)
+
+def _is_revoked_row(usuario: dict, payload: dict) -> bool:
+    """Consulta la revocación en la fila del usuario"""
+    revocado_en = usuario.get("tokens_revocados_desde")
+    if revocado_en is None:
+        return False
+    return _issued_before(payload, int(datetime.fromisoformat(revocado_en).timestamp()))
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Obtiene el usuario actual desde el token JWT con caché"""
-    print("🔍 [DEBUG] get_current_user - Token recibido")
+    """
+    Obtiene el usuario actual desde el token JWT
     
+    Con CACHE_BACKEND=redis, si el token trae los claims `id_rol` y
+    `es_activo_usuario` (ver login) el usuario se arma desde el token sin
+    consultar la BD; los tokens sin esos claims se resuelven con el caché de
+    usuarios y, si falla, con la BD. Con el backend en memoria la revocación
+    se verifica contra la fila del usuario, cacheada en el proceso unos
+    segundos: una consulta por usuario y worker cada USER_CACHE_LOCAL_SECONDS.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = decode_access_token(token)
+    payload = await _verify_token(token)
     if payload is None:
-        print("❌ [ERROR] Token inválido o expirado")
         raise credentials_exception
     
     usuario_id: Optional[str] = payload.get("sub")
     if usuario_id is None:
-        print("❌ [ERROR] No se encontró usuario_id en el token")
         raise credentials_exception
     
-    print(f"✅ [DEBUG] Usuario ID del token: {usuario_id}")
-    
-    # Intentar obtener del caché primero
-    cached_user = _get_cached_user(usuario_id)
-    if cached_user:
-        return cached_user
-    
-    # Si no está en caché, buscar en BD
-    supabase = get_supabase_client()
-    try:
-        print(f"🔍 [DEBUG] Buscando usuario en BD: {usuario_id}")
-        response = supabase.table("usuario").select("*").eq("id_usuario", usuario_id).execute()
-        
-        print(f"📦 [DEBUG] Respuesta de Supabase: {response.data}")
-        
-        if not response.data or len(response.data) == 0:
-            print("❌ [ERROR] Usuario no encontrado en BD")
+    if _revocaciones is not None:
+        if await _is_revoked(usuario_id, payload):
             raise credentials_exception
         
-        usuario = response.data[0]
-        print(f"✅ [DEBUG] Usuario encontrado: {usuario.get('nombre_usuario')}, id_rol: {usuario.get('id_rol')}")
-        
-        if not usuario.get("es_activo_usuario", False):
-            print("❌ [ERROR] Usuario inactivo")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Usuario inactivo"
-            )
-        
-        # Guardar en caché
-        _set_cached_user(usuario_id, usuario)
-        
-        print("✅ [DEBUG] Usuario activo, retornando datos")
-        return usuario
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ [ERROR] Excepción al buscar usuario: {str(e)}")
+        # Camino rápido: claims embebidos en el token
+        if "id_rol" in payload and "es_activo_usuario" in payload:
+            if not payload["es_activo_usuario"]:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Usuario inactivo"
+                )
+            return {
+                "id_usuario": usuario_id,
+                "id_rol": payload["id_rol"],
+                "es_activo_usuario": payload["es_activo_usuario"],
+                "nombre_usuario": payload.get("nombre_usuario"),
+            }
+    
+    # Caché de usuarios y, si falla, BD
+    try:
+        usuario = await _load_user(usuario_id)
+    except Exception:
+        logger.exception("Error al buscar el usuario %s", usuario_id)
+        raise credentials_exception
+    
+    if usuario is None or _is_revoked_row(usuario, payload):
         raise credentials_exception
+    
+    if not usuario.get("es_activo_usuario", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario inactivo"
+        )
+    
+    return usuario
 
 async def get_current_active_user(current_user: dict = Depends(get_current_user)):
     """Verifica que el usuario actual esté activo"""
@@ -104,36 +172,23 @@ async def get_current_active_user(current_user: dict = Depends(get_current_user)
         )
     return current_user
 
-def invalidate_user_cache(usuario_id: str):
+async def invalidate_user_cache(usuario_id: str):
     """Invalida el caché de un usuario específico"""
-    if usuario_id in _user_cache:
-        del _user_cache[usuario_id]
-        print(f"🗑️ [CACHE] Caché del usuario {usuario_id} invalidado")
-
-# ✅ Funciones de caché para propiedades
-def get_propiedades_cached():
-    """Obtiene propiedades del caché si existe y es válido"""
-    global _propiedades_cache
-    now = datetime.now()
-    
-    if (_propiedades_cache["data"] is not None and 
-        _propiedades_cache["timestamp"] is not None and
-        now - _propiedades_cache["timestamp"] < PROPIEDADES_CACHE_DURATION):
-        print("✅ [PROPIEDADES CACHE] Usando caché")
-        return _propiedades_cache["data"]
-    
-    return None
-
-def set_propiedades_cached(data):
-    """Guarda propiedades en caché"""
-    global _propiedades_cache
-    _propiedades_cache["data"] = data
-    _propiedades_cache["timestamp"] = datetime.now()
-    print("💾 [PROPIEDADES CACHE] Guardado en caché")
-
-def clear_propiedades_cache():
-    """Invalida el caché de propiedades"""
-    global _propiedades_cache
-    _propiedades_cache["data"] = None
-    _propiedades_cache["timestamp"] = None
-    print("🗑️ [PROPIEDADES CACHE] Caché limpiado")
+    await query_cache.delete("usuarios", usuario_id)
+
+async def revoke_user_tokens(usuario_id: str):
+    """
+    Revoca los tokens ya emitidos de un usuario (p. ej. al desactivarlo)
+
+    Requiere la columna usuario.tokens_revocados_desde
+    (ver migrations/011_revocacion_tokens.sql).
+    """
+    revocado_en = datetime.now(timezone.utc).replace(microsecond=0)
+    await execute_async(
+        get_supabase_client().table("usuario")
+        .update({"tokens_revocados_desde": revocado_en.isoformat()})
+        .eq("id_usuario", usuario_id)
+    )
+    if _revocaciones is not None:
+        await _revocaciones.set(_revocation_key(usuario_id), int(revocado_en.timestamp()))
+    await invalidate_user_cache(usuario_id)
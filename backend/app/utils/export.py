@@ -0,0 +1,116 @@
+"""
+Exportación en streaming (CSV / NDJSON) de tablas completas
+
+Las filas se leen de PostgREST por páginas con paginación keyset (ver
+`apply_keyset`) y se escriben en la respuesta a medida que llegan: la
+memoria usada es la de una página, sin importar el tamaño de la tabla.
+"""
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from fastapi.responses import StreamingResponse
+
+from app.database import execute_async
+from app.schemas.pagination import apply_keyset, encode_cursor
+
+EXPORT_PAGE_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+async def _iter_pages(
+    build_query: Callable[[], Any],
+    order_by: str,
+    pk: str,
+    desc: bool,
+    first_page: List[dict]
+) -> AsyncIterator[List[dict]]:
+    """Recorre la tabla página por página a partir de la primera ya leída"""
+    page = first_page
+    while page:
+        yield page
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        cursor = encode_cursor(page[-1], order_by, pk)
+        query = apply_keyset(build_query(), cursor, order_by, pk, desc)
+        page = (await execute_async(query.limit(EXPORT_PAGE_SIZE))).data
+
+
+def _csv_value(value: Any) -> Any:
+    # Recursos embebidos (p. ej. la dirección de una propiedad) van como JSON
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def _render(pages: AsyncIterator[List[dict]], formato: str, columns: Optional[List[str]]) -> AsyncIterator[str]:
+    columnas: Optional[List[str]] = None
+
+    async for page in pages:
+        if formato == "ndjson":
+            yield "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in page)
+            continue
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columnas or list(page[0].keys()), extrasaction="ignore")
+        if columnas is None:
+            # El encabezado sale de la primera fila y se escribe una sola vez
+            columnas = list(writer.fieldnames)
+            writer.writeheader()
+        for row in page:
+            writer.writerow({key: _csv_value(value) for key, value in row.items()})
+        yield buffer.getvalue()
+
+    # Sin filas: el CSV lleva igual el encabezado, así no se confunde con una descarga rota
+    if formato == "csv" and columnas is None and columns:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue()
+
+
+async def stream_export(
+    build_query: Callable[[], Any],
+    formato: str,
+    nombre: str,
+    order_by: str,
+    pk: str,
+    desc: bool = True,
+    columns: Optional[List[str]] = None
+) -> StreamingResponse:
+    """
+    Exporta todas las filas de una consulta como CSV o NDJSON
+
+    La primera página se lee antes de responder, así un error de la consulta
+    se devuelve como 500 y no como una descarga cortada.
+
+    Ejemplo de uso:
+        return await stream_export(
+            lambda: supabase.table("cliente").select("*"),
+            formato, "clientes", "fecha_registro_cliente", "ci_cliente",
+            columns=list(ClienteResponse.model_fields),
+        )
+
+    Args:
+        build_query: Función que retorna el select con sus filtros (sin orden)
+        formato: "csv" o "ndjson"
+        nombre: Nombre base del archivo descargado
+        order_by: Columna de orden
+        pk: Clave primaria (desempate del orden)
+        desc: Orden descendente
+        columns: Encabezado del CSV si la consulta no devuelve filas (con
+            filas, las columnas salen de la primera)
+    """
+    query = apply_keyset(build_query(), None, order_by, pk, desc)
+    first_page = (await execute_async(query.limit(EXPORT_PAGE_SIZE))).data
+
+    pages = _iter_pages(build_query, order_by, pk, desc, first_page)
+    return StreamingResponse(
+        _render(pages, formato, columns),
+        media_type=EXPORT_FORMATS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'},
+    )
@@ -0,0 +1,87 @@
+"""
+Claves de idempotencia para endpoints de escritura en lote
+
+El cliente envía el header `Idempotency-Key`; la primera ejecución reserva
+la clave en la tabla `idempotencia` (ver migrations/010_idempotencia.sql)
+y guarda ahí su respuesta. Los reintentos con la misma clave reciben esa
+misma respuesta sin volver a procesar el lote.
+
+La reserva es un INSERT ... ON CONFLICT en la base de datos: atómica entre
+workers y fuera del caché de consultas, que puede desalojar o vaciar sus
+entradas en cualquier momento.
+"""
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from app.config import get_settings
+from app.database import get_supabase_client, execute_async
+
+settings = get_settings()
+
+_EN_PROCESO = "en_proceso"
+
+
+def _fingerprint(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def begin_idempotent(scope: str, key: Optional[str], payload: Any) -> Optional[dict]:
+    """
+    Reserva la clave de una operación idempotente
+
+    Args:
+        scope: Operación + usuario (las claves no se comparten entre ambos)
+        key: Valor del header Idempotency-Key (None = sin idempotencia)
+        payload: Cuerpo del request, para detectar claves reutilizadas
+
+    Returns:
+        La respuesta guardada si la clave ya se procesó, o None si hay que procesarla
+
+    Raises:
+        HTTPException 409: La misma clave se está procesando en otro request
+        HTTPException 422: La clave ya se usó con un cuerpo distinto
+    """
+    if not key:
+        return None
+
+    result = await execute_async(get_supabase_client().rpc("reservar_idempotencia", {
+        "p_ambito": scope,
+        "p_clave": key,
+        "p_huella": _fingerprint(payload),
+        "p_ttl_segundos": settings.IDEMPOTENCY_TTL_SECONDS,
+    }))
+    entry = result.data
+
+    if entry["reservada"]:
+        return None
+    if entry["huella"] != _fingerprint(payload):
+        raise HTTPException(status_code=422, detail="La Idempotency-Key ya se usó con otro contenido")
+    if entry["estado"] == _EN_PROCESO:
+        raise HTTPException(status_code=409, detail="Hay un request con la misma Idempotency-Key en proceso")
+    return entry["respuesta"]
+
+
+async def finish_idempotent(scope: str, key: Optional[str], payload: Any, respuesta: Optional[dict]):
+    """
+    Guarda la respuesta de la operación; con `respuesta=None` libera la clave
+    (la operación falló y el cliente puede reintentar)
+    """
+    if not key:
+        return
+
+    supabase = get_supabase_client()
+
+    if respuesta is None:
+        await execute_async(
+            supabase.table("idempotencia").delete()
+            .eq("ambito", scope).eq("clave", key).eq("estado", _EN_PROCESO)
+        )
+        return
+
+    await execute_async(
+        supabase.table("idempotencia")
+        .update({"estado": "completado", "respuesta": respuesta})
+        .eq("ambito", scope).eq("clave", key).eq("huella", _fingerprint(payload))
+    )
@@ -0,0 +1,68 @@
+"""
+Validación concurrente de claves foráneas en los endpoints de escritura
+
+Antes de insertar, cada handler verifica que existan las filas referenciadas
+(propiedad, cliente, usuario...). Son consultas independientes: se lanzan
+todas a la vez y la latencia total es la de la más lenta, no la suma.
+"""
+import asyncio
+from typing import Any, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+from app.database import get_supabase_client, execute_async
+
+
+class Reference(NamedTuple):
+    """Fila que debe existir: `table.column == value` (404 con `detail` si no)"""
+    table: str
+    column: str
+    value: Any
+    detail: str
+    columns: str = "*"
+
+
+async def fetch_references(*refs: Reference) -> List[Optional[dict]]:
+    """
+    Verifica todas las referencias en paralelo y falla con la primera que no exista
+    
+    En cuanto una consulta vuelve vacía se responde 404 sin esperar al resto.
+    Las referencias con `value=None` (FK opcionales) no se consultan.
+    
+    Ejemplo de uso:
+        propiedad, cliente = await fetch_references(
+            Reference("propiedad", "id_propiedad", cita.id_propiedad, "La propiedad especificada no existe", "id_propiedad, estado_propiedad"),
+            Reference("cliente", "ci_cliente", cita.ci_cliente, "El cliente especificado no existe", "ci_cliente"),
+        )
+    
+    Returns:
+        La fila de cada referencia, en el mismo orden (None si `value` era None)
+    
+    Raises:
+        HTTPException 404: Con el `detail` de la primera referencia faltante
+    """
+    supabase = get_supabase_client()
+    tasks = {}
+    for ref in refs:
+        if ref.value is None:
+            continue
+        query = supabase.table(ref.table).select(ref.columns).eq(ref.column, ref.value).limit(1)
+        tasks[asyncio.ensure_future(execute_async(query))] = ref
+    
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.result().data:
+                    raise HTTPException(status_code=404, detail=tasks[task].detail)
+    finally:
+        # Fallo temprano: las consultas que siguen en vuelo ya no interesan
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # marca el error como leído (se propagó el primero)
+    
+    filas = {id(ref): task.result().data[0] for task, ref in tasks.items()}
+    return [filas.get(id(ref)) for ref in refs]
@@ -1,16 +1,24 @@
 """
 Utilidades de seguridad: hash de contraseñas, JWT, etc.
 """
+import threading
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+import anyio
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import get_settings
 
 settings = get_settings()
 
-# Contexto para hash de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Contexto para hash de contraseñas (los hashes con otro costo se marcan para rehash)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Hilos dedicados a bcrypt: cada hash ocupa ~250 ms de CPU (costo 12)
+_hash_limiter: Optional[anyio.CapacityLimiter] = None
+_hash_stats_lock = threading.Lock()
+_hash_stats: Dict[str, int] = {"operaciones_totales": 0, "rechazadas": 0, "rehashes": 0}
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -23,6 +31,74 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _get_hash_limiter() -> anyio.CapacityLimiter:
+    global _hash_limiter
+    if _hash_limiter is None:
+        _hash_limiter = anyio.CapacityLimiter(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    return _hash_limiter
+
+
+async def _run_bcrypt(func, *args) -> Any:
+    """
+    Ejecuta una operación bcrypt en el pool de hilos acotado.
+    
+    Si la cola ya tiene PASSWORD_HASH_MAX_QUEUE operaciones esperando se
+    responde 503 de inmediato: es preferible pedir un reintento que dejar
+    el request esperando varios segundos durante una ráfaga de logins.
+    """
+    limiter = _get_hash_limiter()
+    if limiter.statistics().tasks_waiting >= settings.PASSWORD_HASH_MAX_QUEUE:
+        with _hash_stats_lock:
+            _hash_stats["rechazadas"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiados inicios de sesión simultáneos, intente nuevamente",
+            headers={"Retry-After": "1"},
+        )
+    
+    with _hash_stats_lock:
+        _hash_stats["operaciones_totales"] += 1
+    return await anyio.to_thread.run_sync(func, *args, limiter=limiter)
+
+
+async def hash_password_async(password: str) -> str:
+    """Genera un hash de la contraseña sin bloquear el event loop"""
+    return await _run_bcrypt(pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña sin bloquear el event loop
+    
+    Returns:
+        (es_valida, nuevo_hash). `nuevo_hash` no es None cuando el hash
+        guardado usa un costo distinto de BCRYPT_ROUNDS y debe reemplazarse.
+    """
+    valida, nuevo_hash = await _run_bcrypt(pwd_context.verify_and_update, plain_password, hashed_password)
+    if nuevo_hash:
+        with _hash_stats_lock:
+            _hash_stats["rehashes"] += 1
+    return valida, nuevo_hash
+
+
+def get_password_hash_stats() -> Dict[str, Any]:
+    """
+    Retorna el estado del pool de hash de contraseñas
+    """
+    with _hash_stats_lock:
+        stats: Dict[str, Any] = dict(_hash_stats)
+    
+    limiter = _get_hash_limiter()
+    stats.update({
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "max_concurrencia": settings.PASSWORD_HASH_MAX_CONCURRENCY,
+        "max_cola": settings.PASSWORD_HASH_MAX_QUEUE,
+        "en_curso": limiter.borrowed_tokens,
+        "en_cola": limiter.statistics().tasks_waiting,
+    })
+    return stats
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Crea un token JWT
@@ -41,7 +117,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     
     return encoded_jwt
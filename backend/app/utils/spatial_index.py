@@ -0,0 +1,253 @@
+"""
+Índice espacial en memoria de las propiedades publicadas (pantalla de mapa)
+
+Grilla uniforme sobre latitud/longitud: cada celda guarda los IDs de las
+propiedades que caen en ella, así una consulta por viewport solo recorre
+las celdas que toca, sin ir a Supabase.
+
+    - Se carga completo al iniciar la app (MAP_INDEX_ENABLED=True)
+    - Se actualiza propiedad por propiedad cuando este proceso escribe
+      (propiedades, direcciones, cierre por contrato)
+    - Se recarga completo cada MAP_INDEX_REFRESH_SECONDS, para ver también
+      las escrituras hechas por otros workers
+
+Cada marcador es una tupla compacta (id, lat, lng, precio, tipo_operacion).
+"""
+import asyncio
+import logging
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import get_settings
+from app.database import get_supabase_client, execute_async
+from app.utils.bulk import fetch_in
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+Marcador = Tuple[str, float, float, Optional[float], Optional[str]]
+
+# Columnas del mapa; la dirección viene embebida vía la FK id_direccion
+COLUMNAS_MAPA = (
+    "id_propiedad, precio_publicado_propiedad, tipo_operacion_propiedad, estado_propiedad, "
+    "direccion(latitud_direccion, longitud_direccion)"
+)
+ESTADO_MAPA = "Publicada"
+PAGINA_CARGA = 1000
+
+# Tamaño aproximado (en píxeles) de un cluster en pantalla
+CLUSTER_PX = 60
+
+
+class GridIndex:
+    """Grilla uniforme de marcadores; `cell_size` en grados"""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self._items: Dict[str, Marcador] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def upsert(self, marcador: Marcador):
+        id_propiedad, lat, lng = marcador[0], marcador[1], marcador[2]
+        self.remove(id_propiedad)
+        self._items[id_propiedad] = marcador
+        self._cells.setdefault(self._cell(lat, lng), set()).add(id_propiedad)
+
+    def remove(self, id_propiedad: str):
+        marcador = self._items.pop(id_propiedad, None)
+        if marcador is None:
+            return
+        cell = self._cell(marcador[1], marcador[2])
+        ids = self._cells.get(cell)
+        if ids is not None:
+            ids.discard(id_propiedad)
+            if not ids:
+                del self._cells[cell]
+
+    def query(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> List[Marcador]:
+        """Marcadores dentro del rectángulo"""
+        fila_min, col_min = self._cell(min_lat, min_lng)
+        fila_max, col_max = self._cell(max_lat, max_lng)
+
+        # Viewport muy grande (zoom bajo): recorrer las celdas ocupadas es más barato
+        if (fila_max - fila_min + 1) * (col_max - col_min + 1) > len(self._cells):
+            celdas = [
+                ids for (fila, col), ids in self._cells.items()
+                if fila_min <= fila <= fila_max and col_min <= col <= col_max
+            ]
+        else:
+            celdas = [
+                self._cells[(fila, col)]
+                for fila in range(fila_min, fila_max + 1)
+                for col in range(col_min, col_max + 1)
+                if (fila, col) in self._cells
+            ]
+
+        resultado = []
+        for ids in celdas:
+            for id_propiedad in ids:
+                marcador = self._items[id_propiedad]
+                if min_lat <= marcador[1] <= max_lat and min_lng <= marcador[2] <= max_lng:
+                    resultado.append(marcador)
+        return resultado
+
+    def stats(self) -> dict:
+        return {"marcadores": len(self._items), "celdas": len(self._cells), "cell_size": self.cell_size}
+
+
+def marcador_desde_fila(fila: dict) -> Optional[Marcador]:
+    """Marcador de una fila con COLUMNAS_MAPA, o None si no va en el mapa"""
+    direccion = fila.get("direccion") or {}
+    lat, lng = direccion.get("latitud_direccion"), direccion.get("longitud_direccion")
+    if fila.get("estado_propiedad") != ESTADO_MAPA or lat is None or lng is None:
+        return None
+    precio = fila.get("precio_publicado_propiedad")
+    return (
+        fila["id_propiedad"],
+        float(lat),
+        float(lng),
+        float(precio) if precio is not None else None,
+        fila.get("tipo_operacion_propiedad"),
+    )
+
+
+def cluster_marcadores(marcadores: Iterable[Marcador], zoom: int) -> Tuple[List[Marcador], List[Tuple[float, float, int]]]:
+    """
+    Agrupa los marcadores en celdas de ~CLUSTER_PX píxeles al zoom dado
+
+    Returns:
+        (marcadores sueltos, clusters como (lat, lng, cantidad) en su centroide)
+    """
+    # Grados por píxel en un mapa web de 256 px por tile
+    tamano = 360 / (256 * 2 ** zoom) * CLUSTER_PX
+    grupos: Dict[Tuple[int, int], List[Marcador]] = {}
+    for marcador in marcadores:
+        clave = (math.floor(marcador[1] / tamano), math.floor(marcador[2] / tamano))
+        grupos.setdefault(clave, []).append(marcador)
+
+    sueltos, clusters = [], []
+    for grupo in grupos.values():
+        if len(grupo) == 1:
+            sueltos.append(grupo[0])
+            continue
+        lat = sum(m[1] for m in grupo) / len(grupo)
+        lng = sum(m[2] for m in grupo) / len(grupo)
+        clusters.append((round(lat, 6), round(lng, 6), len(grupo)))
+    return sueltos, clusters
+
+
+# Índice del proceso (None si está deshabilitado o aún no se cargó)
+map_index: Optional[GridIndex] = None
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def get_map_index() -> Optional[GridIndex]:
+    """Índice actual (cambia de objeto en cada recarga completa)"""
+    return map_index
+
+
+async def load_map_index() -> GridIndex:
+    """Construye el índice con todas las propiedades publicadas y lo reemplaza"""
+    global map_index
+    supabase = get_supabase_client()
+    index = GridIndex(settings.MAP_INDEX_CELL_DEGREES)
+
+    ultimo_id = None
+    while True:
+        query = supabase.table("propiedad").select(COLUMNAS_MAPA).eq("estado_propiedad", ESTADO_MAPA)
+        if ultimo_id is not None:
+            query = query.gt("id_propiedad", ultimo_id)
+        filas = (await execute_async(query.order("id_propiedad").limit(PAGINA_CARGA))).data
+
+        for fila in filas:
+            marcador = marcador_desde_fila(fila)
+            if marcador is not None:
+                index.upsert(marcador)
+
+        if len(filas) < PAGINA_CARGA:
+            break
+        ultimo_id = filas[-1]["id_propiedad"]
+
+    map_index = index
+    return index
+
+
+def index_propiedad(fila: dict):
+    """Agrega, mueve o quita del índice una propiedad con su dirección embebida"""
+    if map_index is None:
+        return
+    marcador = marcador_desde_fila(fila)
+    if marcador is None:
+        map_index.remove(fila["id_propiedad"])
+    else:
+        map_index.upsert(marcador)
+
+
+def unindex_propiedad(id_propiedad: str):
+    """Quita una propiedad del índice (eliminada o ya no publicada)"""
+    if map_index is not None:
+        map_index.remove(id_propiedad)
+
+
+async def refresh_map_index(column: str, values: Iterable[str]):
+    """
+    Relee de la base de datos las propiedades con `column` en `values` y
+    las actualiza en el índice (p. ej. tras una carga masiva o al mover una
+    dirección)
+
+    No falla nunca: un error solo se registra y el marcador se corrige en la
+    próxima recarga completa.
+    """
+    if map_index is None:
+        return
+
+    try:
+        for fila in await fetch_in("propiedad", column, values, COLUMNAS_MAPA):
+            index_propiedad(fila)
+    except Exception:
+        logger.exception("No se pudo actualizar el índice del mapa")
+
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(settings.MAP_INDEX_REFRESH_SECONDS)
+        try:
+            await load_map_index()
+        except Exception:
+            logger.exception("Falló la recarga del índice del mapa")
+
+
+async def start_map_index():
+    """Carga el índice y arranca la recarga periódica (si está habilitado)"""
+    global _refresh_task
+    if not settings.MAP_INDEX_ENABLED:
+        return
+
+    try:
+        index = await load_map_index()
+        logger.info("Índice del mapa cargado: %s marcadores", len(index))
+    except Exception:
+        # Sin índice el endpoint del mapa consulta la base de datos
+        logger.exception("No se pudo cargar el índice del mapa")
+    _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop_map_index():
+    """Detiene la recarga periódica"""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+
+
+def get_map_index_stats() -> dict:
+    """Estado del índice para /health/map-index"""
+    if map_index is None:
+        return {"habilitado": settings.MAP_INDEX_ENABLED, "cargado": False}
+    return {"habilitado": settings.MAP_INDEX_ENABLED, "cargado": True, **map_index.stats()}
@@ -0,0 +1,91 @@
+"""
+Escrituras condicionales para los endpoints PUT/DELETE
+
+En lugar de leer la fila para ver si existe y después escribirla, se
+ejecuta directamente el UPDATE/DELETE filtrado por su clave: si no afectó
+ninguna fila, la fila no existe (404).
+
+Las reglas de negocio sobre la propia fila ("un pago confirmado no se
+elimina") van como filtros extra de la misma escritura (`where`). Si con
+ellos no se afecta ninguna fila, solo entonces se consulta si la fila existe
+para responder 400 (`rule_detail`) o 404: una consulta extra únicamente en
+el camino de error.
+"""
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from app.database import get_supabase_client, execute_async
+
+# Recibe el query builder de la escritura y le agrega filtros
+Filtro = Callable[[Any], Any]
+
+
+async def update_or_404(
+    table: str,
+    column: str,
+    value: Any,
+    data: dict,
+    detail: str,
+    where: Optional[Filtro] = None,
+    rule_detail: Optional[str] = None,
+) -> dict:
+    """
+    UPDATE de la fila `table.column == value` en un solo round trip
+    
+    Ejemplo de uso:
+        contrato = await update_or_404(
+            "contratooperacion", "id_contrato_operacion", id_contrato, contrato_data,
+            "Contrato no encontrado",
+            where=lambda q: q.not_.in_("estado_contrato", ["Finalizado", "Cancelado"]),
+            rule_detail="No se pueden editar contratos finalizados o cancelados",
+        )
+    
+    Returns:
+        La fila actualizada
+    
+    Raises:
+        HTTPException 404: La fila no existe
+        HTTPException 400: La fila existe pero no cumple `where`
+    """
+    query = get_supabase_client().table(table).update(data).eq(column, value)
+    return await _write_or_404(query, table, column, value, detail, where, rule_detail)
+
+
+async def delete_or_404(
+    table: str,
+    column: str,
+    value: Any,
+    detail: str,
+    where: Optional[Filtro] = None,
+    rule_detail: Optional[str] = None,
+) -> dict:
+    """
+    DELETE de la fila `table.column == value` en un solo round trip
+    
+    Returns:
+        La fila eliminada (tal como estaba)
+    
+    Raises:
+        HTTPException 404: La fila no existe
+        HTTPException 400: La fila existe pero no cumple `where`
+    """
+    query = get_supabase_client().table(table).delete().eq(column, value)
+    return await _write_or_404(query, table, column, value, detail, where, rule_detail)
+
+
+async def _write_or_404(query, table: str, column: str, value: Any, detail: str, where: Optional[Filtro], rule_detail: Optional[str]) -> dict:
+    if where is not None:
+        query = where(query)
+    
+    result = await execute_async(query)
+    if result.data:
+        return result.data[0]
+    
+    # Ninguna fila afectada: con regla de negocio hay que distinguir el motivo
+    if where is not None:
+        existing = await execute_async(get_supabase_client().table(table).select(column).eq(column, value).limit(1))
+        if existing.data:
+            raise HTTPException(status_code=400, detail=rule_detail)
+    
+    raise HTTPException(status_code=404, detail=detail)
@@ -0,0 +1,81 @@
+"""
+Prueba de carga: throughput de la API según el nivel de concurrencia
+
+Con las consultas a Supabase fuera del event loop, los requests/seg deben
+crecer al subir la concurrencia (hasta el tamaño del pool) en lugar de
+quedarse planos.
+
+Uso:
+    python benchmark_concurrencia.py --usuario broker_admin --password password123
+    python benchmark_concurrencia.py --endpoint /api/propiedades/ --niveles 1 5 10 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def obtener_token(client: httpx.AsyncClient, usuario: str, password: str) -> str:
+    response = await client.post(
+        "/api/usuarios/login",
+        data={"username": usuario, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def medir(client: httpx.AsyncClient, endpoint: str, headers: dict, concurrencia: int, total: int):
+    """Lanza `total` requests manteniendo `concurrencia` en vuelo"""
+    cola = asyncio.Queue()
+    for _ in range(total):
+        cola.put_nowait(None)
+
+    errores = 0
+
+    async def worker():
+        nonlocal errores
+        while not cola.empty():
+            cola.get_nowait()
+            response = await client.get(endpoint, headers=headers)
+            if response.status_code >= 400:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    return total / duracion, duracion, errores
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga por nivel de concurrencia")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/api/clientes/?page=1&page_size=10")
+    parser.add_argument("--usuario", default="broker_admin")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--requests", type=int, default=200, help="Requests por nivel")
+    parser.add_argument("--niveles", type=int, nargs="+", default=[1, 2, 5, 10, 20])
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=max(args.niveles))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        token = await obtener_token(client, args.usuario, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print("=" * 60)
+        print(f"📊 PRUEBA DE CARGA: GET {args.endpoint}")
+        print("=" * 60)
+        print(f"{'Concurrencia':>12} | {'Req/seg':>10} | {'Duración (s)':>12} | {'Errores':>7}")
+
+        base = None
+        for nivel in args.niveles:
+            rps, duracion, errores = await medir(client, args.endpoint, headers, nivel, args.requests)
+            base = base or rps
+            print(f"{nivel:>12} | {rps:>10.1f} | {duracion:>12.2f} | {errores:>7}   (x{rps / base:.1f})")
+
+        print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
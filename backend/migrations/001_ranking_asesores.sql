@@ -0,0 +1,41 @@
+-- ============================================
+-- RANKING DE ASESORES
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por GET /api/desempeno/ranking/asesores
+
+-- Ranking por periodo: filtro + orden resueltos por el índice
+CREATE INDEX IF NOT EXISTS idx_desempeno_periodo_operaciones
+    ON desempenoasesor (periodo_desempeno, operaciones_cerradas_desempeno DESC);
+
+-- Ranking acumulado de todos los periodos (una fila por asesor)
+CREATE OR REPLACE FUNCTION ranking_asesores_total(p_top INTEGER DEFAULT 10)
+RETURNS TABLE (
+    id_usuario_asesor UUID,
+    nombre_usuario VARCHAR,
+    ci_empleado VARCHAR,
+    total_periodos BIGINT,
+    captaciones_desempeno BIGINT,
+    publicaciones_desempeno BIGINT,
+    visitas_agendadas_desempeno BIGINT,
+    operaciones_cerradas_desempeno BIGINT,
+    tiempo_promedio_cierre_dias_desempeno NUMERIC
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        d.id_usuario_asesor,
+        u.nombre_usuario,
+        u.ci_empleado,
+        COUNT(*) AS total_periodos,
+        COALESCE(SUM(d.captaciones_desempeno), 0),
+        COALESCE(SUM(d.publicaciones_desempeno), 0),
+        COALESCE(SUM(d.visitas_agendadas_desempeno), 0),
+        COALESCE(SUM(d.operaciones_cerradas_desempeno), 0),
+        ROUND(AVG(d.tiempo_promedio_cierre_dias_desempeno), 1)
+    FROM desempenoasesor d
+    LEFT JOIN usuario u ON u.id_usuario = d.id_usuario_asesor
+    GROUP BY d.id_usuario_asesor, u.nombre_usuario, u.ci_empleado
+    ORDER BY SUM(d.operaciones_cerradas_desempeno) DESC NULLS LAST
+    LIMIT p_top;
+$$;
@@ -0,0 +1,114 @@
+-- ============================================
+-- RESUMEN DEL DASHBOARD
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por GET /api/dashboard/resumen
+
+-- Rangos de fecha de citas / pagos / contratos resueltos por índice
+CREATE INDEX IF NOT EXISTS idx_citavisita_fecha
+    ON citavisita (fecha_visita_cita);
+
+CREATE INDEX IF NOT EXISTS idx_pago_estado_fecha
+    ON pago (estado_pago, fecha_pago);
+
+CREATE INDEX IF NOT EXISTS idx_contrato_fecha_inicio
+    ON contratooperacion (fecha_inicio_contrato);
+
+-- Contadores, totales y listas cortas del dashboard en un solo JSON
+CREATE OR REPLACE FUNCTION dashboard_resumen(
+    p_hoy DATE DEFAULT CURRENT_DATE,
+    p_limite INTEGER DEFAULT 5
+)
+RETURNS JSON
+LANGUAGE sql STABLE
+AS $$
+    SELECT json_build_object(
+        'propiedades', (
+            SELECT json_build_object(
+                'total', COUNT(*),
+                'disponibles', COUNT(*) FILTER (WHERE estado_propiedad IS DISTINCT FROM 'Cerrada')
+            )
+            FROM propiedad
+        ),
+        'propiedades_por_tipo', (
+            SELECT COALESCE(json_agg(json_build_object('name', tipo, 'value', cantidad) ORDER BY cantidad DESC), '[]')
+            FROM (
+                SELECT COALESCE(tipo_operacion_propiedad, 'Otro') AS tipo, COUNT(*) AS cantidad
+                FROM propiedad
+                GROUP BY 1
+            ) t
+        ),
+        'clientes', (
+            SELECT json_build_object('total', COUNT(*))
+            FROM cliente
+        ),
+        'citas', (
+            SELECT json_build_object(
+                'hoy', COUNT(*) FILTER (WHERE fecha_visita_cita < p_hoy + 1),
+                'semana', COUNT(*)
+            )
+            FROM citavisita
+            WHERE fecha_visita_cita >= p_hoy AND fecha_visita_cita < p_hoy + 8
+        ),
+        'proximas_citas', (
+            SELECT COALESCE(json_agg(c ORDER BY c.fecha_visita_cita), '[]')
+            FROM (
+                SELECT *
+                FROM citavisita
+                WHERE fecha_visita_cita >= now()
+                ORDER BY fecha_visita_cita
+                LIMIT p_limite
+            ) c
+        ),
+        'contratos', (
+            SELECT json_build_object(
+                'total', COUNT(*),
+                'activos', COUNT(*) FILTER (WHERE estado_contrato = 'Activo'),
+                'monto_activos', COALESCE(SUM(precio_cierre_contrato) FILTER (WHERE estado_contrato = 'Activo'), 0)
+            )
+            FROM contratooperacion
+        ),
+        'contratos_por_estado', (
+            SELECT COALESCE(json_agg(json_build_object('name', estado, 'value', cantidad) ORDER BY cantidad DESC), '[]')
+            FROM (
+                SELECT COALESCE(estado_contrato, 'Otro') AS estado, COUNT(*) AS cantidad
+                FROM contratooperacion
+                GROUP BY 1
+            ) t
+        ),
+        'ventas_por_mes', (
+            SELECT json_agg(json_build_object('mes', mes, 'contratos', cantidad, 'monto', monto) ORDER BY mes)
+            FROM (
+                SELECT
+                    m.mes::DATE AS mes,
+                    COUNT(c.id_contrato_operacion) AS cantidad,
+                    COALESCE(SUM(c.precio_cierre_contrato), 0) AS monto
+                FROM generate_series(
+                    date_trunc('month', p_hoy) - INTERVAL '5 months',
+                    date_trunc('month', p_hoy),
+                    INTERVAL '1 month'
+                ) AS m(mes)
+                LEFT JOIN contratooperacion c
+                    ON c.fecha_inicio_contrato >= m.mes
+                    AND c.fecha_inicio_contrato < m.mes + INTERVAL '1 month'
+                GROUP BY m.mes
+            ) t
+        ),
+        'pagos_mes', (
+            SELECT json_build_object('cantidad', COUNT(*), 'monto', COALESCE(SUM(monto_pago), 0))
+            FROM pago
+            WHERE estado_pago = 'Pagado'
+                AND fecha_pago >= date_trunc('month', p_hoy)
+                AND fecha_pago < date_trunc('month', p_hoy) + INTERVAL '1 month'
+        ),
+        'pagos_recientes', (
+            SELECT COALESCE(json_agg(p ORDER BY p.fecha_pago DESC), '[]')
+            FROM (
+                SELECT *
+                FROM pago
+                ORDER BY fecha_pago DESC
+                LIMIT p_limite
+            ) p
+        )
+    );
+$$;
@@ -0,0 +1,46 @@
+-- ============================================
+-- RESÚMENES POR ASESOR / EMPLEADO
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por GET /api/desempeno/asesor/{id}/historico
+--       y GET /api/ganancias/empleado/{id}/resumen
+
+-- Agregados y detalle paginado de un asesor resueltos por índice
+CREATE INDEX IF NOT EXISTS idx_desempeno_asesor_periodo
+    ON desempenoasesor (id_usuario_asesor, periodo_desempeno DESC);
+
+CREATE INDEX IF NOT EXISTS idx_ganancia_empleado_fecha
+    ON gananciaempleado (id_usuario_empleado, fecha_cierre_ganancia DESC);
+
+-- Totales del histórico de desempeño de un asesor
+CREATE OR REPLACE FUNCTION resumen_desempeno_asesor(p_id_usuario UUID)
+RETURNS JSON
+LANGUAGE sql STABLE
+AS $$
+    SELECT json_build_object(
+        'total_periodos', COUNT(*),
+        'captaciones', COALESCE(SUM(captaciones_desempeno), 0),
+        'publicaciones', COALESCE(SUM(publicaciones_desempeno), 0),
+        'visitas', COALESCE(SUM(visitas_agendadas_desempeno), 0),
+        'operaciones_cerradas', COALESCE(SUM(operaciones_cerradas_desempeno), 0)
+    )
+    FROM desempenoasesor
+    WHERE id_usuario_asesor = p_id_usuario;
+$$;
+
+-- Totales de ganancias de un empleado (pagado / pendiente / por tipo de operación)
+CREATE OR REPLACE FUNCTION resumen_ganancias_empleado(p_id_usuario UUID)
+RETURNS JSON
+LANGUAGE sql STABLE
+AS $$
+    SELECT json_build_object(
+        'total_registros', COUNT(*),
+        'total_ganancias', COALESCE(SUM(dinero_ganado_ganancia), 0),
+        'total_pagado', COALESCE(SUM(dinero_ganado_ganancia) FILTER (WHERE esta_concretado_ganancia), 0),
+        'captacion', COALESCE(SUM(dinero_ganado_ganancia) FILTER (WHERE tipo_operacion_ganancia = 'Captación'), 0),
+        'colocacion', COALESCE(SUM(dinero_ganado_ganancia) FILTER (WHERE tipo_operacion_ganancia = 'Colocación'), 0),
+        'ambas', COALESCE(SUM(dinero_ganado_ganancia) FILTER (WHERE tipo_operacion_ganancia = 'Ambas'), 0)
+    )
+    FROM gananciaempleado
+    WHERE id_usuario_empleado = p_id_usuario;
+$$;
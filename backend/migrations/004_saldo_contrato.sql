@@ -0,0 +1,109 @@
+-- ============================================
+-- SALDO PAGADO POR CONTRATO
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por POST/PUT/DELETE /api/pagos y GET /api/contratos/{id}/resumen
+--
+-- Cada contrato guarda la suma y cantidad de sus pagos. Un trigger sobre
+-- `pago` las mantiene y, en la misma sentencia, rechaza el pago que haría
+-- superar el precio de cierre: el UPDATE del contrato toma su lock de fila,
+-- así dos pagos concurrentes del mismo contrato se validan uno después del
+-- otro y nunca exceden el precio.
+--
+-- Errores (mapeados a HTTP por el backend):
+--   PA404: el contrato no existe
+--   PA400: el contrato no está activo / el pago excede el precio
+
+ALTER TABLE contratooperacion
+    ADD COLUMN IF NOT EXISTS total_pagado_contrato NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS numero_pagos_contrato INTEGER NOT NULL DEFAULT 0;
+
+-- Saldo inicial a partir de los pagos existentes
+UPDATE contratooperacion c
+SET total_pagado_contrato = p.total,
+    numero_pagos_contrato = p.cantidad
+FROM (
+    SELECT id_contrato_operacion, SUM(monto_pago) AS total, COUNT(*) AS cantidad
+    FROM pago
+    GROUP BY id_contrato_operacion
+) p
+WHERE p.id_contrato_operacion = c.id_contrato_operacion;
+
+-- Suma un pago al saldo del contrato validando el precio de cierre
+CREATE OR REPLACE FUNCTION sumar_pago_contrato(
+    p_id_contrato UUID,
+    p_monto NUMERIC,
+    p_exigir_activo BOOLEAN
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_estado VARCHAR;
+BEGIN
+    UPDATE contratooperacion
+    SET total_pagado_contrato = total_pagado_contrato + p_monto,
+        numero_pagos_contrato = numero_pagos_contrato + 1
+    WHERE id_contrato_operacion = p_id_contrato
+        AND (NOT p_exigir_activo OR estado_contrato = 'Activo')
+        AND total_pagado_contrato + p_monto <= precio_cierre_contrato;
+
+    IF FOUND THEN
+        RETURN;
+    END IF;
+
+    SELECT estado_contrato INTO v_estado
+    FROM contratooperacion
+    WHERE id_contrato_operacion = p_id_contrato;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'El contrato especificado no existe' USING ERRCODE = 'PA404';
+    ELSIF p_exigir_activo AND v_estado IS DISTINCT FROM 'Activo' THEN
+        RAISE EXCEPTION 'Solo se pueden registrar pagos en contratos activos' USING ERRCODE = 'PA400';
+    ELSE
+        RAISE EXCEPTION 'El monto total de pagos excedería el precio del contrato' USING ERRCODE = 'PA400';
+    END IF;
+END;
+$$;
+
+-- Resta un pago del saldo del contrato (sin validación)
+CREATE OR REPLACE FUNCTION restar_pago_contrato(p_id_contrato UUID, p_monto NUMERIC)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE contratooperacion
+    SET total_pagado_contrato = total_pagado_contrato - p_monto,
+        numero_pagos_contrato = numero_pagos_contrato - 1
+    WHERE id_contrato_operacion = p_id_contrato;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_pago_saldo_contrato()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM sumar_pago_contrato(NEW.id_contrato_operacion, NEW.monto_pago, TRUE);
+        RETURN NEW;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        PERFORM restar_pago_contrato(OLD.id_contrato_operacion, OLD.monto_pago);
+        RETURN OLD;
+    END IF;
+
+    -- UPDATE: solo si cambia el monto o el contrato (se resta primero, así
+    -- el límite se valida con el monto nuevo)
+    IF NEW.monto_pago IS DISTINCT FROM OLD.monto_pago
+        OR NEW.id_contrato_operacion IS DISTINCT FROM OLD.id_contrato_operacion THEN
+        PERFORM restar_pago_contrato(OLD.id_contrato_operacion, OLD.monto_pago);
+        PERFORM sumar_pago_contrato(NEW.id_contrato_operacion, NEW.monto_pago, FALSE);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS pago_saldo_contrato ON pago;
+CREATE TRIGGER pago_saldo_contrato
+    AFTER INSERT OR UPDATE OR DELETE ON pago
+    FOR EACH ROW EXECUTE FUNCTION trg_pago_saldo_contrato();
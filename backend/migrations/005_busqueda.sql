@@ -0,0 +1,117 @@
+-- ============================================
+-- BÚSQUEDA (TRIGRAMAS + FULL-TEXT)
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por GET /api/search y por el filtro `search` de GET /api/clientes/
+--
+-- Los índices GIN con gin_trgm_ops resuelven `ILIKE '%texto%'` y la
+-- similitud por palabra (`<%`) sin recorrer la tabla completa. La
+-- descripción de la propiedad se busca con un índice full-text en español.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Clientes: nombre completo y CI (también usados por listar_clientes)
+CREATE INDEX IF NOT EXISTS idx_cliente_nombres_trgm
+    ON cliente USING GIN (nombres_completo_cliente gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_cliente_nombre_completo_trgm
+    ON cliente USING GIN ((nombres_completo_cliente || ' ' || apellidos_completo_cliente) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_cliente_ci_trgm
+    ON cliente USING GIN (ci_cliente gin_trgm_ops);
+
+-- Propietarios
+CREATE INDEX IF NOT EXISTS idx_propietario_nombre_completo_trgm
+    ON propietario USING GIN ((nombres_completo_propietario || ' ' || apellidos_completo_propietario) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_propietario_ci_trgm
+    ON propietario USING GIN (ci_propietario gin_trgm_ops);
+
+-- Propiedades: título / código por trigramas, título + descripción por full-text
+CREATE INDEX IF NOT EXISTS idx_propiedad_titulo_trgm
+    ON propiedad USING GIN (titulo_propiedad gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_propiedad_codigo_trgm
+    ON propiedad USING GIN (codigo_publico_propiedad gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_propiedad_fts
+    ON propiedad USING GIN (
+        to_tsvector('spanish', COALESCE(titulo_propiedad, '') || ' ' || COALESCE(descripcion_propiedad, ''))
+    );
+
+-- Top-N de clientes, propiedades y propietarios ordenados por relevancia
+CREATE OR REPLACE FUNCTION buscar_global(
+    p_q TEXT,
+    p_limite INTEGER DEFAULT 10,
+    p_tipos TEXT[] DEFAULT ARRAY['cliente', 'propiedad', 'propietario']
+)
+RETURNS TABLE (
+    tipo TEXT,
+    id TEXT,
+    titulo TEXT,
+    subtitulo TEXT,
+    relevancia REAL
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH termino AS (
+        SELECT
+            p_q AS q,
+            '%' || replace(replace(replace(p_q, '\', '\\'), '%', '\%'), '_', '\_') || '%' AS patron,
+            websearch_to_tsquery('spanish', p_q) AS tsq
+    )
+    (
+        SELECT 'cliente', c.ci_cliente, c.nombres_completo_cliente || ' ' || c.apellidos_completo_cliente, c.telefono_cliente,
+            GREATEST(
+                word_similarity(t.q, c.nombres_completo_cliente || ' ' || c.apellidos_completo_cliente),
+                CASE WHEN c.ci_cliente ILIKE t.patron THEN 1 ELSE 0 END
+            )::REAL AS relevancia
+        FROM cliente c, termino t
+        WHERE 'cliente' = ANY (p_tipos)
+            AND (
+                (c.nombres_completo_cliente || ' ' || c.apellidos_completo_cliente) ILIKE t.patron
+                OR t.q <% (c.nombres_completo_cliente || ' ' || c.apellidos_completo_cliente)
+                OR c.ci_cliente ILIKE t.patron
+            )
+        ORDER BY relevancia DESC
+        LIMIT p_limite
+    )
+    UNION ALL
+    (
+        SELECT 'propiedad', p.id_propiedad::TEXT, p.titulo_propiedad, p.codigo_publico_propiedad,
+            GREATEST(
+                ts_rank(to_tsvector('spanish', COALESCE(p.titulo_propiedad, '') || ' ' || COALESCE(p.descripcion_propiedad, '')), t.tsq),
+                word_similarity(t.q, p.titulo_propiedad),
+                CASE WHEN p.codigo_publico_propiedad ILIKE t.patron THEN 1 ELSE 0 END
+            )::REAL AS relevancia
+        FROM propiedad p, termino t
+        WHERE 'propiedad' = ANY (p_tipos)
+            AND (
+                to_tsvector('spanish', COALESCE(p.titulo_propiedad, '') || ' ' || COALESCE(p.descripcion_propiedad, '')) @@ t.tsq
+                OR p.titulo_propiedad ILIKE t.patron
+                OR t.q <% p.titulo_propiedad
+                OR p.codigo_publico_propiedad ILIKE t.patron
+            )
+        ORDER BY relevancia DESC
+        LIMIT p_limite
+    )
+    UNION ALL
+    (
+        SELECT 'propietario', o.ci_propietario, o.nombres_completo_propietario || ' ' || o.apellidos_completo_propietario, o.telefono_propietario,
+            GREATEST(
+                word_similarity(t.q, o.nombres_completo_propietario || ' ' || o.apellidos_completo_propietario),
+                CASE WHEN o.ci_propietario ILIKE t.patron THEN 1 ELSE 0 END
+            )::REAL AS relevancia
+        FROM propietario o, termino t
+        WHERE 'propietario' = ANY (p_tipos)
+            AND (
+                (o.nombres_completo_propietario || ' ' || o.apellidos_completo_propietario) ILIKE t.patron
+                OR t.q <% (o.nombres_completo_propietario || ' ' || o.apellidos_completo_propietario)
+                OR o.ci_propietario ILIKE t.patron
+            )
+        ORDER BY relevancia DESC
+        LIMIT p_limite
+    )
+    ORDER BY relevancia DESC
+    LIMIT p_limite;
+$$;
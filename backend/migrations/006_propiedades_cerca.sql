@@ -0,0 +1,79 @@
+-- ============================================
+-- BÚSQUEDA GEOGRÁFICA DE PROPIEDADES
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase (requiere la extensión PostGIS,
+-- disponible en Database > Extensions).
+-- Usado por GET /api/propiedades/cerca
+--
+-- El punto de cada dirección se indexa con GiST sobre una expresión, sin
+-- columna nueva: no hay nada que mantener en las escrituras.
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+-- Punto geográfico (WGS 84) de una dirección
+CREATE OR REPLACE FUNCTION direccion_geog(p_latitud NUMERIC, p_longitud NUMERIC)
+RETURNS geography
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT ST_SetSRID(ST_MakePoint(p_longitud::DOUBLE PRECISION, p_latitud::DOUBLE PRECISION), 4326)::geography;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_direccion_geog
+    ON direccion USING GIST (direccion_geog(latitud_direccion, longitud_direccion))
+    WHERE latitud_direccion IS NOT NULL AND longitud_direccion IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_propiedad_direccion
+    ON propiedad (id_direccion);
+
+-- Propiedades dentro de un radio, de la más cercana a la más lejana
+CREATE OR REPLACE FUNCTION propiedades_cerca(
+    p_lat DOUBLE PRECISION,
+    p_lng DOUBLE PRECISION,
+    p_radio_km DOUBLE PRECISION,
+    p_limite INTEGER DEFAULT 50,
+    p_estado TEXT DEFAULT NULL
+)
+RETURNS SETOF JSONB
+LANGUAGE sql STABLE
+AS $$
+    WITH centro AS (
+        SELECT ST_SetSRID(ST_MakePoint(p_lng, p_lat), 4326)::geography AS punto
+    )
+    SELECT to_jsonb(p)
+        || jsonb_build_object(
+            'direccion', to_jsonb(d),
+            'distancia_km', ROUND((ST_Distance(direccion_geog(d.latitud_direccion, d.longitud_direccion), c.punto) / 1000)::NUMERIC, 3)
+        )
+    FROM direccion d
+    CROSS JOIN centro c
+    JOIN propiedad p ON p.id_direccion = d.id_direccion
+    WHERE d.latitud_direccion IS NOT NULL
+        AND d.longitud_direccion IS NOT NULL
+        AND ST_DWithin(direccion_geog(d.latitud_direccion, d.longitud_direccion), c.punto, p_radio_km * 1000)
+        AND (p_estado IS NULL OR p.estado_propiedad = p_estado)
+    ORDER BY direccion_geog(d.latitud_direccion, d.longitud_direccion) <-> c.punto
+    LIMIT p_limite;
+$$;
+
+-- Propiedades dentro de un rectángulo (viewport de un mapa)
+CREATE OR REPLACE FUNCTION propiedades_en_bbox(
+    p_min_lng DOUBLE PRECISION,
+    p_min_lat DOUBLE PRECISION,
+    p_max_lng DOUBLE PRECISION,
+    p_max_lat DOUBLE PRECISION,
+    p_limite INTEGER DEFAULT 500,
+    p_estado TEXT DEFAULT NULL
+)
+RETURNS SETOF JSONB
+LANGUAGE sql STABLE
+AS $$
+    SELECT to_jsonb(p) || jsonb_build_object('direccion', to_jsonb(d))
+    FROM direccion d
+    JOIN propiedad p ON p.id_direccion = d.id_direccion
+    WHERE d.latitud_direccion IS NOT NULL
+        AND d.longitud_direccion IS NOT NULL
+        AND direccion_geog(d.latitud_direccion, d.longitud_direccion)
+            && ST_MakeEnvelope(p_min_lng, p_min_lat, p_max_lng, p_max_lat, 4326)::geography
+        AND (p_estado IS NULL OR p.estado_propiedad = p_estado)
+    LIMIT p_limite;
+$$;
@@ -0,0 +1,78 @@
+-- ============================================
+-- CREACIÓN DE CONTRATO + CIERRE DE PROPIEDAD
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por POST /api/contratos/
+--
+-- Valida las referencias, inserta el contrato y (si está Activo) cierra la
+-- propiedad en una sola transacción. La fila de la propiedad se bloquea
+-- con FOR UPDATE al inicio: dos contratos concurrentes sobre la misma
+-- propiedad se validan uno después del otro y solo el primero la cierra.
+--
+-- Errores (mapeados a HTTP por el backend):
+--   CO404: la propiedad, el cliente o el usuario colocador no existe
+--   CO400: la propiedad ya está cerrada / el tipo de operación no coincide
+
+CREATE OR REPLACE FUNCTION crear_contrato_operacion(p_contrato JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_contrato contratooperacion;
+    v_estado VARCHAR;
+    v_tipo VARCHAR;
+BEGIN
+    v_contrato := jsonb_populate_record(NULL::contratooperacion, p_contrato);
+
+    SELECT estado_propiedad, tipo_operacion_propiedad INTO v_estado, v_tipo
+    FROM propiedad
+    WHERE id_propiedad = v_contrato.id_propiedad
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'La propiedad especificada no existe' USING ERRCODE = 'CO404';
+    END IF;
+
+    IF v_estado = 'Cerrada' THEN
+        RAISE EXCEPTION 'La propiedad ya está cerrada' USING ERRCODE = 'CO400';
+    END IF;
+
+    PERFORM 1 FROM cliente WHERE ci_cliente = v_contrato.ci_cliente;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'El cliente especificado no existe' USING ERRCODE = 'CO404';
+    END IF;
+
+    PERFORM 1 FROM usuario WHERE id_usuario = v_contrato.id_usuario_colocador;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'El usuario colocador especificado no existe' USING ERRCODE = 'CO404';
+    END IF;
+
+    IF v_tipo IS DISTINCT FROM v_contrato.tipo_operacion_contrato THEN
+        RAISE EXCEPTION 'El tipo de operación del contrato debe coincidir con el de la propiedad (%)', v_tipo
+            USING ERRCODE = 'CO400';
+    END IF;
+
+    -- Columnas explícitas: el ID y el saldo pagado toman sus valores por defecto
+    INSERT INTO contratooperacion (
+        id_propiedad, ci_cliente, id_usuario_colocador, tipo_operacion_contrato,
+        fecha_inicio_contrato, fecha_fin_contrato, estado_contrato, modalidad_pago_contrato,
+        precio_cierre_contrato, fecha_cierre_contrato, observaciones_contrato
+    )
+    VALUES (
+        v_contrato.id_propiedad, v_contrato.ci_cliente, v_contrato.id_usuario_colocador, v_contrato.tipo_operacion_contrato,
+        v_contrato.fecha_inicio_contrato, v_contrato.fecha_fin_contrato, v_contrato.estado_contrato, v_contrato.modalidad_pago_contrato,
+        v_contrato.precio_cierre_contrato, v_contrato.fecha_cierre_contrato, v_contrato.observaciones_contrato
+    )
+    RETURNING * INTO v_contrato;
+
+    IF v_contrato.estado_contrato = 'Activo' THEN
+        UPDATE propiedad
+        SET estado_propiedad = 'Cerrada',
+            fecha_cierre_propiedad = CURRENT_DATE,
+            id_usuario_colocador = v_contrato.id_usuario_colocador
+        WHERE id_propiedad = v_contrato.id_propiedad;
+    END IF;
+
+    RETURN to_jsonb(v_contrato);
+END;
+$$;
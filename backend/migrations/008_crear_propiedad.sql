@@ -0,0 +1,76 @@
+-- ============================================
+-- CREACIÓN DE PROPIEDAD CON DIRECCIÓN ANIDADA
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por POST /api/propiedades/
+--
+-- Crea la dirección (si viene anidada) y la propiedad en una sola
+-- transacción y devuelve la propiedad con su dirección embebida. Si algo
+-- falla no queda ninguna dirección huérfana.
+--
+-- El código público se protege con un índice único: un duplicado falla el
+-- INSERT con 23505, sin consulta previa. Antes de crear el índice hay que
+-- resolver los códigos repetidos que ya existan:
+--   SELECT codigo_publico_propiedad, COUNT(*) FROM propiedad
+--   WHERE codigo_publico_propiedad IS NOT NULL
+--   GROUP BY 1 HAVING COUNT(*) > 1;
+--
+-- Errores (mapeados a HTTP por el backend):
+--   PR404: el propietario o la dirección indicada no existe
+--   23505: código público repetido
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_propiedad_codigo_publico
+    ON propiedad (codigo_publico_propiedad)
+    WHERE codigo_publico_propiedad IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION crear_propiedad(p_propiedad JSONB, p_direccion JSONB DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_propiedad propiedad;
+    v_direccion direccion;
+BEGIN
+    v_propiedad := jsonb_populate_record(NULL::propiedad, p_propiedad);
+
+    PERFORM 1 FROM propietario WHERE ci_propietario = v_propiedad.ci_propietario;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'El propietario especificado no existe' USING ERRCODE = 'PR404';
+    END IF;
+
+    IF p_direccion IS NOT NULL THEN
+        v_direccion := jsonb_populate_record(NULL::direccion, p_direccion);
+
+        INSERT INTO direccion (calle_direccion, ciudad_direccion, zona_direccion, latitud_direccion, longitud_direccion)
+        VALUES (v_direccion.calle_direccion, v_direccion.ciudad_direccion, v_direccion.zona_direccion,
+            v_direccion.latitud_direccion, v_direccion.longitud_direccion)
+        RETURNING * INTO v_direccion;
+
+        v_propiedad.id_direccion := v_direccion.id_direccion;
+    ELSIF v_propiedad.id_direccion IS NOT NULL THEN
+        SELECT * INTO v_direccion FROM direccion WHERE id_direccion = v_propiedad.id_direccion;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'La dirección especificada no existe' USING ERRCODE = 'PR404';
+        END IF;
+    END IF;
+
+    -- Columnas explícitas: el ID toma su valor por defecto
+    INSERT INTO propiedad (
+        codigo_publico_propiedad, titulo_propiedad, descripcion_propiedad, precio_publicado_propiedad,
+        superficie_propiedad, tipo_operacion_propiedad, estado_propiedad, fecha_captacion_propiedad,
+        fecha_publicacion_propiedad, fecha_cierre_propiedad, porcentaje_captacion_propiedad,
+        porcentaje_colocacion_propiedad, ci_propietario, id_direccion, id_usuario_captador, id_usuario_colocador
+    )
+    VALUES (
+        v_propiedad.codigo_publico_propiedad, v_propiedad.titulo_propiedad, v_propiedad.descripcion_propiedad, v_propiedad.precio_publicado_propiedad,
+        v_propiedad.superficie_propiedad, v_propiedad.tipo_operacion_propiedad, v_propiedad.estado_propiedad, v_propiedad.fecha_captacion_propiedad,
+        v_propiedad.fecha_publicacion_propiedad, v_propiedad.fecha_cierre_propiedad, v_propiedad.porcentaje_captacion_propiedad,
+        v_propiedad.porcentaje_colocacion_propiedad, v_propiedad.ci_propietario, v_propiedad.id_direccion, v_propiedad.id_usuario_captador, v_propiedad.id_usuario_colocador
+    )
+    RETURNING * INTO v_propiedad;
+
+    RETURN to_jsonb(v_propiedad) || jsonb_build_object(
+        'direccion', CASE WHEN v_direccion.id_direccion IS NULL THEN NULL ELSE to_jsonb(v_direccion) END
+    );
+END;
+$$;
@@ -0,0 +1,54 @@
+-- ============================================
+-- VERSIÓN POR TABLA (ETag DE LOS LOOKUPS)
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por GET /api/lookup/{entidad}
+--
+-- Cada tabla con lookup tiene su versión repartida en 16 contadores
+-- (`version_tabla`, una fila por tabla y slot). Un trigger por sentencia
+-- incrementa en cada INSERT/UPDATE/DELETE/TRUNCATE el slot de la conexión
+-- (pg_backend_pid() % 16): escrituras concurrentes desde conexiones
+-- distintas actualizan filas distintas y no se serializan en una sola fila
+-- caliente. La versión de la tabla es la suma de sus slots.
+--
+-- A diferencia de MAX(fecha) + COUNT(*), la suma cambia con toda escritura
+-- confirmada, incluidas las eliminaciones y las transacciones que confirman
+-- después de otra más nueva. El backend arma el ETag con ese número: si no
+-- cambió, responde 304 sin leer la tabla.
+
+CREATE TABLE IF NOT EXISTS version_tabla (
+    tabla TEXT NOT NULL,
+    slot SMALLINT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (tabla, slot)
+);
+
+CREATE OR REPLACE FUNCTION trg_version_tabla()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE version_tabla
+    SET version = version + 1
+    WHERE tabla = TG_TABLE_NAME AND slot = pg_backend_pid() % 16;
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['cliente', 'empleado', 'propiedad', 'propietario', 'rol', 'usuario'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS version_%1$s ON %1$I', t);
+        EXECUTE format(
+            'CREATE TRIGGER version_%1$s AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %1$I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION trg_version_tabla()',
+            t
+        );
+        INSERT INTO version_tabla (tabla, slot)
+        SELECT t, s FROM generate_series(0, 15) AS s
+        ON CONFLICT (tabla, slot) DO NOTHING;
+    END LOOP;
+END;
+$$;
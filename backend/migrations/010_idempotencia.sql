@@ -0,0 +1,65 @@
+-- ============================================
+-- CLAVES DE IDEMPOTENCIA
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por POST /api/ganancias/marcar-pagadas (header Idempotency-Key)
+--
+-- Cada clave es una fila con clave primaria (ambito, clave): la reserva es
+-- un INSERT ... ON CONFLICT, atómico aunque lleguen dos requests a la vez a
+-- workers distintos. Las claves viven en su propia tabla, fuera del caché
+-- de consultas: ningún desalojo ni invalidación las borra antes de vencer.
+--
+-- Las filas vencidas se reutilizan al volver a usar la misma clave. Para
+-- purgar las que no se reutilizan:
+--   DELETE FROM idempotencia WHERE expira_en < now();
+
+CREATE TABLE IF NOT EXISTS idempotencia (
+    ambito TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'en_proceso',
+    respuesta JSONB,
+    expira_en TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (ambito, clave)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotencia_expira_en
+    ON idempotencia (expira_en);
+
+-- Reserva la clave. Retorna {"reservada": true} si el llamador debe
+-- procesar la operación; si no, la fila existente (en proceso o completada)
+CREATE OR REPLACE FUNCTION reservar_idempotencia(
+    p_ambito TEXT,
+    p_clave TEXT,
+    p_huella TEXT,
+    p_ttl_segundos INTEGER
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_fila idempotencia;
+BEGIN
+    -- Una reserva vencida se pisa como si no existiera
+    INSERT INTO idempotencia (ambito, clave, huella, estado, respuesta, expira_en)
+    VALUES (p_ambito, p_clave, p_huella, 'en_proceso', NULL, now() + make_interval(secs => p_ttl_segundos))
+    ON CONFLICT (ambito, clave) DO UPDATE
+    SET huella = EXCLUDED.huella,
+        estado = EXCLUDED.estado,
+        respuesta = NULL,
+        expira_en = EXCLUDED.expira_en
+    WHERE idempotencia.expira_en <= now();
+
+    IF FOUND THEN
+        RETURN jsonb_build_object('reservada', true);
+    END IF;
+
+    SELECT * INTO v_fila FROM idempotencia WHERE ambito = p_ambito AND clave = p_clave;
+    IF NOT FOUND THEN
+        -- La otra ejecución falló y liberó la clave justo ahora: que el cliente reintente
+        RETURN jsonb_build_object('reservada', false, 'estado', 'en_proceso', 'huella', p_huella);
+    END IF;
+
+    RETURN jsonb_build_object('reservada', false) || to_jsonb(v_fila);
+END;
+$$;
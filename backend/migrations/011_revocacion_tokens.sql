@@ -0,0 +1,14 @@
+-- ============================================
+-- REVOCACIÓN DE TOKENS POR USUARIO
+-- ============================================
+-- Ejecutar en el SQL Editor de Supabase.
+-- Usado por get_current_user / revoke_user_tokens (app/utils/dependencies.py)
+--
+-- Al desactivar un usuario o cambiarle el rol se guarda el momento de la
+-- revocación (truncado al segundo); los tokens con `iat` anterior dejan de
+-- valer. Con CACHE_BACKEND=redis el valor se replica en la clave
+-- `revocacion:<id_usuario>` (sin TTL, configurar maxmemory-policy
+-- volatile-lru para que Redis no la desaloje).
+
+ALTER TABLE usuario
+    ADD COLUMN IF NOT EXISTS tokens_revocados_desde TIMESTAMPTZ;
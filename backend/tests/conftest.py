@@ -0,0 +1,16 @@
+"""
+Configuración común de los tests
+
+Los tests no hablan con Supabase: las consultas se interceptan reemplazando
+`execute_async` en el módulo de cada router. Las variables de entorno
+obligatorias se completan con valores de prueba antes de importar la app.
+"""
+import os
+import sys
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
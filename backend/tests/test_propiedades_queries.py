@@ -0,0 +1,78 @@
+"""
+Round trips a la BD de los GET de propiedades
+
+La dirección viene embebida (`*, direccion(*)`), así que listar u obtener
+propiedades debe costar una sola consulta, y ninguna si la respuesta ya
+está en el caché.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import propiedades
+from app.utils.cache import query_cache
+from app.utils.dependencies import get_current_active_user
+
+PROPIEDAD = {
+    "id_propiedad": "p1",
+    "id_direccion": "d1",
+    "ci_propietario": "123",
+    "titulo_propiedad": "Casa de prueba",
+    "direccion": {
+        "id_direccion": "d1",
+        "calle_direccion": "Calle 1",
+        "ciudad_direccion": "La Paz",
+    },
+}
+
+
+class _Resultado:
+    def __init__(self, data):
+        self.data = data
+
+
+@pytest.fixture
+def consultas(monkeypatch):
+    """Reemplaza execute_async del router y registra cada consulta ejecutada"""
+    ejecutadas = []
+
+    async def execute_async(query):
+        ejecutadas.append(query)
+        return _Resultado([PROPIEDAD])
+
+    monkeypatch.setattr(propiedades, "execute_async", execute_async)
+    app.dependency_overrides[get_current_active_user] = lambda: {"id_usuario": "u1", "id_rol": 1, "es_activo_usuario": True}
+    asyncio.run(query_cache.invalidate())
+    yield ejecutadas
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client():
+    # Sin `with`: no corren los eventos startup/shutdown (pool e índice del mapa)
+    return TestClient(app)
+
+
+def test_listar_propiedades_una_consulta(consultas, client):
+    response = client.get("/api/propiedades/")
+
+    assert response.status_code == 200
+    assert response.json()[0]["direccion"]["id_direccion"] == "d1"
+    assert len(consultas) == 1
+
+    # Repetido: sale del caché sin consultar
+    assert client.get("/api/propiedades/").status_code == 200
+    assert len(consultas) == 1
+
+
+def test_obtener_propiedad_una_consulta(consultas, client):
+    response = client.get("/api/propiedades/p1")
+
+    assert response.status_code == 200
+    assert response.json()["direccion"]["id_direccion"] == "d1"
+    assert len(consultas) == 1
+
+    assert client.get("/api/propiedades/p1").status_code == 200
+    assert len(consultas) == 1
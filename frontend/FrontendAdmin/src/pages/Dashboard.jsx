@@ -17,11 +17,7 @@ import {
   ClockIcon,
   CheckCircleIcon
 } from '@heroicons/react/24/outline';
-import propiedadService from '../services/propiedadService';
-import clienteService from '../services/clienteService';
-import citaService from '../services/citaService';
-import contratoService from '../services/contratoService';
-import pagoService from '../services/pagoService';
+import dashboardService from '../services/dashboardService';
 
 const Dashboard = () => {
   const { user } = useAuth();
@@ -70,117 +66,41 @@ const Dashboard = () => {
     try {
       setLoading(true);
 
-      // ✅ OPTIMIZADO: Usar endpoints específicos del dashboard
-      const [propiedadesData, clientesData, citasData, contratosData, pagosData] = await Promise.all([
-        propiedadService.getAll(controller.signal, { page: 1, pageSize: 100 }),
-        clienteService.getAll(controller.signal, { page: 1, pageSize: 50 }),
-        citaService.getProximas(5, controller.signal), // ✅ OPTIMIZADO
-        contratoService.getAll({}, controller.signal),
-        pagoService.getDashboard(30, controller.signal) // ✅ OPTIMIZADO
-      ]);
+      // ✅ OPTIMIZADO: Un solo request, contadores y listas calculados en la BD
+      const resumen = await dashboardService.getResumen(controller.signal, 5);
 
       if (!isMounted.current) return;
 
-      // ✅ Extraer items si viene paginado
-      const propiedades = propiedadesData.items || propiedadesData;
-      const clientes = clientesData.items || clientesData;
-      const citas = citasData; // Ya es array directo
-      const contratos = contratosData;
-      const pagos = pagosData; // Ya es array directo
-
-      const hoy = new Date();
-      hoy.setHours(0, 0, 0, 0);
-      
-      const finSemana = new Date(hoy);
-      finSemana.setDate(hoy.getDate() + 7);
-
-      const inicioMes = new Date(hoy.getFullYear(), hoy.getMonth(), 1);
-      const finMes = new Date(hoy.getFullYear(), hoy.getMonth() + 1, 0);
-
-      // Propiedades disponibles
-      const propDisponibles = propiedades.filter(p => p.estado_propiedad !== 'Cerrada').length;
-
-      // Citas hoy (usando todas las citas para stats precisos)
-      const citasHoyCount = citas.filter(c => {
-        const fechaCita = new Date(c.fecha_visita_cita);
-        fechaCita.setHours(0, 0, 0, 0);
-        return fechaCita.getTime() === hoy.getTime();
-      }).length;
-
-      // Citas esta semana
-      const citasSemanaCount = citas.filter(c => {
-        const fechaCita = new Date(c.fecha_visita_cita);
-        return fechaCita >= hoy && fechaCita <= finSemana;
-      }).length;
-
-      // Contratos activos
-      const contratosActivos = contratos.filter(c => c.estado_contrato === 'Activo');
-      const montoContratos = contratosActivos.reduce((sum, c) => sum + parseFloat(c.precio_cierre_contrato || 0), 0);
-
-      // Pagos del mes
-      const pagosMes = pagos.filter(p => {
-        const fechaPago = new Date(p.fecha_pago);
-        return fechaPago >= inicioMes && fechaPago <= finMes && p.estado_pago === 'Pagado';
-      });
-      const montoPagosMes = pagosMes.reduce((sum, p) => sum + parseFloat(p.monto_pago || 0), 0);
-
       setStats({
-        totalPropiedades: propiedadesData.total || propiedades.length,
-        propiedadesDisponibles: propDisponibles,
-        totalClientes: clientesData.total || clientes.length,
-        citasHoy: citasHoyCount,
-        citasEstaSemana: citasSemanaCount,
-        contratosActivos: contratosActivos.length,
-        montoContratosActivos: montoContratos,
-        pagosMes: pagosMes.length,
-        montoPagosMes: montoPagosMes
+        totalPropiedades: resumen.propiedades.total,
+        propiedadesDisponibles: resumen.propiedades.disponibles,
+        totalClientes: resumen.clientes.total,
+        citasHoy: resumen.citas.hoy,
+        citasEstaSemana: resumen.citas.semana,
+        contratosActivos: resumen.contratos.activos,
+        montoContratosActivos: parseFloat(resumen.contratos.monto_activos || 0),
+        pagosMes: resumen.pagos_mes.cantidad,
+        montoPagosMes: parseFloat(resumen.pagos_mes.monto || 0)
       });
 
-      // Propiedades por tipo
-      const tiposCount = {};
-      propiedades.forEach(p => {
-        const tipo = p.tipo_propiedad || 'Otro';
-        tiposCount[tipo] = (tiposCount[tipo] || 0) + 1;
-      });
-      setPropiedadesPorTipo(
-        Object.entries(tiposCount).map(([name, value]) => ({ name, value }))
-      );
-
-      // Contratos por estado
-      const estadosCount = {};
-      contratos.forEach(c => {
-        const estado = c.estado_contrato || 'Otro';
-        estadosCount[estado] = (estadosCount[estado] || 0) + 1;
-      });
-      setContratosPorEstado(
-        Object.entries(estadosCount).map(([name, value]) => ({ name, value }))
-      );
+      setPropiedadesPorTipo(resumen.propiedades_por_tipo);
+      setContratosPorEstado(resumen.contratos_por_estado);
 
       // Próximas citas (ya vienen ordenadas del backend)
-      setProximasCitas(citas);
-
-      // Ventas por mes (últimos 6 meses)
-      const meses = [];
-      for (let i = 5; i >= 0; i--) {
-        const fecha = new Date(hoy.getFullYear(), hoy.getMonth() - i, 1);
-        const mesNombre = fecha.toLocaleDateString('es-BO', { month: 'short' });
-        const inicioMesActual = new Date(fecha.getFullYear(), fecha.getMonth(), 1);
-        const finMesActual = new Date(fecha.getFullYear(), fecha.getMonth() + 1, 0);
-
-        const contratosDelMes = contratos.filter(c => {
-          const fechaContrato = new Date(c.fecha_inicio_contrato);
-          return fechaContrato >= inicioMesActual && fechaContrato <= finMesActual;
-        });
-
-        const montoMes = contratosDelMes.reduce((sum, c) => sum + parseFloat(c.precio_cierre_contrato || 0), 0);
-
-        meses.push({
-          mes: mesNombre.charAt(0).toUpperCase() + mesNombre.slice(1),
-          contratos: contratosDelMes.length,
-          monto: montoMes
-        });
-      }
-      setVentasPorMes(meses);
+      setProximasCitas(resumen.proximas_citas);
+
+      // Ventas por mes (últimos 6 meses; `mes` viene como YYYY-MM-01)
+      setVentasPorMes(
+        resumen.ventas_por_mes.map(({ mes, contratos, monto }) => {
+          const [anio, numeroMes] = mes.split('-').map(Number);
+          const mesNombre = new Date(anio, numeroMes - 1, 1).toLocaleDateString('es-BO', { month: 'short' });
+          return {
+            mes: mesNombre.charAt(0).toUpperCase() + mesNombre.slice(1),
+            contratos,
+            monto: parseFloat(monto || 0)
+          };
+        })
+      );
 
     } catch (error) {
       if (error.name === 'CanceledError' || error.name === 'AbortError') {
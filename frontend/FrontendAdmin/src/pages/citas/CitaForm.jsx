@@ -3,9 +3,7 @@ import { useNavigate, useParams } from 'react-router-dom';
 import { toast } from 'react-hot-toast';
 import { CalendarDaysIcon } from '@heroicons/react/24/outline';
 import citaVisitaService from '../../services/citaVisitaService';
-import propiedadService from '../../services/propiedadService';
-import clienteService from '../../services/clienteService';
-import usuarioService from '../../services/usuarioService';
+import lookupService from '../../services/lookupService';
 
 // ✨ Importar componentes reutilizables
 import BackButton from '../../components/shared/BackButton';
@@ -47,16 +45,12 @@ const CitaForm = () => {
   const loadOptions = async () => {
     try {
       const [propiedadesData, clientesData, usuariosData] = await Promise.all([
-        propiedadService.getAll(),
-        clienteService.getAll(),
-        usuarioService.getAll()
+        lookupService.get('propiedades'), // ya excluye las cerradas
+        lookupService.get('clientes'),
+        lookupService.get('usuarios')
       ]);
 
-      const propiedadesDisponibles = propiedadesData.filter(
-        p => p.estado_propiedad !== 'Cerrada'
-      );
-
-      setPropiedades(propiedadesDisponibles);
+      setPropiedades(propiedadesData);
       setClientes(clientesData);
       setUsuarios(usuariosData);
     } catch (error) {
@@ -234,10 +228,9 @@ const CitaForm = () => {
                   disabled={loading}
                 >
                   <option value="">Seleccione una propiedad</option>
-                  {propiedades.map(propiedad => (
-                    <option key={propiedad.id_propiedad} value={propiedad.id_propiedad}>
-                      {propiedad.codigo_publico_propiedad} - {propiedad.titulo_propiedad} 
-                      ({propiedad.tipo_operacion_propiedad})
+                  {propiedades.map(([idPropiedad, etiqueta]) => (
+                    <option key={idPropiedad} value={idPropiedad}>
+                      {etiqueta}
                     </option>
                   ))}
                 </select>
@@ -259,9 +252,9 @@ const CitaForm = () => {
                   disabled={loading}
                 >
                   <option value="">Seleccione un cliente</option>
-                  {clientes.map(cliente => (
-                    <option key={cliente.ci_cliente} value={cliente.ci_cliente}>
-                      {cliente.nombres_completo_cliente} {cliente.apellidos_completo_cliente} - CI: {cliente.ci_cliente}
+                  {clientes.map(([ciCliente, etiqueta]) => (
+                    <option key={ciCliente} value={ciCliente}>
+                      {etiqueta}
                     </option>
                   ))}
                 </select>
@@ -283,9 +276,9 @@ const CitaForm = () => {
                   disabled={loading}
                 >
                   <option value="">Asignar automáticamente</option>
-                  {usuarios.map(usuario => (
-                    <option key={usuario.id_usuario} value={usuario.id_usuario}>
-                      {usuario.nombre_usuario}
+                  {usuarios.map(([idUsuario, nombreUsuario]) => (
+                    <option key={idUsuario} value={idUsuario}>
+                      {nombreUsuario}
                     </option>
                   ))}
                 </select>
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 import { propiedadService } from '../../services/propiedadService';
-import { propietarioService } from '../../services/propietarioService';
+import lookupService from '../../services/lookupService';
 import { direccionService } from '../../services/direccionService';
 import { MapPinIcon, HomeIcon, CurrencyDollarIcon, CalendarIcon } from '@heroicons/react/24/outline';
 import toast from 'react-hot-toast';
@@ -52,7 +52,7 @@ const PropiedadForm = () => {
         if (isEditMode) {
           const [propiedadData, propietariosData] = await Promise.all([
             propiedadService.getById(id, controller.signal),
-            propietarioService.getAll(controller.signal)
+            lookupService.get('propietarios', controller.signal)
           ]);
 
           if (isMounted) {
@@ -86,7 +86,7 @@ const PropiedadForm = () => {
             setPropietarios(propietariosData);
           }
         } else {
-          const propietariosData = await propietarioService.getAll(controller.signal);
+          const propietariosData = await lookupService.get('propietarios', controller.signal);
           
           if (isMounted) {
             setPropietarios(propietariosData);
@@ -317,9 +317,9 @@ const PropiedadForm = () => {
                     className="w-full px-4 py-2.5 bg-gray-900/50 border border-gray-700 rounded-lg text-gray-200 focus:ring-2 focus:ring-green-500/50 focus:border-green-500/50 transition-all"
                   >
                     <option value="">Seleccionar propietario</option>
-                    {propietarios.map(prop => (
-                      <option key={prop.ci_propietario} value={prop.ci_propietario}>
-                        {prop.nombres_completo_propietario} {prop.apellidos_completo_propietario} - CI: {prop.ci_propietario}
+                    {propietarios.map(([ciPropietario, etiqueta]) => (
+                      <option key={ciPropietario} value={ciPropietario}>
+                        {etiqueta}
                       </option>
                     ))}
                   </select>
@@ -1,8 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 import { usuarioService } from '../../services/usuarioService';
-import { rolService } from '../../services/rolService';
-import { empleadoService } from '../../services/empleadoService';
+import lookupService from '../../services/lookupService';
 import { EyeIcon, EyeSlashIcon, ShieldCheckIcon } from '@heroicons/react/24/outline';
 import toast from 'react-hot-toast';
 
@@ -37,8 +36,8 @@ const UsuarioForm = () => {
         setLoading(true);
         
         const [rolesData, empleadosData] = await Promise.all([
-          rolService.getAll(controller.signal),
-          empleadoService.getAll(controller.signal)
+          lookupService.get('roles', controller.signal),
+          lookupService.get('empleados', controller.signal)
         ]);
 
         if (isMounted) {
@@ -216,9 +215,9 @@ const UsuarioForm = () => {
               }`}
             >
               <option value="">Seleccione un empleado</option>
-              {empleados.map((emp) => (
-                <option key={emp.ci_empleado} value={emp.ci_empleado}>
-                  {emp.ci_empleado} - {emp.nombres_completo_empleado} {emp.apellidos_completo_empleado}
+              {empleados.map(([ciEmpleado, etiqueta]) => (
+                <option key={ciEmpleado} value={ciEmpleado}>
+                  {etiqueta}
                 </option>
               ))}
             </select>
@@ -299,9 +298,9 @@ const UsuarioForm = () => {
               className="w-full px-4 py-2.5 bg-gray-900/50 border border-gray-700 rounded-lg text-gray-200 focus:ring-2 focus:ring-green-500/50 focus:border-green-500/50 transition-all"
             >
               <option value="">Seleccione un rol</option>
-              {roles.map((rol) => (
-                <option key={rol.id_rol} value={rol.id_rol}>
-                  {rol.nombre_rol}
+              {roles.map(([idRol, nombreRol]) => (
+                <option key={idRol} value={idRol}>
+                  {nombreRol}
                 </option>
               ))}
             </select>
@@ -0,0 +1,24 @@
+import axiosInstance from '../api/axios';
+
+const BASE_URL = '/dashboard/';
+
+const dashboardService = {
+  // ✅ Resumen completo del dashboard en un solo request (agregado en la BD)
+  async getResumen(signal, limite = 5) {
+    try {
+      const response = await axiosInstance.get(`${BASE_URL}resumen`, {
+        signal,
+        params: { limite }
+      });
+
+      // Retorna: { propiedades, propiedades_por_tipo, clientes, citas, proximas_citas,
+      //            contratos, contratos_por_estado, ventas_por_mes, pagos_mes, pagos_recientes }
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching dashboard resumen:', error);
+      throw error;
+    }
+  }
+};
+
+export default dashboardService;
@@ -0,0 +1,21 @@
+import axiosInstance from '../api/axios';
+
+const BASE_URL = '/lookup/';
+
+const lookupService = {
+  // ✅ Pares [id, etiqueta] para selectores. El backend responde con ETag y
+  // Cache-Control: no-cache, así el navegador revalida y recibe 304 (sin
+  // payload) mientras la tabla no cambie.
+  // entidad: clientes | empleados | propiedades | propietarios | roles | usuarios
+  async get(entidad, signal) {
+    try {
+      const response = await axiosInstance.get(`${BASE_URL}${entidad}`, { signal });
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching lookup ${entidad}:`, error);
+      throw error;
+    }
+  }
+};
+
+export default lookupService;